@@ -0,0 +1,49 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+"""
+Compares the speed of the original S-expression parser and the fast one.
+Usage: benchmark.py [FILES...]
+Default: the KiCad 6 boards and schematics used for the tests.
+"""
+import os
+import sys
+from glob import glob
+from time import perf_counter
+# Use the local copy of KiBot
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from kibot.kicad.sexpdata import Parser, FastParser  # noqa: E402
+
+REPEAT = 3
+
+
+def measure(cls, text):
+    best = None
+    for _ in range(REPEAT):
+        start = perf_counter()
+        res = cls(text).parse()
+        t = perf_counter()-start
+        best = t if best is None else min(best, t)
+    return best, res
+
+
+files = sys.argv[1:]
+if not files:
+    samples = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'tests', 'board_samples', 'kicad_6')
+    files = sorted(glob(os.path.join(samples, '*.kicad_sch'))+glob(os.path.join(samples, '*.kicad_pcb')))
+total_size = total_old = total_new = 0
+for f in files:
+    with open(f, 'rt') as fh:
+        text = fh.read()
+    t_old, r_old = measure(Parser, text)
+    t_new, r_new = measure(FastParser, text)
+    if r_old != r_new:
+        print('Different results for '+f)
+        sys.exit(1)
+    total_size += len(text)
+    total_old += t_old
+    total_new += t_new
+mb = total_size/1e6
+print('{} files, {:.2f} MB'.format(len(files), mb))
+print('Parser:     {:.3f} s ({:.2f} MB/s)'.format(total_old, mb/total_old))
+print('FastParser: {:.3f} s ({:.2f} MB/s)'.format(total_new, mb/total_new))
+print('Speed-up:   {:.1f}x'.format(total_old/total_new))
@@ -9,8 +9,15 @@
 
 Usage:
   kibot [-b BOARD] [-e SCHEMA] [-c CONFIG] [-d OUT_DIR] [-s PRE]
-         [-q | -v...] [-i] [-C] [-m MKFILE] [-g DEF]... [TARGET...]
+         [-q | -v...] [-i] [-I] [-C] [-m MKFILE] [-j JOBS] [-g DEF]...
+         [--profile FILE] [--trace FILE] [--no-sch-cache] [TARGET...]
   kibot [-v...] [-b BOARD] [-e SCHEMA] [-c PLOT_CONFIG] --list
+  kibot [-v...] [-b BOARD] [-e SCHEMA] [-c CONFIG] [-d OUT_DIR] [-I] [-g DEF]...
+         [--no-sch-cache] --server SOCKET
+  kibot [-q | -v...] [-s PRE] [-i] [-C] [-j JOBS] --client SOCKET [TARGET...]
+  kibot --client SOCKET --quit
+  kibot [-q | -v...] [-d OUT_DIR] [-s PRE] [-i] [-I] [-C] [-j JOBS] [-g DEF]...
+         [--profile FILE] [--trace FILE] [--no-sch-cache] --batch FILE [TARGET...]
   kibot [-v...] [-b BOARD] [-d OUT_DIR] [-p | -P] --example
   kibot [-v...] --help-filters
   kibot [-v...] --help-list-outputs
@@ -26,8 +33,11 @@ Arguments:
 Options:
   -h, --help                       Show this help message and exit
   -b BOARD, --board-file BOARD     The PCB .kicad-pcb board file
+  --batch FILE                     Generate the outputs for the projects listed
+                                   in the FILE YAML file
   -c CONFIG, --plot-config CONFIG  The plotting config file to use
   -C, --cli-order                  Generate outputs using the indicated order
+  --client SOCKET                  Ask the server at SOCKET to generate the outputs
   -d OUT_DIR, --out-dir OUT_DIR    The output directory [default: .]
   -e SCHEMA, --schematic SCHEMA    The schematic file (.sch)
   -g DEF, --global-redef DEF       Overwrite a global value (VAR=VAL)
@@ -37,12 +47,21 @@ Options:
   --help-outputs                   List supported outputs and details
   --help-preflights                List supported preflights and details
   -i, --invert-sel                 Generate the outputs not listed as targets
+  -I, --incremental                Skip the outputs that are up-to-date
+  -j JOBS, --jobs JOBS             Generate the outputs using JOBS processes [default: 1]
   -l, --list                       List available outputs (in the config file)
   -m MKFILE, --makefile MKFILE     Generate a Makefile (no targets created)
+  --no-sch-cache                   Don't use the cache for the loaded schematics
   -p, --copy-options               Copy plot options from the PCB file
   -P, --copy-and-expand            As -p but expand the list of layers
+  --profile FILE                   Save the time used by each output to FILE (JSON)
   -q, --quiet                      Remove information logs
+  --quit                           Ask the server to finish
   -s PRE, --skip-pre PRE           Skip preflights, comma separated or `all`
+  --server SOCKET                  Keep the files loaded and wait for requests
+                                   at the SOCKET UNIX socket
+  --trace FILE                     Save the time used by each output to FILE
+                                   (Chrome trace format)
   -v, --verbose                    Show debugging information
   -V, --version                    Show program's version number and exit
   -x, --example                    Create a template configuration file.
@@ -62,7 +81,6 @@ import os
 import sys
 from sys import path as sys_path
 import re
-import gzip
 import locale
 from glob import glob
 from logging import DEBUG
@@ -92,6 +110,10 @@ from .pre_base import (BasePreFlight)
 from .config_reader import (CfgYamlReader, print_outputs_help, print_output_help, print_preflights_help, create_example,
                             print_filters_help)
 from .kiplot import (generate_outputs, load_actions, config_output, generate_makefile)
+from .manifest import Manifest
+from .server import Server, run_client
+from .batch import load_batch, run_batch
+from . import profiler
 GS.kibot_version = __version__
 
 
@@ -316,6 +338,43 @@ def solve_project_file():
     return None
 
 
+def process_project(project, args, jobs):
+    """ Generates the outputs for one of the projects listed in a batch file.
+        The current directory is the project directory. """
+    plot_config = solve_config(project['config'])
+    GS.set_sch(solve_schematic(project['schematic'], project['board'], plot_config))
+    GS.set_pcb(solve_board_file(GS.sch_file, project['board']))
+    GS.set_pro(solve_project_file())
+    # Output dir: relative to the project (absolute path overrides)
+    GS.out_dir = os.path.abspath(project['out_dir'] or args.out_dir)
+    GS.out_dir_in_cmd_line = project['out_dir'] is not None or '-d' in sys.argv or '--out-dir' in sys.argv
+    outputs = CfgYamlReader().read_file(plot_config)
+    if args.incremental:
+        GS.manifest = Manifest(GS.out_dir)
+    generate_outputs(outputs, project['targets'] or args.target, args.invert_sel, args.skip_pre, args.cli_order, jobs)
+    if GS.manifest:
+        GS.manifest.save()
+
+
+def solve_jobs(a_jobs):
+    """ Number of processes used to generate the outputs """
+    try:
+        jobs = int(a_jobs)
+    except ValueError:
+        jobs = 0
+    if jobs < 1:
+        logger.error('The number of jobs must be a positive integer ({})'.format(a_jobs))
+        sys.exit(EXIT_BAD_ARGS)
+    return jobs
+
+
+def save_profile(args):
+    if args.profile:
+        profiler.save_report(args.profile)
+    if args.trace:
+        profiler.save_trace(args.trace)
+
+
 def main():
     set_locale()
     ver = 'KiBot '+__version__+' - '+__copyright__+' - License: '+__license__
@@ -326,6 +385,22 @@ def main():
     log.set_verbosity(logger, args.verbose, args.quiet)
     GS.debug_enabled = logger.getEffectiveLevel() <= DEBUG
     GS.debug_level = args.verbose
+    GS.sch_cache = not args.no_sch_cache
+    GS.jobs = jobs = solve_jobs(args.jobs)
+
+    if args.client:
+        # The server does all the job
+        if args.quit:
+            req = {'quit': True}
+        else:
+            req = {'targets': args.target, 'invert': args.invert_sel, 'skip_pre': args.skip_pre,
+                   'cli_order': args.cli_order, 'jobs': jobs}
+        sys.exit(run_client(args.client, req))
+
+    if args.profile or args.trace:
+        # Measure the time used by each preflight and output
+        profiler.enable()
+
     # Now we have the debug level set we can check (and optionally inform) KiCad info
     detect_kicad()
 
@@ -362,6 +437,14 @@ def main():
             sys.exit(EXIT_BAD_ARGS)
         create_example(args.board_file, GS.out_dir, args.copy_options, args.copy_and_expand)
         sys.exit(0)
+    if args.batch:
+        projects = load_batch(args.batch)
+        # Worker processes can't create more processes, so we parallelize the projects or the outputs
+        out_jobs = jobs if len(projects) == 1 else 1
+        ret = run_batch(projects, lambda p: process_project(p, args, out_jobs), jobs)
+        save_profile(args)
+        logger.log_totals()
+        sys.exit(ret)
 
     # Determine the YAML file
     plot_config = solve_config(args.plot_config)
@@ -372,18 +455,13 @@ def main():
     # Determine the project file
     GS.set_pro(solve_project_file())
 
+    if args.server:
+        # Keep everything loaded and wait for requests
+        Server(args.server, plot_config, args.incremental).run()
+        sys.exit(0)
+
     # Read the config file
-    cr = CfgYamlReader()
-    outputs = None
-    try:
-        # The Python way ...
-        with gzip.open(plot_config) as cf_file:
-            outputs = cr.read(cf_file)
-    except OSError:
-        pass
-    if outputs is None:
-        with open(plot_config) as cf_file:
-            outputs = cr.read(cf_file)
+    outputs = CfgYamlReader().read_file(plot_config)
 
     # Is just list the available targets?
     if args.list:
@@ -394,8 +472,15 @@ def main():
         # Only create a makefile
         generate_makefile(args.makefile, plot_config, outputs)
     else:
+        if args.incremental:
+            GS.manifest = Manifest(GS.out_dir)
         # Do all the job (preflight + outputs)
-        generate_outputs(outputs, args.target, args.invert_sel, args.skip_pre, args.cli_order)
+        try:
+            generate_outputs(outputs, args.target, args.invert_sel, args.skip_pre, args.cli_order, jobs)
+        finally:
+            save_profile(args)
+        if GS.manifest:
+            GS.manifest.save()
     # Print total warnings
     logger.log_totals()
 
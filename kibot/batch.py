@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+Batch mode
+
+Generates the outputs for more than one project using the same process.
+The plug-ins, KiCad configuration and tools versions are loaded only once.
+"""
+import os
+from multiprocessing import get_context
+from sys import exit
+import yaml
+from .gs import GS
+from .registrable import RegOutput
+from .pre_base import BasePreFlight
+from .board_state import BoardState
+from .kicad.config import KiConf
+from .error import config_error
+from .misc import EXIT_BAD_ARGS, INTERNAL_ERROR, error_level_to_name
+from . import log
+from . import profiler
+
+logger = log.get_logger()
+# Projects and function used to process them, inherited by the worker processes
+projects = []
+process_project = None
+
+
+def load_batch(fname):
+    """ Reads the list of projects from a YAML file.
+        Project directories are relative to the batch file, the rest is relative to the project directory. """
+    if not os.path.isfile(fname):
+        logger.error("Batch file not found: "+fname)
+        exit(EXIT_BAD_ARGS)
+    with open(fname) as f:
+        try:
+            data = yaml.safe_load(f)
+        except yaml.YAMLError as e:
+            config_error("Error loading YAML "+str(e))
+    if not isinstance(data, dict) or not isinstance(data.get('projects'), list):
+        config_error("The batch file must contain a `projects` list")
+    base_dir = os.path.dirname(os.path.abspath(fname))
+    res = []
+    for p in data['projects']:
+        if isinstance(p, str):
+            p = {'dir': p}
+        elif not isinstance(p, dict):
+            config_error("Each project must be a directory name or a dict, not: "+str(p))
+        unknown = set(p.keys())-{'name', 'dir', 'board', 'schematic', 'config', 'out_dir', 'targets'}
+        if unknown:
+            config_error("Unknown project option/s: "+', '.join(sorted(unknown)))
+        targets = p.get('targets', [])
+        if isinstance(targets, str):
+            targets = [targets]
+        project = {'dir': os.path.join(base_dir, str(p.get('dir', '.'))), 'targets': targets}
+        for k in ('board', 'schematic', 'config', 'out_dir'):
+            v = p.get(k)
+            project[k] = str(v) if v is not None else None
+        project['name'] = str(p.get('name', os.path.relpath(project['dir'], base_dir)))
+        if not os.path.isdir(project['dir']):
+            config_error("Missing directory for project `{}`: {}".format(project['name'], project['dir']))
+        res.append(project)
+    if not res:
+        config_error("No projects in the batch file")
+    return res
+
+
+def reset_project():
+    """ Discards the data from the previous project """
+    GS.reset_project()
+    RegOutput.reset()
+    BasePreFlight.reset()
+    KiConf.reset_project()
+
+
+def _run_project(index):
+    """ Processes one project, returns the exit code """
+    project = projects[index]
+    logger.info('Project `{}`'.format(project['name']))
+    reset_project()
+    cwd = os.getcwd()
+    ret = 0
+    try:
+        os.chdir(project['dir'])
+        process_project(project)
+    except SystemExit as e:
+        ret = e.code if isinstance(e.code, int) else INTERNAL_ERROR
+    finally:
+        # The filtered PCBs are for this project
+        BoardState.remove_saved()
+        os.chdir(cwd)
+    return ret
+
+
+def _run_project_job(index):
+    """ Processes one project inside a worker process.
+        Returns the exit code and the warnings we found. """
+    cnt = (log.MyLogger.warn_cnt, log.MyLogger.warn_tcnt, log.MyLogger.n_filtered)
+    n_events = len(profiler.events)
+    ret = _run_project(index)
+    return (ret, log.MyLogger.warn_cnt-cnt[0], log.MyLogger.warn_tcnt-cnt[1], log.MyLogger.n_filtered-cnt[2],
+            profiler.get_events(n_events))
+
+
+def run_batch(batch_projects, process, jobs=1):
+    """ Calls `process` for each project, using `jobs` worker processes.
+        Returns the exit code of the first project that failed """
+    global projects
+    global process_project
+    projects = batch_projects
+    process_project = process
+    if jobs > 1 and len(projects) > 1:
+        logger.debug('Processing {} projects using {} jobs'.format(len(projects), jobs))
+        with get_context('fork').Pool(min(jobs, len(projects))) as pool:
+            results = pool.map(_run_project_job, range(len(projects)), chunksize=1)
+        rets = []
+        for ret, warn_cnt, warn_tcnt, n_filtered, events in results:
+            log.MyLogger.warn_cnt += warn_cnt
+            log.MyLogger.warn_tcnt += warn_tcnt
+            log.MyLogger.n_filtered += n_filtered
+            profiler.add_events(events)
+            rets.append(ret)
+    else:
+        rets = [_run_project(i) for i in range(len(projects))]
+    reset_project()
+    failed = [(p, r) for p, r in zip(projects, rets) if r]
+    for p, ret in failed:
+        name = error_level_to_name[ret] if ret < len(error_level_to_name) else str(ret)
+        logger.error('Failed to process project `{}` ({})'.format(p['name'], name))
+    logger.info('Processed {} projects, {} failed'.format(len(projects), len(failed)))
+    return failed[0][1] if failed else 0
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+Temporal changes to the PCB.
+
+Outputs applying variants and filters change the loaded board (i.e. removing solder paste for not fitted components).
+Here we record the original state of the objects we change, so we can restore them without visiting all the
+footprints again.
+The filtered PCBs and schematics we save to disk are also registered here, so other outputs can use them.
+"""
+import os
+import atexit
+from glob import glob
+from shutil import rmtree
+from . import log
+
+logger = log.get_logger()
+
+
+class BoardState(object):
+    """ Original state for the objects we changed in a board """
+    # True when the board is a private copy of this process, that will be discarded after generating one output.
+    # In this case we don't need to restore the changes. Not used for the outputs that other output runs.
+    isolated = False
+    # Filtered PCBs and schematics we saved to disk, shared by the outputs using the same filters. Key -> file name
+    saved = {}
+    # Files and directories to remove when we finish (glob patterns)
+    temporal = []
+
+    def __init__(self, board):
+        self.board = board
+        self._undo = []
+
+    def add(self, m, item):
+        """ Adds a drawing to a footprint """
+        m.Add(item)
+        self._undo.append((m.Remove, item))
+
+    def set_layer(self, item, layer):
+        self._undo.append((item.SetLayer, item.GetLayer()))
+        item.SetLayer(layer)
+
+    def set_pad_layers(self, pad, layers, old_layers):
+        """ Changes the layers for a pad, `old_layers` is the original LSET in hex format """
+        self._undo.append((self._restore_pad_layers, pad, old_layers))
+        pad.SetLayerSet(layers)
+
+    @staticmethod
+    def _restore_pad_layers(pad, old_layers):
+        pad_layers = pad.GetLayerSet()
+        pad_layers.ParseHex(old_layers, len(old_layers))
+        pad.SetLayerSet(pad_layers)
+
+    def set_title(self, text):
+        tb = self.board.GetTitleBlock()
+        self._undo.append((tb.SetTitle, tb.GetTitle()))
+        tb.SetTitle(text)
+
+    def save_models(self, m):
+        """ Remembers the 3D models of a footprint, call it before changing them """
+        models = m.Models()
+        models_l = []
+        while not models.empty():
+            models_l.insert(0, models.pop())
+        for m3d in models_l:
+            models.push_back(m3d)
+        self.changed_models(m, models_l, [m3d.m_Filename for m3d in models_l])
+
+    def changed_models(self, m, models_l, names):
+        """ Remembers the 3D models of a footprint we already changed.
+            `models_l` is the list of models in the footprint order, `names` are their original file names. """
+        self._undo.append((self._restore_models, m, models_l, names))
+
+    @staticmethod
+    def _restore_models(m, models_l, names):
+        models = m.Models()
+        while not models.empty():
+            models.pop()
+        for m3d, name in zip(models_l, names):
+            m3d.m_Filename = name
+            models.push_back(m3d)
+
+    def restore(self):
+        """ Undo all the changes, in reverse order """
+        if not BoardState.isolated:
+            logger.debug('Restoring {} changes to the PCB'.format(len(self._undo)))
+            for action in reversed(self._undo):
+                action[0](*action[1:])
+        self._undo = []
+
+    @staticmethod
+    def get_saved(key):
+        """ Name of a filtered PCB/schematic we already saved, None if we don't have it """
+        fname = BoardState.saved.get(key)
+        if fname is not None:
+            logger.debug('Using the already filtered file `{}`'.format(fname))
+        return fname
+
+    @staticmethod
+    def add_saved(key, fname, temporal):
+        """ Registers a filtered PCB/schematic. `temporal` is a list of files and directories to remove at exit """
+        BoardState.saved[key] = fname
+        BoardState.temporal.extend(temporal)
+
+    @staticmethod
+    def remove_saved(first=0):
+        """ Removes the filtered PCBs/schematics and the files they use.
+            Only the files registered after the first `first` are removed, used by worker processes. """
+        for pattern in BoardState.temporal[first:]:
+            for name in glob(pattern):
+                logger.debug('Removing temporal `{}`'.format(name))
+                if os.path.isdir(name):
+                    rmtree(name, ignore_errors=True)
+                else:
+                    os.remove(name)
+        if first:
+            BoardState.temporal = BoardState.temporal[:first]
+        else:
+            BoardState.saved = {}
+            BoardState.temporal = []
+
+
+atexit.register(BoardState.remove_saved)
@@ -12,7 +12,7 @@ All the logic to convert a list of components into the rows and columns used to
 import locale
 from copy import deepcopy
 from math import ceil
-from .units import compare_values, comp_match, get_last_warning
+from .units import compare_values, comp_match, get_last_warning, value_key
 from .bom_writer import write_bom
 from .columnlist import ColumnList
 from ..misc import DNF, W_FIELDCONF
@@ -117,6 +117,100 @@ def compare_components(c1, c2, cfg):
     return True
 
 
+def value_keys(c, cfg):
+    """ Keys for the value, two values that compare_value() finds equal share at least one key """
+    value = c.value.strip().lower()
+    keys = [('s', '' if value == '~' else value)]
+    if c.value_sort:
+        keys.append(('n',)+value_key(c.value_sort))
+    if cfg.group_connectors and c.lib is not None and 'connector' in c.lib.lower():
+        keys.append(('c',))
+    return keys
+
+
+def part_name_keys(c, cfg):
+    """ Keys for the part name, two names that compare_part_name() finds equal share at least one key """
+    pn = c.name.lower()
+    keys = [('n', pn)]
+    keys.extend(('a', i) for i, alias in enumerate(cfg.component_aliases) if pn in alias)
+    return keys
+
+
+def field_keys(c, field, cfg):
+    """ Keys for a grouping field. None when the field matches anything (blank and merge_blank_fields) """
+    if field == ColumnList.COL_VALUE_L:
+        return value_keys(c, cfg)
+    if field == ColumnList.COL_PART_L:
+        return part_name_keys(c, cfg)
+    value = c.get_field_value(field).lower()
+    if value == "":
+        if cfg.merge_blank_fields:
+            return None
+        if not cfg.merge_both_blank:
+            # Never matches
+            return []
+    return [value]
+
+
+def group_keys(c, cfg):
+    """ Keys used to look for the groups where `c` could fit.
+        Two components that compare_components() finds equal share at least one key.
+        None when we can't compute them (wildcard fields), we must try all the groups. """
+    keys = [(c.fitted, c.fixed)]
+    if len(cfg.group_fields) == 0:
+        # Do not group components
+        return [keys[0]+(c.ref,)]
+    for field, field_alt in zip(cfg.group_fields, cfg.group_fields_fallbacks):
+        f_keys = field_keys(c, field, cfg)
+        if f_keys is None:
+            return None
+        if field_alt is not None:
+            # Two components can be compared using the field or the fallback
+            f_keys = [('f', k) for k in f_keys]
+            if c.get_field_value(field_alt) != "":
+                alt_keys = field_keys(c, field_alt, cfg)
+                if alt_keys is None:
+                    return None
+                f_keys.extend(('a', k) for k in alt_keys)
+        keys = [k+(f_k,) for k in keys for f_k in f_keys]
+    return keys
+
+
+class GroupsIndex(object):
+    """ Finds the first group matching a component without testing all the groups.
+        The groups are indexed using the keys of its first component, see group_keys(). """
+    def __init__(self, cfg):
+        self.cfg = cfg
+        self.groups = []
+        self.index = {}
+        # Groups we can't index, they are tested for all the components
+        self.not_indexed = []
+
+    def find(self, c, keys):
+        """ The first group where `c` fits, None if no group matches """
+        if keys is None:
+            candidates = range(len(self.groups))
+        else:
+            candidates = set(self.not_indexed)
+            for k in keys:
+                candidates.update(self.index.get(k, ()))
+            candidates = sorted(candidates)
+        for n in candidates:
+            g = self.groups[n]
+            if g.match_component(c):
+                return g
+        return None
+
+    def add(self, g, keys):
+        n = len(self.groups)
+        self.groups.append(g)
+        if keys is None:
+            self.not_indexed.append(n)
+        else:
+            for k in keys:
+                self.index.setdefault(k, []).append(n)
+
+
 class Joiner:
     def __init__(self):
         self.stack = {}
@@ -433,7 +527,7 @@ def compute_multiple_stats(cfg, groups):
 
 
 def group_components(cfg, components):
-    groups = []
+    groups = GroupsIndex(cfg)
     # Iterate through each component, and test whether a group for these already exists
     for c in components:
         if not c.included:  # Skip components marked as excluded from BoM
@@ -452,17 +546,16 @@ def group_components(cfg, components):
         else:
             c.value_sort = None
         # Try to add the component to an existing group
-        found = False
-        for g in groups:
-            if g.match_component(c):
-                g.add_component(c)
-                found = True
-                break
-        if not found:
+        keys = group_keys(c, cfg)
+        g = groups.find(c, keys)
+        if g is not None:
+            g.add_component(c)
+        else:
             # Create a new group
             g = ComponentGroup(cfg)
             g.add_component(c)
-            groups.append(g)
+            groups.add(g, keys)
+    groups = groups.groups
     # Now unify the data from the components of each group
     decimal_point = None
     if cfg.normalize_locale:
@@ -541,11 +634,10 @@ def smd_tht(cfg, tot, smd, tht):
     return tot
 
 
-def do_bom(file_name, ext, comps, cfg):
+def do_bom(outputs, comps, cfg):
+    """ Creates the BoM in all the requested formats, `outputs` is a list of (file name, format) """
     # Group components according to group_fields
     groups = group_components(cfg, comps)
-    # Create the BoM
-    logger.debug("Saving BOM File: "+file_name)
     number = cfg.number
     cfg.number = sum(map(lambda prj: prj.number, cfg.aggregate))
     # Pre-format the total and fitted strings
@@ -555,6 +647,9 @@ def do_bom(file_name, ext, comps, cfg):
         for prj in cfg.aggregate:
             prj.total_str = smd_tht(cfg, prj.comp_total, prj.comp_total_smd, prj.comp_total_tht)
             prj.fitted_str = smd_tht(cfg, prj.comp_fitted, prj.comp_fitted_smd, prj.comp_fitted_tht)
-    # Create the BoM
-    write_bom(file_name, ext, groups, cfg.columns, cfg)
+    # Create the BoMs, all of them use the same groups.
+    # The XLSX writer can add data to the groups, so we create it at the end.
+    for file_name, ext in sorted(outputs, key=lambda o: o[1] == 'xlsx'):
+        logger.debug("Saving BOM File: "+file_name)
+        write_bom(file_name, ext, groups, cfg.columns, cfg)
     cfg.number = number
@@ -19,6 +19,7 @@ from .html_writer import write_html
 from .xml_writer import write_xml
 from .xlsx_writer import write_xlsx
 from .. import log
+from .. import profiler
 
 logger = log.get_logger()
 
@@ -35,15 +36,16 @@ def write_bom(filename, ext, groups, headings, cfg):
     head_names = [h if h.lower() not in cfg.column_rename else cfg.column_rename[h.lower()] for h in headings]
     headings = [h.lower() for h in headings]
     result = False
-    # CSV file writing
-    if ext in ["csv", "tsv", "txt"]:
-        result = write_csv(filename, ext, groups, headings, head_names, cfg)
-    elif ext in ["htm", "html"]:
-        result = write_html(filename, groups, headings, head_names, cfg)
-    elif ext in ["xml"]:
-        result = write_xml(filename, groups, headings, head_names, cfg)
-    elif ext in ["xlsx"]:
-        result = write_xlsx(filename, groups, headings, head_names, cfg)
+    with profiler.phase('write', ext):
+        # CSV file writing
+        if ext in ["csv", "tsv", "txt"]:
+            result = write_csv(filename, ext, groups, headings, head_names, cfg)
+        elif ext in ["htm", "html"]:
+            result = write_html(filename, groups, headings, head_names, cfg)
+        elif ext in ["xml"]:
+            result = write_xml(filename, groups, headings, head_names, cfg)
+        elif ext in ["xlsx"]:
+            result = write_xlsx(filename, groups, headings, head_names, cfg)
 
     if result:
         logger.debug("{} Output -> {}".format(ext.upper(), filename))
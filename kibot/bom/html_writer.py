@@ -9,6 +9,7 @@
 HTML Writer: Generates a HTML BoM file.
 """
 import os
+import json
 from base64 import b64encode
 from struct import unpack
 from .columnlist import ColumnList, BoMError
@@ -194,6 +195,34 @@ SORT_CODE = ('<script charset="utf-8">\n'
              '    })\n'
              '  }(document)\n'
              '</script>\n')
+# Creates the rows of the tables stored as JSON (json_data option).
+# Must run before the sorter, which is executed after loading the document.
+JSON_CODE = ('<script charset="utf-8">\n'
+             '  (function() {\n'
+             '    "use strict";\n'
+             '    var e = document.getElementsByClassName("content-data");\n'
+             '    for (var k = 0; k < e.length; ++k) {\n'
+             '      var d = JSON.parse(e[k].textContent), h = [];\n'
+             '      d.rows.forEach(function(row, rc) {\n'
+             '        h.push(\'<tr id="\' + row[0] + \'">\');\n'
+             '        for (var n = 1; n < row.length; ++n) {\n'
+             '          var c = row[n], cl = "";\n'
+             '          if (d.cls) {\n'
+             '            cl = d.empty && (c.length == 0 || c.trim() == "~") ? "empty" : d.cls[n - 1];\n'
+             '            cl = \' class="td-\' + cl + rc % 2 + \'"\';\n'
+             '          }\n'
+             '          if (n - 1 == d.ref) {\n'
+             '            c = c.split(d.sep).map(function(r) { return \'<div id="\' + r + \'"></div>\' }).join("") + c;\n'
+             '          }\n'
+             '          h.push("<td" + cl + ">" + c + "</td>");\n'
+             '        }\n'
+             '        h.push("</tr>");\n'
+             '      });\n'
+             '      e[k].previousElementSibling.tBodies[0].innerHTML = h.join("");\n'
+             '    }\n'
+             '  })();\n'
+             '</script>\n')
+LINK_PREFIXES = ('http', 'ftp', 'www')
 
 
 def cell_class(col):
@@ -210,60 +239,85 @@ def cell_class(col):
 
 
 def link(text):
-    for t in ["http", "https", "ftp", "www"]:
-        if text.startswith(t):
-            return '<a href="{t}">{t}</a>'.format(t=text)
+    if text.startswith(LINK_PREFIXES):
+        return '<a href="{t}">{t}</a>'.format(t=text)
     return text
 
 
+def table_rows(groups, headings, cfg, link_datasheet, link_digikey, ref_col, dnf):
+    """ Iterates over the rows of the table, returns the group index and the cells.
+        The links are already applied, but the references still lack the anchors. """
+    if link_digikey:
+        link_digikey = [n for n, h in enumerate(headings) if h in link_digikey]
+    for i, group in enumerate(groups):
+        if (cfg.ignore_dnf and not group.is_fitted()) != dnf:
+            continue
+        row = group.get_row(headings)
+        # A link to Digi-Key?
+        for n in link_digikey:
+            r = row[n]
+            row[n] = '<a href="http://search.digikey.com/scripts/DkSearch/dksus.dll?Detail&name=' + r + '">' + r + '</a>'
+        # Link this column to the datasheet?
+        if link_datasheet != -1:
+            datasheet = group.get_field(ColumnList.COL_DATASHEET_L)
+            if datasheet.startswith('http'):
+                row[link_datasheet] = '<a href="' + datasheet + '">' + row[link_datasheet] + '</a>'
+        for n, r in enumerate(row):
+            if n != ref_col:
+                row[n] = link(r)
+        yield i, row
+
+
 def content_table(html, groups, headings, head_names, cfg, link_datasheet, link_digikey, col_colors, dnf=False):
-    cl = ''
     # Table start
     html.write('<table class="content-table">\n')
     # Row titles:
-    html.write(" <thead>\n")
-    html.write("  <tr>\n")
+    head = [" <thead>\n", "  <tr>\n"]
     for i, h in enumerate(head_names):
-        if col_colors:
-            # Cell background color
-            cl = ' class="th-'+cell_class(headings[i])+'"'
-        html.write('   <th{}>{}</th>\n'.format(cl, h))
-    html.write("  </tr>\n")
-    html.write(" </thead>\n")
+        # Cell background color
+        cl = ' class="th-'+cell_class(headings[i])+'"' if col_colors else ''
+        head.append('   <th{}>{}</th>\n'.format(cl, h))
+    head.append("  </tr>\n")
+    head.append(" </thead>\n")
+    html.write(''.join(head))
 
-    html.write(" <tbody>\n")
-    rc = 0
     hl_empty = cfg.html.highlight_empty
-    for i, group in enumerate(groups):
-        if (cfg.ignore_dnf and not group.is_fitted()) != dnf:
-            continue
-        row = group.get_row(headings)
-        if link_datasheet != -1:
-            datasheet = group.get_field(ColumnList.COL_DATASHEET_L)
-        html.write('  <tr id="{}">\n'.format(i))
+    ref_col = headings.index(ColumnList.COL_REFERENCE_L) if ColumnList.COL_REFERENCE_L in headings else -1
+    rows = table_rows(groups, headings, cfg, link_datasheet, link_digikey, ref_col, dnf)
+    if cfg.html.json_data:
+        # Only the data, JSON_CODE creates the rows
+        html.write(" <tbody></tbody>\n")
+        html.write("</table>\n")
+        data = {'cls': [cell_class(h) for h in headings] if col_colors else None, 'empty': hl_empty, 'ref': ref_col,
+                'sep': cfg.ref_separator, 'rows': [[i]+row for i, row in rows]}
+        # Avoid closing the script tag
+        data = json.dumps(data, separators=(',', ':')).replace('</', '<\\/').replace('<!--', '\\u003c!--')
+        html.write('<script type="application/json" class="content-data">{}</script>\n'.format(data))
+        return
+
+    # Cell start for each column, for odd and even rows
+    td_empty = ['   <td>']*2
+    td = [td_empty]*len(headings)
+    if col_colors:
+        td = [['   <td class="td-{}{}">'.format(cell_class(h), rc) for rc in range(2)] for h in headings]
+        if hl_empty:
+            td_empty = ['   <td class="td-empty{}">'.format(rc) for rc in range(2)]
+    html.write(" <tbody>\n")
+    for rc, (i, row) in enumerate(rows):
+        rc %= 2
+        cells = ['  <tr id="{}">\n'.format(i)]
         for n, r in enumerate(row):
-            # A link to Digi-Key?
-            if link_digikey and headings[n] in link_digikey:
-                r = '<a href="http://search.digikey.com/scripts/DkSearch/dksus.dll?Detail&name=' + r + '">' + r + '</a>'
-            # Link this column to the datasheet?
-            if link_datasheet == n and datasheet.startswith('http'):
-                r = '<a href="' + datasheet + '">' + r + '</a>'
-            if col_colors:
-                # Empty cell?
-                if hl_empty and (len(r) == 0 or r.strip() == "~"):
-                    cl = 'empty'
-                else:
-                    cl = cell_class(headings[n])
-                cl = ' class="td-{}{}"'.format(cl, rc % 2)
-            if headings[n] == ColumnList.COL_REFERENCE_L:
-                for ref in r.split(cfg.ref_separator):
-                    r = '<div id="{}"></div>'.format(ref)+r
-            html.write('   <td{}>{}</td>\n'.format(cl, link(r)))
-        html.write("  </tr>\n")
-        rc += 1
+            # Empty cell?
+            cells.append(td_empty[rc] if hl_empty and (len(r) == 0 or r.strip() == "~") else td[n][rc])
+            if n == ref_col:
+                # All the anchors at once, adding them one by one is slow for big groups
+                cells.append(''.join('<div id="{}"></div>'.format(ref) for ref in r.split(cfg.ref_separator)))
+            cells.append(r)
+            cells.append('</td>\n')
+        cells.append("  </tr>\n")
+        html.write(''.join(cells))
     html.write(" </tbody>\n")
     html.write("</table>\n")
-    return
 
 
 def embed_image(file):
@@ -445,6 +499,8 @@ def write_html(filename, groups, headings, head_names, cfg):
                 html.write('<tr><td class="td-empty0">Empty Fields</td></tr>\n')
             html.write('</table>\n')
 
+        if cfg.html.json_data:
+            html.write(JSON_CODE)
         html.write(SORT_CODE)
         html.write("</body></html>")
 
@@ -15,6 +15,7 @@ Oriented to normalize and sort R, L and C values.
 """
 import re
 import locale
+from functools import lru_cache
 from .. import log
 from ..misc import W_BADVAL1, W_BADVAL2, W_BADVAL3
 
@@ -45,6 +46,9 @@ match = None
 decimal_point = None
 # Last warning
 last_warning = ''
+# Size of the caches for the parsed values, designs repeat the same values many times
+CACHE_SIZE = 4096
+UNKNOWN_PREFIX = 'Unknown prefix, please report'
 
 
 def get_last_warning():
@@ -70,6 +74,15 @@ def get_unit(unit, ref_prefix):
 
 def get_prefix(prefix):
     """ Return the (numerical) value of a given prefix """
+    res = _get_prefix(prefix)
+    if res is None:
+        logger.error(UNKNOWN_PREFIX)
+        return 1, ''
+    return res
+
+
+def _get_prefix(prefix):
+    """ get_prefix() without logging, returns None for an unknown prefix """
     if not prefix:
         return 1, ''
     # 'M' is mega, 'm' is milli
@@ -92,8 +105,7 @@ def get_prefix(prefix):
     # Unknown, we shouldn't get here because the regex matched
     # BUT: I found that sometimes unexpected things happen, like mu matching micro and then we reaching this code
     #      Now is fixed, but I can't be sure some bizarre case is overlooked
-    logger.error('Unknown prefix, please report')
-    return 1, ''
+    return None
 
 
 def group_string(group):  # Return a reg-ex string for a list of values
@@ -111,12 +123,6 @@ def comp_match(component, ref_prefix, ref=None):
     e.g. comp_match('3.3mOhm') returns (0.0033, R)
     """
     global last_warning
-    original = component
-    # Remove useless spaces
-    component = component.strip()
-    # ~ is the same as empty for KiCad
-    if component == '~':
-        component = ''
     # Convert the decimal point from the current locale to a '.'
     global decimal_point
     if decimal_point is None:
@@ -125,6 +131,29 @@ def comp_match(component, ref_prefix, ref=None):
         # Avoid conversions for '.'
         if decimal_point == '.':
             decimal_point = ''
+    res, warning = _comp_match(component, ref_prefix, decimal_point)
+    if warning is not None:
+        # Repeat the warning for each component
+        code, msg = warning
+        if code is None:
+            # Not a problem with the value, but with our code
+            logger.error(msg)
+        else:
+            last_warning = code
+            where = ' in {}'.format(ref) if ref is not None else ''
+            logger.warning(code + msg.format(component, where))
+    return res
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _comp_match(component, ref_prefix, decimal_point):
+    """ Cached part of comp_match(), returns the result and the warning (code and message).
+        Doesn't log anything, comp_match() reports the warnings for each component """
+    # Remove useless spaces
+    component = component.strip()
+    # ~ is the same as empty for KiCad
+    if component == '~':
+        component = ''
     if decimal_point:
         component = component.replace(decimal_point, ".")
 
@@ -137,18 +166,13 @@ def comp_match(component, ref_prefix, ref=None):
         # Ignore case
         match = re.compile(match_string(), flags=re.IGNORECASE)
 
-    where = ' in {}'.format(ref) if ref is not None else ''
     result = match.match(component)
     if not result:
-        last_warning = W_BADVAL1
-        logger.warning(W_BADVAL1 + "Malformed value: `{}` (no match{})".format(original, where))
-        return None
+        return None, (W_BADVAL1, "Malformed value: `{}` (no match{})")
 
     value, prefix, units, post = result.groups()
     if value == '.':
-        last_warning = W_BADVAL2
-        logger.warning(W_BADVAL2 + "Malformed value: `{}` (reduced to decimal point{})".format(original, where))
-        return None
+        return None, (W_BADVAL2, "Malformed value: `{}` (reduced to decimal point{})")
     if value == '':
         value = '0'
 
@@ -158,10 +182,7 @@ def comp_match(component, ref_prefix, ref=None):
     # We will also have a trailing number
     if post:
         if "." in value:
-            last_warning = W_BADVAL3
-            logger.warning(W_BADVAL3 + "Malformed value: `{}` (unit split, but contains decimal point{})".
-                           format(original, where))
-            return None
+            return None, (W_BADVAL3, "Malformed value: `{}` (unit split, but contains decimal point{})")
         value = float(value)
         postValue = float(post) / (10 ** len(post))
         val = value * 1.0 + postValue
@@ -169,7 +190,18 @@ def comp_match(component, ref_prefix, ref=None):
         val = float(value)
 
     # Return all the data, let the caller join it
-    return (val, get_prefix(prefix), get_unit(units, ref_prefix))
+    mult = _get_prefix(prefix)
+    if mult is None:
+        # Reported as an error, not a warning
+        return (val, (1, ''), get_unit(units, ref_prefix)), (None, UNKNOWN_PREFIX)
+    return (val, mult, get_unit(units, ref_prefix)), None
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def value_key(res):
+    """ Canonical representation for a comp_match() result: value in base units and units """
+    (v, (p, ps), u) = res
+    return ("{0:.15f}".format(v * 1.0 * p), u)
 
 
 def compare_values(c1, c2):
@@ -182,21 +214,6 @@ def compare_values(c1, c2):
     if not r1 or not r2:
         return False
 
-    # Join the data to compare
-    (v1, (p1, ps1), u1) = r1
-    (v2, (p2, ps2), u2) = r2
-
-    v1 = "{0:.15f}".format(v1 * 1.0 * p1)
-    v2 = "{0:.15f}".format(v2 * 1.0 * p2)
-
-    if v1 == v2:
-        # Values match
-        if u1 == u2:
-            return True  # Units match
-        # No longer possible because now we use the prefix to determine absent units
-        # if not u1:
-        #     return True  # No units for component 1
-        # if not u2:
-        #     return True  # No units for component 2
-
-    return False
+    # Values and units must match
+    # Note: no longer using absent units as wildcards because now we use the prefix to determine absent units
+    return r1 is r2 or value_key(r1) == value_key(r2)
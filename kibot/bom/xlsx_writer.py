@@ -336,15 +336,37 @@ def adjust_widths(worksheet, column_widths, max_width, levels):
             worksheet.set_column(i, i, width, None, {'level': levels[i]})
 
 
-def adjust_heights(worksheet, rows, max_width, head_size):
-    for rn, r in enumerate(rows):
-        max_h = 1
-        for c in r:
-            if len(c) > max_width:
-                h = len(wrap(c, max_width))
-                max_h = max(h, max_h)
-        if max_h > 1:
-            worksheet.set_row(head_size+rn, 15.0*max_h)
+def adjust_height(worksheet, row, cells, max_width):
+    """ Sets the height for a row containing long texts.
+        Must be called before writing the row, in constant_memory mode the row is written to disk. """
+    max_h = 1
+    for c in cells:
+        if len(c) > max_width:
+            h = len(wrap(c, max_width))
+            max_h = max(h, max_h)
+    if max_h > 1:
+        worksheet.set_row(row, 15.0*max_h)
+
+
+class RowsInOrder(object):
+    """ Worksheet proxy that collects the cells and writes them sorted by row.
+        Used for the page head, filled by columns, because in constant_memory mode the rows must be written in order. """
+    def __init__(self, worksheet):
+        super().__init__()
+        self.worksheet = worksheet
+        self.cells = []
+
+    def __getattr__(self, name):
+        method = getattr(self.worksheet, name)
+
+        def add_cell(row, *args):
+            self.cells.append((row, len(self.cells), method, args))
+        return add_cell
+
+    def flush(self):
+        for row, _, method, args in sorted(self.cells, key=lambda c: c[:2]):
+            method(row, *args)
+        self.cells = []
 
 
 def write_info(cfg, r_info_start, worksheet, column_widths, col1, fmt_info, fmt_subtitle, compact=False):
@@ -549,7 +571,7 @@ def _create_kicost_sheet(workbook, groups, image_data, fmt_title, fmt_info, fmt_
             logger.debug(pprint.pformat(g.__dict__))
             logger.debug("-- Components")
             for c in g.components:
-                logger.debug(pprint.pformat(c.__dict__))
+                logger.debug(pprint.pformat(c.get_state()))
     # Force KiCost to use our logger
     set_distributors_logger(logger)
     set_edas_logger(logger)
@@ -717,7 +739,9 @@ def write_xlsx(filename, groups, col_fields, head_names, cfg):
     link_digikey = cfg.xlsx.digikey_link
     hl_empty = cfg.xlsx.highlight_empty
 
-    workbook = Workbook(filename)
+    # When we don't need KiCost (writes the rows in any order) we use the constant_memory mode.
+    # In this mode each row is written to disk when we move to the next one, so we must write them in order.
+    workbook = Workbook(filename, {'constant_memory': not cfg.xlsx.kicost})
     ws_names = ['BoM', 'DNF']
     row_headings = head_names
 
@@ -758,14 +782,28 @@ def write_xlsx(filename, groups, col_fields, head_names, cfg):
 
         worksheet = workbook.add_worksheet(ws_names[ws])
         row_count = head_size
-
-        # Headings
-        # Create the head titles
         column_widths = [0]*max(len(col_fields), 6)
-        rows = [row_headings]
         for i in range(len(row_headings)):
             # Title for this column
             column_widths[i] = len(row_headings[i]) + 10
+
+        # Page head
+        # Logo
+        col1 = insert_logo(worksheet, image_data, cfg.xlsx.logo_scale)
+        # Title
+        if cfg.xlsx.title:
+            worksheet.set_row(0, 32)
+            worksheet.merge_range(0, col1, 0, len(column_widths)-1, cfg.xlsx.title, fmt_title)
+        # PCB & Stats Info
+        if not (cfg.xlsx.hide_pcb_info and cfg.xlsx.hide_stats_info):
+            head = RowsInOrder(worksheet)
+            write_info(cfg, r_info_start, head, column_widths, col1, fmt_info, fmt_subtitle)
+            head.flush()
+
+        # Headings
+        # Create the head titles
+        adjust_height(worksheet, row_count, row_headings, max_width)
+        for i in range(len(row_headings)):
             worksheet.write_string(row_count, i, row_headings[i], fmt_head)
             if cfg.column_comments[i]:
                 worksheet.write_comment(row_count, i, cfg.column_comments[i])
@@ -777,7 +815,7 @@ def write_xlsx(filename, groups, col_fields, head_names, cfg):
                 continue
             # Get the data row
             row = group.get_row(col_fields)
-            rows.append(row)
+            adjust_height(worksheet, row_count, row, max_width)
             if link_datasheet != -1:
                 datasheet = group.get_field(ColumnList.COL_DATASHEET_L)
             # Fill the row
@@ -800,20 +838,8 @@ def write_xlsx(filename, groups, col_fields, head_names, cfg):
                     column_widths[i] = len(cell) + 5
             row_count += 1
 
-        # Page head
-        # Logo
-        col1 = insert_logo(worksheet, image_data, cfg.xlsx.logo_scale)
-        # Title
-        if cfg.xlsx.title:
-            worksheet.set_row(0, 32)
-            worksheet.merge_range(0, col1, 0, len(column_widths)-1, cfg.xlsx.title, fmt_title)
-        # PCB & Stats Info
-        if not (cfg.xlsx.hide_pcb_info and cfg.xlsx.hide_stats_info):
-            write_info(cfg, r_info_start, worksheet, column_widths, col1, fmt_info, fmt_subtitle)
-
-        # Adjust cols and rows
+        # Adjust the columns, the widths were computed while writing the cells
         adjust_widths(worksheet, column_widths, max_width, cfg.column_levels)
-        adjust_heights(worksheet, rows, max_width, head_size)
 
         worksheet.freeze_panes(head_size+1, 0)
         worksheet.repeat_rows(head_size+1)
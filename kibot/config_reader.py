@@ -10,6 +10,7 @@ Class to read KiBot config files
 """
 
 import os
+import gzip
 from sys import (exit, maxsize)
 from collections import OrderedDict
 
@@ -23,6 +24,7 @@ from .pre_base import BasePreFlight
 
 # Logger
 from . import log
+from . import profiler
 
 logger = log.get_logger()
 
@@ -435,6 +437,21 @@ class CfgYamlReader(object):
 
         return RegOutput.get_outputs()
 
+    def read_file(self, fname):
+        """ Read a config file, can be gzip compressed """
+        outputs = None
+        with profiler.phase('config', os.path.basename(fname)):
+            try:
+                # The Python way ...
+                with gzip.open(fname) as cf_file:
+                    outputs = self.read(cf_file)
+            except OSError:
+                pass
+            if outputs is None:
+                with open(fname) as cf_file:
+                    outputs = self.read(cf_file)
+        return outputs
+
 
 def trim(docstring):
     """ PEP 257 recommended trim for __doc__ """
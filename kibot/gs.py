@@ -48,6 +48,8 @@ class GS(object):
     out_dir_in_cmd_line = False
     filter_file = None
     board = None
+    # Read-only model of the PCB (kicad/pcb.py), used by the outputs that just read data from the PCB
+    pcb_data = None
     sch = None
     debug_enabled = False
     debug_level = 0
@@ -82,6 +84,14 @@ class GS(object):
     outputs = None
     # Name for the output we are generating
     current_output = None
+    # Inputs used for the outputs we generated (incremental builds)
+    manifest = None
+    # Components filtered by each variant/filter, shared by the outputs using them
+    filtered_comps = {}
+    # Use the cache for the loaded schematics (see sch_cache.py)
+    sch_cache = False
+    # Number of processes used to load the schematic and generate the outputs
+    jobs = 1
     # Global defaults
     #  This is used as default value for classes supporting "output" option
     def_global_output = '%f-%i%I%v.%x'
@@ -118,6 +128,34 @@ class GS(object):
     test_boolean = True
     stackup = None
 
+    @staticmethod
+    def reset_globals():
+        """ Restore the default values for the global options, used before reading a new configuration """
+        for k, v in GS._global_defaults.items():
+            setattr(GS, k, v)
+        GS.solved_global_variant = None
+        GS.stackup = None
+
+    @staticmethod
+    def reset_project():
+        """ Forget the current project, used to process another project in the same run """
+        GS.pcb_file = GS.pcb_no_ext = GS.pcb_dir = GS.pcb_basename = None
+        GS.sch_file = GS.sch_no_ext = GS.sch_dir = GS.sch_basename = None
+        GS.pro_file = GS.pro_no_ext = GS.pro_dir = GS.pro_basename = None
+        GS.pro_variables = None
+        GS.board = None
+        GS.pcb_data = None
+        GS.sch = None
+        GS.sch_title = None
+        GS.pcb_title = None
+        GS.filter_file = None
+        GS.variant = None
+        GS.outputs = None
+        GS.current_output = None
+        GS.manifest = None
+        GS.filtered_comps = {}
+        GS.reset_globals()
+
     @staticmethod
     def set_sch(name):
         if name:
@@ -145,6 +183,12 @@ class GS(object):
             GS.pro_no_ext = os.path.splitext(name)[0]
             GS.pro_dir = os.path.dirname(name)
 
+    @staticmethod
+    def get_cache_dir(name):
+        """ Directory used to cache `name` data """
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+        return os.path.join(base, 'kibot', name)
+
     @staticmethod
     def load_pro_variables():
         if GS.pro_variables is not None:
@@ -200,11 +244,14 @@ class GS(object):
             return title_block.GetComment4()
         return ''
 
+    @staticmethod
+    def get_board():
+        """ The PCB loaded using pcbnew, or the read-only model when pcbnew didn't load it """
+        return GS.board if GS.board is not None else GS.pcb_data
+
     @staticmethod
     def get_modules():
-        if GS.ki6():
-            return GS.board.GetFootprints()
-        return GS.board.GetModules()
+        return GS.get_modules_board(GS.get_board())
 
     @staticmethod
     def get_modules_board(board):
@@ -214,12 +261,13 @@ class GS(object):
 
     @staticmethod
     def get_aux_origin():
-        if GS.board is None:
+        board = GS.get_board()
+        if board is None:
             return (0, 0)
         if GS.ki6():
-            settings = GS.board.GetDesignSettings()
+            settings = board.GetDesignSettings()
             return settings.GetAuxOrigin()
-        return GS.board.GetAuxOrigin()
+        return board.GetAuxOrigin()
 
     @staticmethod
     def get_center(m):
@@ -298,7 +346,7 @@ class GS(object):
         GS.pcb_rev = ''
         GS.pcb_comp = ''
         # This is based on InterativeHtmlBom expansion
-        title_block = GS.board.GetTitleBlock()
+        title_block = GS.get_board().GetTitleBlock()
         GS.pcb_date = GS.format_date(GS.expand_text_variables(title_block.GetDate()), GS.pcb_file, 'PCB')
         GS.pcb_title = GS.expand_text_variables(title_block.GetTitle())
         if not GS.pcb_title:
@@ -331,7 +379,17 @@ class GS(object):
         """ Will be repplaced by kiplot.py """
         raise AssertionError()
 
+    @staticmethod
+    def load_pcb_data():
+        """ Will be repplaced by kiplot.py """
+        raise AssertionError()
+
     @staticmethod
     def load_sch():
         """ Will be repplaced by kiplot.py """
         raise AssertionError()
+
+
+# Default values for the global options (global_from_cli comes from the command line)
+GS._global_defaults = {k: v for k, v in vars(GS).items()
+                       if k.startswith('global_') and k not in ('global_from_cli', 'global_opts_class')}
@@ -107,6 +107,8 @@ class KiConf(object):
     template_dir = None
     kicad_env = {}
     lib_aliases = {}
+    # Aliases from the user/system table, kept when we switch to another project
+    default_lib_aliases = None
 
     def __init__(self):
         raise AssertionError("KiConf is fully static, no instances allowed")
@@ -118,10 +120,21 @@ class KiConf(object):
             return
         KiConf.dirname = os.path.dirname(fname)
         KiConf.kicad_env['KIPRJMOD'] = KiConf.dirname
-        KiConf.load_kicad_common()
-        KiConf.load_all_lib_aliases()
+        if KiConf.default_lib_aliases is None:
+            KiConf.load_kicad_common()
+            KiConf.load_all_lib_aliases()
+            KiConf.default_lib_aliases = KiConf.lib_aliases.copy()
+        else:
+            # The KiCad configuration was loaded for another project
+            KiConf.lib_aliases = KiConf.default_lib_aliases.copy()
+        # Load the project's table
+        KiConf.load_lib_aliases(os.path.join(KiConf.dirname, SYM_LIB_TABLE))
         KiConf.loaded = True
 
+    def reset_project():
+        """ Forget the project data, the KiCad configuration is kept """
+        KiConf.loaded = False
+
     def find_kicad_common():
         """ Looks for kicad_common config file.
             Returns its name or None. """
@@ -372,8 +385,6 @@ class KiConf(object):
                     if GS.debug_level > 1:
                         logger.debug('Detected lib alias '+str(alias))
                     KiConf.lib_aliases[alias.name] = alias
-        # Load the project's table
-        KiConf.load_lib_aliases(os.path.join(KiConf.dirname, SYM_LIB_TABLE))
 
     def expand_env(name):
         return os.path.abspath(expand_env(un_quote(name), KiConf.kicad_env))
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+Parallel load of schematic sheets and libraries.
+The files are parsed by worker processes, the main process joins the results.
+The messages logged by the workers are repeated by the main process when it uses the result, so they are reported in
+the same order we get for a sequential load.
+"""
+import logging
+from multiprocessing import get_context, current_process
+from ..gs import GS
+from .. import log
+
+logger = log.get_logger()
+# Collects the messages of the job running in this worker process
+collector = None
+
+
+def use_jobs(n):
+    """ Is worth using worker processes to load `n` files? """
+    # Worker processes (i.e. batch mode) can't create more processes
+    return GS.jobs > 1 and n > 1 and not current_process().daemon
+
+
+def n_records():
+    """ Number of messages collected by the current job.
+        Used to mark places where the main process must insert its own messages, see JobResult.replay() """
+    return len(collector.records) if collector is not None else 0
+
+
+class LogCollector(logging.Handler):
+    """ Collects the logged messages, so the main process can repeat them """
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append((record.levelname.lower(), record.getMessage()))
+
+
+class JobResult(object):
+    def __init__(self, result, error, records, n_repeated):
+        super().__init__()
+        self.result = result
+        self.error = error
+        self.records = records
+        self.n_repeated = n_repeated
+        self.n_replayed = 0
+
+    def replay(self, n=None):
+        """ Repeats the messages not yet repeated, up to the first `n` (all when None) """
+        records = self.records[self.n_replayed:n]
+        self.n_replayed += len(records)
+        for level, msg in records:
+            getattr(logger, level)(msg)
+
+    def get(self):
+        """ Repeats the messages and returns the result (or raises the error).
+            The messages already repeated by replay() are skipped. """
+        self.replay()
+        # Warnings the worker didn't repeat
+        log.MyLogger.warn_tcnt += self.n_repeated
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+def _run_job(func, args):
+    """ Runs `func` inside a worker process """
+    # The messages are repeated by the main process, it applies the filters and counts them
+    global collector
+    collector = LogCollector()
+    # The logger used by the schematic modules, not log.get_logger(), the domain could change after importing them
+    logger.handlers = [collector]
+    log.set_filters(None)
+    log.MyLogger.warn_hash = {}
+    cnt = (log.MyLogger.warn_cnt, log.MyLogger.warn_tcnt)
+    result = error = None
+    try:
+        result = func(*args)
+    except (Exception, SystemExit) as e:
+        error = e
+    n_repeated = (log.MyLogger.warn_tcnt-cnt[1])-(log.MyLogger.warn_cnt-cnt[0])
+    return JobResult(result, error, collector.records, n_repeated)
+
+
+class Jobs(object):
+    """ Calls `func` for each set of arguments in `args` (a dict) using worker processes.
+        The results are available using the same keys. """
+    def __init__(self, func, args):
+        super().__init__()
+        logger.debug('Loading {} files using {} jobs'.format(len(args), min(GS.jobs, len(args))))
+        self.pool = get_context('fork').Pool(min(GS.jobs, len(args)))
+        self.results = {k: self.pool.apply_async(_run_job, (func, a)) for k, a in args.items()}
+        self.pool.close()
+
+    def __contains__(self, key):
+        return key in self.results
+
+    def get_result(self, key):
+        """ Waits for the JobResult, each result can be used only once """
+        return self.results.pop(key).get()
+
+    def get(self, key):
+        """ Waits for the result, each result can be used only once """
+        return self.get_result(key).get()
+
+    def close(self):
+        """ Stops the worker processes, the results we didn't use are discarded """
+        self.pool.terminate()
+        self.pool.join()
@@ -0,0 +1,703 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+KiCad PCB format (.kicad_pcb files, KiCad 5 and 6).
+A read-only model of the PCB, much faster and lighter than pcbnew.LoadBoard().
+Currently oriented to the outputs that just read data from the PCB: footprints, pads, tracks, vias, zone outlines and
+title block. The classes implement the subset of the pcbnew API used by these outputs, so they can use both.
+Coordinates are in internal units (nm) and angles in degrees. The footprint attributes use the KiCad 6 flags.
+Documentation: https://dev-docs.kicad.org/en/file-formats/sexpr-pcb/
+"""
+from math import sin, cos, radians, hypot
+from ..misc import MOD_THROUGH_HOLE, MOD_SMD, MOD_EXCLUDE_FROM_POS_FILES, MOD_EXCLUDE_FROM_BOM, MOD_BOARD_ONLY
+from .. import log
+from .v5_sch import SchError
+from .v6_sch import _check_is_symbol_list, _check_len, _check_float, _check_integer
+from .sexpdata import load, SExpData, Symbol
+
+logger = log.get_logger()
+IU_PER_MM = 1000000
+# Older files don't have the `through_hole` attribute, KiCad assumes it when no attribute is specified
+LEGACY_THT_VERSION = 20200826
+ATTRIBUTES = {'through_hole': MOD_THROUGH_HOLE,
+              'smd': MOD_SMD,
+              'exclude_from_pos_files': MOD_EXCLUDE_FROM_POS_FILES,
+              'exclude_from_bom': MOD_EXCLUDE_FROM_BOM,
+              'board_only': MOD_BOARD_ONLY,
+              # KiCad 5
+              'virtual': MOD_EXCLUDE_FROM_POS_FILES | MOD_EXCLUDE_FROM_BOM}
+
+
+def _round(v):
+    """ Rounds to an integer like KiCad does (KiROUND) """
+    return int(v+0.5) if v >= 0 else int(v-0.5)
+
+
+def _iu(mm):
+    return _round(mm*IU_PER_MM)
+
+
+def _norm_angle(angle):
+    """ KiCad 6 uses angles in the (-180, 180] range """
+    while angle <= -180:
+        angle += 360
+    while angle > 180:
+        angle -= 360
+    return angle
+
+
+def _rotate(x, y, angle):
+    """ Rotates a point, like KiCad RotatePoint() """
+    if not angle:
+        return x, y
+    a = radians(angle)
+    s = sin(a)
+    c = cos(a)
+    return x*c+y*s, y*c-x*s
+
+
+def _get_str(items, pos, name):
+    """ A string, KiCad 5 only uses quotes when needed, so we can also get symbols and numbers """
+    value = _check_len(items, pos, name)
+    if isinstance(value, Symbol):
+        return value.value()
+    if isinstance(value, list):
+        raise SchError('{} is not a string `{}`'.format(name, value))
+    return str(value)
+
+
+def _get_iu(items, pos, name):
+    return _iu(_check_float(items, pos, name))
+
+
+def _get_point(items, name):
+    return PCBPoint(_get_iu(items, 1, name+' x'), _get_iu(items, 2, name+' y'))
+
+
+def _get_pts(items, name):
+    """ Points from a `pts` list """
+    return [_get_point(p, name) for p in items[1:] if isinstance(p, list) and _check_is_symbol_list(p) == 'xy']
+
+
+def _get_lists(items):
+    """ The lists found in `items`, with their type, KiCad uses loose symbols for some flags (i.e. locked) """
+    return ((_check_is_symbol_list(i), i) for i in items if isinstance(i, list))
+
+
+def _rect(x, y, w2, h2):
+    """ Corners of a rectangle """
+    return [(x-w2, y-h2), (x+w2, y-h2), (x+w2, y+h2), (x-w2, y+h2)]
+
+
+class PCBPoint(object):
+    """ A point, can be used as a pcbnew.wxPoint or as a tuple """
+    __slots__ = ('x', 'y')
+
+    def __init__(self, x=0, y=0):
+        super().__init__()
+        self.x = x
+        self.y = y
+
+    def __iter__(self):
+        return iter((self.x, self.y))
+
+    def __eq__(self, other):
+        return tuple(self) == tuple(other)
+
+    def __hash__(self):
+        # Same as the tuple, they compare equal
+        return hash((self.x, self.y))
+
+    def __repr__(self):
+        return 'PCBPoint({}, {})'.format(self.x, self.y)
+
+
+class PCBRect(object):
+    """ A bounding box, like pcbnew.EDA_RECT """
+    __slots__ = ('x1', 'y1', 'x2', 'y2')
+
+    def __init__(self, x1=None, y1=None, x2=None, y2=None):
+        super().__init__()
+        self.x1 = x1
+        self.y1 = y1
+        self.x2 = x2
+        self.y2 = y2
+
+    @staticmethod
+    def from_points(points, angle=0, inflate=0):
+        """ Bounding box for the points, rotated and inflated """
+        rotated = [_rotate(x, y, angle) for x, y in points]
+        xs = [p[0] for p in rotated]
+        ys = [p[1] for p in rotated]
+        return PCBRect(min(xs)-inflate, min(ys)-inflate, max(xs)+inflate, max(ys)+inflate)
+
+    def Merge(self, other):
+        if other.x1 is None:
+            return
+        if self.x1 is None:
+            self.x1, self.y1, self.x2, self.y2 = other.x1, other.y1, other.x2, other.y2
+            return
+        self.x1 = min(self.x1, other.x1)
+        self.y1 = min(self.y1, other.y1)
+        self.x2 = max(self.x2, other.x2)
+        self.y2 = max(self.y2, other.y2)
+
+    def Move(self, x, y):
+        if self.x1 is not None:
+            self.x1 += x
+            self.y1 += y
+            self.x2 += x
+            self.y2 += y
+
+    def GetX(self):
+        return 0 if self.x1 is None else _round(self.x1)
+
+    def GetY(self):
+        return 0 if self.y1 is None else _round(self.y1)
+
+    def GetWidth(self):
+        return 0 if self.x1 is None else _round(self.x2)-_round(self.x1)
+
+    def GetHeight(self):
+        return 0 if self.y1 is None else _round(self.y2)-_round(self.y1)
+
+
+class PCBLibId(object):
+    """ Footprint identifier, like pcbnew.LIB_ID """
+    __slots__ = ('lib', 'name')
+
+    def __init__(self, fpid):
+        super().__init__()
+        self.lib, _, self.name = fpid.rpartition(':')
+
+    def GetLibNickname(self):
+        return self.lib
+
+    def GetLibItemName(self):
+        return self.name
+
+    def GetUniStringLibId(self):
+        return self.lib+':'+self.name if self.lib else self.name
+
+
+class PCBTitleBlock(object):
+    __slots__ = ('title', 'date', 'rev', 'company', 'comments')
+
+    def __init__(self):
+        super().__init__()
+        self.title = self.date = self.rev = self.company = ''
+        self.comments = {}
+
+    @staticmethod
+    def parse(items):
+        tb = PCBTitleBlock()
+        for i_type, i in _get_lists(items[1:]):
+            name = 'title_block '+i_type
+            if i_type == 'title':
+                tb.title = _get_str(i, 1, name)
+            elif i_type == 'date':
+                tb.date = _get_str(i, 1, name)
+            elif i_type == 'rev':
+                tb.rev = _get_str(i, 1, name)
+            elif i_type == 'company':
+                tb.company = _get_str(i, 1, name)
+            elif i_type == 'comment':
+                tb.comments[_check_integer(i, 1, name)] = _get_str(i, 2, name)
+        return tb
+
+    def GetTitle(self):
+        return self.title
+
+    def GetDate(self):
+        return self.date
+
+    def GetRevision(self):
+        return self.rev
+
+    def GetCompany(self):
+        return self.company
+
+    def GetComment(self, idx):
+        """ KiCad 6 API, the index starts at 0, but the file starts at 1 """
+        return self.comments.get(idx+1, '')
+
+    def GetComment1(self):
+        return self.GetComment(0)
+
+    def GetComment2(self):
+        return self.GetComment(1)
+
+    def GetComment3(self):
+        return self.GetComment(2)
+
+    def GetComment4(self):
+        return self.GetComment(3)
+
+
+class PCBPad(object):
+    __slots__ = ('parent', 'number', 'type', 'shape', 'pos', 'angle', 'size_x', 'size_y', 'drill_x', 'drill_y', 'offset_x',
+                 'offset_y', 'rratio', 'delta_x', 'delta_y', 'layers', 'net', 'net_name', 'anchor', 'primitives')
+
+    def __init__(self):
+        super().__init__()
+        self.parent = None
+        self.number = ''
+        self.type = self.shape = None
+        # Relative to the footprint
+        self.pos = None
+        # Absolute
+        self.angle = 0
+        self.size_x = self.size_y = 0
+        self.drill_x = self.drill_y = 0
+        self.offset_x = self.offset_y = 0
+        self.rratio = 0.25
+        self.delta_x = self.delta_y = 0
+        self.layers = []
+        self.net = 0
+        self.net_name = ''
+        self.anchor = 'circle'
+        # Custom pads: a list of (points, inflate)
+        self.primitives = []
+
+    def _parse_drill(self, items):
+        sizes = []
+        for i in items[1:]:
+            if isinstance(i, list):
+                if _check_is_symbol_list(i) == 'offset':
+                    self.offset_x = _get_iu(i, 1, 'pad offset x')
+                    self.offset_y = _get_iu(i, 2, 'pad offset y')
+            elif not isinstance(i, Symbol):
+                # The other option is the `oval` symbol, we know it from the sizes
+                sizes.append(_iu(i))
+        if sizes:
+            self.drill_x = sizes[0]
+            self.drill_y = sizes[1] if len(sizes) > 1 else sizes[0]
+
+    def _parse_primitives(self, items):
+        for i_type, i in _get_lists(items[1:]):
+            name = 'pad primitive '+i_type
+            points = []
+            width = 0
+            center = None
+            for s_type, s in _get_lists(i[1:]):
+                if s_type == 'pts':
+                    points.extend(tuple(p) for p in _get_pts(s, name))
+                elif s_type in ('start', 'mid', 'end'):
+                    points.append(tuple(_get_point(s, name)))
+                elif s_type == 'center':
+                    center = tuple(_get_point(s, name))
+                elif s_type == 'width':
+                    width = _get_iu(s, 1, name)
+                elif s_type == 'angle' and points:
+                    # KiCad 5 arc, the start is the center
+                    center = points.pop(0)
+            if i_type == 'gr_rect' and len(points) == 2:
+                (x1, y1), (x2, y2) = points
+                points = [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+            if center is not None:
+                # Circles and KiCad 5 arcs (approximated by its circle)
+                radius = max(hypot(x-center[0], y-center[1]) for x, y in points) if points else 0
+                self.primitives.append(([center], radius+width/2))
+            elif points:
+                self.primitives.append((points, width/2))
+
+    @staticmethod
+    def parse(items):
+        name = 'pad'
+        pad = PCBPad()
+        pad.number = _get_str(items, 1, name)
+        pad.type = _get_str(items, 2, name+' type')
+        pad.shape = _get_str(items, 3, name+' shape')
+        for i_type, i in _get_lists(items[4:]):
+            name = 'pad '+i_type
+            if i_type == 'at':
+                pad.pos = _get_point(i, name)
+                if len(i) > 3:
+                    pad.angle = _check_float(i, 3, name+' angle')
+            elif i_type == 'size':
+                pad.size_x = _get_iu(i, 1, name)
+                pad.size_y = _get_iu(i, 2, name)
+            elif i_type == 'drill':
+                pad._parse_drill(i)
+            elif i_type == 'layers':
+                pad.layers = [_get_str(i, c, name) for c in range(1, len(i))]
+            elif i_type == 'roundrect_rratio':
+                pad.rratio = _check_float(i, 1, name)
+            elif i_type == 'rect_delta':
+                pad.delta_x = _get_iu(i, 1, name)
+                pad.delta_y = _get_iu(i, 2, name)
+            elif i_type == 'net':
+                pad.net = _check_integer(i, 1, name)
+                pad.net_name = _get_str(i, 2, name)
+            elif i_type == 'options':
+                for o_type, o in _get_lists(i[1:]):
+                    if o_type == 'anchor':
+                        pad.anchor = _get_str(o, 1, name+' anchor')
+            elif i_type == 'primitives':
+                pad._parse_primitives(i)
+        if pad.pos is None:
+            raise SchError('Missing pad position `{}`'.format(items))
+        return pad
+
+    def get_local_bbox(self, fp_angle):
+        """ Bounding box, relative to the footprint, when the footprint isn't rotated """
+        angle = self.angle-fp_angle
+        w2 = self.size_x/2
+        h2 = self.size_y/2
+        ox = self.offset_x
+        oy = self.offset_y
+        shape = self.shape
+        if shape == 'circle' or (shape == 'custom' and self.anchor == 'circle'):
+            bbox = PCBRect.from_points([(ox, oy)], angle, w2)
+        elif shape == 'oval':
+            d = abs(w2-h2)
+            bbox = PCBRect.from_points([(ox-d, oy), (ox+d, oy)] if w2 > h2 else [(ox, oy-d), (ox, oy+d)], angle, min(w2, h2))
+        elif shape == 'roundrect':
+            r = min(self.size_x, self.size_y)*self.rratio
+            bbox = PCBRect.from_points(_rect(ox, oy, w2-r, h2-r), angle, r)
+        elif shape == 'trapezoid':
+            dx = self.delta_x/2
+            dy = self.delta_y/2
+            bbox = PCBRect.from_points([(ox-w2-dy, oy+h2+dx), (ox-w2+dy, oy-h2-dx), (ox+w2-dy, oy-h2+dx),
+                                        (ox+w2+dy, oy+h2-dx)], angle)
+        else:
+            # Rectangles and the rectangular anchor of custom pads
+            bbox = PCBRect.from_points(_rect(ox, oy, w2, h2), angle)
+        if shape == 'custom':
+            # The primitives are relative to the shape position
+            for points, inflate in self.primitives:
+                bbox.Merge(PCBRect.from_points([(x+ox, y+oy) for x, y in points], angle, inflate))
+        if self.drill_x:
+            hw = min(self.drill_x, self.drill_y)/2
+            d = abs(self.drill_x-self.drill_y)/2
+            seg = [(-d, 0), (d, 0)] if self.drill_x > self.drill_y else [(0, -d), (0, d)]
+            bbox.Merge(PCBRect.from_points(seg, angle, hw))
+        bbox.Move(self.pos.x, self.pos.y)
+        return bbox
+
+    def GetNumber(self):
+        return self.number
+
+    def GetNetCode(self):
+        return self.net
+
+    def GetNetname(self):
+        return self.net_name
+
+    def GetOrientationDegrees(self):
+        return self.angle
+
+    def GetPos0(self):
+        return self.pos
+
+    def GetPosition(self):
+        x, y = _rotate(self.pos.x, self.pos.y, self.parent.angle)
+        return PCBPoint(_round(x)+self.parent.pos.x, _round(y)+self.parent.pos.y)
+
+
+class PCBFootprint(object):
+    __slots__ = ('fpid', 'layer', 'pos', 'angle', 'attributes', 'reference', 'value', 'path', 'pads')
+
+    def __init__(self):
+        super().__init__()
+        self.fpid = None
+        self.layer = 'F.Cu'
+        self.pos = PCBPoint()
+        self.angle = 0
+        self.attributes = 0
+        self.reference = self.value = self.path = ''
+        self.pads = []
+
+    @staticmethod
+    def parse(items, version):
+        name = 'footprint'
+        fp = PCBFootprint()
+        fp.fpid = PCBLibId(_get_str(items, 1, name))
+        for i_type, i in _get_lists(items[2:]):
+            name = 'footprint '+i_type
+            if i_type == 'layer':
+                fp.layer = _get_str(i, 1, name)
+            elif i_type == 'at':
+                fp.pos = _get_point(i, name)
+                if len(i) > 3:
+                    fp.angle = _norm_angle(_check_float(i, 3, name+' angle'))
+            elif i_type == 'attr':
+                for a in i[1:]:
+                    fp.attributes |= ATTRIBUTES.get(a.value() if isinstance(a, Symbol) else a, 0)
+            elif i_type == 'fp_text' or i_type == 'property':
+                # KiCad 5/6 use fp_text, KiCad 7 uses properties
+                kind = _get_str(i, 1, name).lower()
+                if kind == 'reference':
+                    fp.reference = _get_str(i, 2, name)
+                elif kind == 'value':
+                    fp.value = _get_str(i, 2, name)
+            elif i_type == 'path':
+                fp.path = _get_str(i, 1, name)
+            elif i_type == 'pad':
+                pad = PCBPad.parse(i)
+                pad.parent = fp
+                fp.pads.append(pad)
+        if not fp.attributes and version < LEGACY_THT_VERSION:
+            fp.attributes = MOD_THROUGH_HOLE
+        return fp
+
+    def GetReference(self):
+        return self.reference
+
+    def GetValue(self):
+        return self.value
+
+    def GetFPID(self):
+        return self.fpid
+
+    def GetLayerName(self):
+        return self.layer
+
+    def IsFlipped(self):
+        return self.layer == 'B.Cu'
+
+    def GetOrientationDegrees(self):
+        return self.angle
+
+    def GetPosition(self):
+        return self.pos
+
+    def GetAttributes(self):
+        return self.attributes
+
+    def GetPath(self):
+        return self.path
+
+    def Pads(self):
+        return self.pads
+
+    def GetFpPadsLocalBbox(self):
+        """ Pads bounding box when the footprint is in the origin, not rotated and not flipped """
+        bbox = PCBRect()
+        for pad in self.pads:
+            bbox.Merge(pad.get_local_bbox(self.angle))
+        # The flipped footprints are mirrored, this doesn't change the size
+        return bbox
+
+
+class PCBTrack(object):
+    """ Tracks and arcs """
+    __slots__ = ('start', 'mid', 'end', 'width', 'layer', 'net')
+
+    def __init__(self):
+        super().__init__()
+        self.start = self.mid = self.end = None
+        self.width = 0
+        self.layer = ''
+        self.net = 0
+
+    @staticmethod
+    def parse(items):
+        track = PCBTrack()
+        for i_type, i in _get_lists(items[1:]):
+            name = 'track '+i_type
+            if i_type == 'start':
+                track.start = _get_point(i, name)
+            elif i_type == 'mid':
+                track.mid = _get_point(i, name)
+            elif i_type == 'end':
+                track.end = _get_point(i, name)
+            elif i_type == 'width':
+                track.width = _get_iu(i, 1, name)
+            elif i_type == 'layer':
+                track.layer = _get_str(i, 1, name)
+            elif i_type == 'net':
+                track.net = _check_integer(i, 1, name)
+        return track
+
+    def GetStart(self):
+        return self.start
+
+    def GetEnd(self):
+        return self.end
+
+    def GetWidth(self):
+        return self.width
+
+    def GetLayerName(self):
+        return self.layer
+
+    def GetNetCode(self):
+        return self.net
+
+
+class PCBVia(object):
+    __slots__ = ('type', 'pos', 'size', 'drill', 'layers', 'net')
+
+    def __init__(self):
+        super().__init__()
+        self.type = 'through'
+        self.pos = None
+        self.size = self.drill = 0
+        self.layers = []
+        self.net = 0
+
+    @staticmethod
+    def parse(items):
+        via = PCBVia()
+        for i in items[1:]:
+            if isinstance(i, Symbol):
+                # blind, micro, locked, etc.
+                if i.value() in ('blind', 'micro'):
+                    via.type = i.value()
+                continue
+            i_type = _check_is_symbol_list(i)
+            name = 'via '+i_type
+            if i_type == 'at':
+                via.pos = _get_point(i, name)
+            elif i_type == 'size':
+                via.size = _get_iu(i, 1, name)
+            elif i_type == 'drill':
+                via.drill = _get_iu(i, 1, name)
+            elif i_type == 'layers':
+                via.layers = [_get_str(i, c, name) for c in range(1, len(i))]
+            elif i_type == 'net':
+                via.net = _check_integer(i, 1, name)
+        return via
+
+    def GetPosition(self):
+        return self.pos
+
+    def GetWidth(self):
+        return self.size
+
+    def GetDrillValue(self):
+        return self.drill
+
+    def GetNetCode(self):
+        return self.net
+
+
+class PCBZone(object):
+    __slots__ = ('name', 'net', 'net_name', 'layers', 'outlines')
+
+    def __init__(self):
+        super().__init__()
+        self.name = ''
+        self.net = 0
+        self.net_name = ''
+        self.layers = []
+        # The filled polygons are skipped, just the outlines
+        self.outlines = []
+
+    @staticmethod
+    def parse(items):
+        zone = PCBZone()
+        for i_type, i in _get_lists(items[1:]):
+            name = 'zone '+i_type
+            if i_type == 'name':
+                zone.name = _get_str(i, 1, name)
+            elif i_type == 'net':
+                zone.net = _check_integer(i, 1, name)
+            elif i_type == 'net_name':
+                zone.net_name = _get_str(i, 1, name)
+            elif i_type == 'layer' or i_type == 'layers':
+                zone.layers = [_get_str(i, c, name) for c in range(1, len(i))]
+            elif i_type == 'polygon':
+                for p_type, p in _get_lists(i[1:]):
+                    if p_type == 'pts':
+                        zone.outlines.append(_get_pts(p, name))
+        return zone
+
+    def GetZoneName(self):
+        return self.name
+
+    def GetNetCode(self):
+        return self.net
+
+    def GetNetname(self):
+        return self.net_name
+
+
+class PCB(object):
+    def __init__(self, fname=None):
+        super().__init__()
+        self.fname = fname
+        self.version = 0
+        self.title_block = PCBTitleBlock()
+        self.layers = {}
+        self.nets = {}
+        self.aux_origin = PCBPoint()
+        self.footprints = []
+        self.tracks = []
+        self.vias = []
+        self.zones = []
+
+    def _parse_setup(self, items):
+        for i_type, i in _get_lists(items[1:]):
+            if i_type == 'aux_axis_origin':
+                self.aux_origin = _get_point(i, 'setup '+i_type)
+
+    @staticmethod
+    def load(fname):
+        with open(fname, 'rt') as fh:
+            error = None
+            try:
+                pcb = load(fh)[0]
+            except SExpData as e:
+                error = str(e)
+            if error:
+                raise SchError(error)
+        if not isinstance(pcb, list) or not isinstance(pcb[0], Symbol) or pcb[0].value() != 'kicad_pcb':
+            raise SchError('No kicad_pcb signature')
+        board = PCB(fname)
+        for e_type, e in _get_lists(pcb[1:]):
+            if e_type == 'version':
+                board.version = _check_integer(e, 1, 'version')
+            elif e_type == 'title_block':
+                board.title_block = PCBTitleBlock.parse(e)
+            elif e_type == 'layers':
+                for layer in e[1:]:
+                    board.layers[_check_integer(layer, 0, 'layer id')] = _get_str(layer, 1, 'layer name')
+            elif e_type == 'net':
+                board.nets[_check_integer(e, 1, 'net')] = _get_str(e, 2, 'net name')
+            elif e_type == 'setup':
+                board._parse_setup(e)
+            elif e_type == 'footprint' or e_type == 'module':
+                board.footprints.append(PCBFootprint.parse(e, board.version))
+            elif e_type == 'segment' or e_type == 'arc':
+                board.tracks.append(PCBTrack.parse(e))
+            elif e_type == 'via':
+                board.vias.append(PCBVia.parse(e))
+            elif e_type == 'zone':
+                board.zones.append(PCBZone.parse(e))
+        logger.debug('Loaded PCB `{}`: {} footprints, {} tracks, {} vias and {} zones'.
+                     format(fname, len(board.footprints), len(board.tracks), len(board.vias), len(board.zones)))
+        return board
+
+    def GetFileName(self):
+        return self.fname
+
+    def GetFootprints(self):
+        return self.footprints
+
+    def GetModules(self):
+        return self.footprints
+
+    def GetTracks(self):
+        """ Like pcbnew, the tracks and the vias """
+        return self.tracks+self.vias
+
+    def Zones(self):
+        return self.zones
+
+    def GetTitleBlock(self):
+        return self.title_block
+
+    def GetDesignSettings(self):
+        # We keep the design settings in the board
+        return self
+
+    def GetAuxOrigin(self):
+        return self.aux_origin
+
+    def GetNetsByNetcode(self):
+        return self.nets
@@ -11,12 +11,17 @@ Currently oriented to collect the components for the BoM.
 # Encapsulate file/line
 import re
 import os
+import json
+from sys import intern
+from hashlib import sha256
 from xml.etree.ElementTree import Element, SubElement, tostring
 from xml.dom import minidom
 from datetime import datetime
-from copy import deepcopy
+from copy import copy
+from shutil import copyfile
 from collections import OrderedDict
 from .config import KiConf, un_quote
+from .parallel_load import use_jobs, Jobs, n_records
 from ..gs import GS
 from ..misc import (W_BADPOLI, W_POLICOORDS, W_BADSQUARE, W_BADCIRCLE, W_BADARC, W_BADTEXT, W_BADPIN, W_BADCOMP, W_BADDRAW,
                     W_UNKDCM, W_UNKAR, W_ARNOPATH, W_ARNOREF, W_MISCFLD, W_EXTRASPC, W_NOLIB, W_INCPOS, W_NOANNO, W_MISSLIB,
@@ -38,6 +43,12 @@ class SchFileError(SchError):
         self.msg = msg
         self.code = code
 
+    def __reduce__(self):
+        # Used to send the errors found by the worker processes
+        reader = LineReader(None, self.file)
+        reader.line = self.line
+        return (self.__class__, (self.msg, self.code, reader))
+
 
 class SchLibError(SchFileError):
     def __init__(self, msg, code, reader):
@@ -144,6 +155,8 @@ class LibComponentField(object):
                           # Some generators seems to use it see #122
                           r'([LRCBT]\s*[IN]\s*[BN])\s*'  # 8 VJustify+Italic+Bold
                           r'("(?:[^\\]|(?:\\.))*")?')    # 9 Name for user fields
+    __slots__ = ('number', 'value', 'x', 'y', 'size', 'horizontal', 'visible', 'hjustify', 'vjustify', 'italic', 'bold',
+                 'name')
 
     def __init__(self):
         super().__init__()
@@ -169,7 +182,8 @@ class LibComponentField(object):
         field.italic = gs[8][1] == 'I'
         field.bold = gs[8][2] == 'B'
         if gs[9]:
-            field.name = gs[9][1:-1]
+            # The same names are used by a lot of fields
+            field.name = intern(gs[9][1:-1])
         else:
             if field.number > 3:
                 logger.warning(W_MISFLDNAME + 'Missing component field name ({} line {})'.format(lib_name, f.line))
@@ -200,6 +214,7 @@ class DrawPoligon(object):
                         r'(-?\d+)\s+'       # 3 Thickness (Components from 74xx.lib has polygons with -1000)
                         r'((?:-?\d+\s+)+)'  # 4 The points
                         r'([NFf])')         # 5 Normal, Filled
+    __slots__ = ('points', 'sub_part', 'convert', 'thickness', 'fill', 'coords')
 
     def __init__(self):
         super().__init__()
@@ -255,6 +270,7 @@ class DrawRectangle(object):
                         r'([012])\s+'   # 5 Which representation (0 == both) for DeMorgan
                         r'(\d+)\s+'     # 6 Thickness
                         r'([NFf])')     # 7 Normal, Filled
+    __slots__ = ('start_x', 'start_y', 'end_x', 'end_y', 'sub_part', 'convert', 'thickness', 'fill')
 
     def __init__(self):
         super().__init__()
@@ -298,6 +314,7 @@ class DrawCircle(object):
                         r'([012])\s+'   # 4 Which representation (0 == both) for DeMorgan
                         r'(\d+)\s+'     # 5 Thickness
                         r'([NFf])')     # 6 Normal, Filled
+    __slots__ = ('pos_x', 'pos_y', 'radius', 'sub_part', 'convert', 'thickness', 'fill')
 
     def __init__(self):
         super().__init__()
@@ -346,6 +363,8 @@ class DrawArc(object):
                         r'(-?\d+)\s+'   # 10 Start Pos Y
                         r'(-?\d+)\s+'   # 11 End Pos X
                         r'(-?\d+)')     # 12 End Pos Y
+    __slots__ = ('pos_x', 'pos_y', 'radius', 'start', 'end', 'sub_part', 'convert', 'thickness', 'fill', 'start_x',
+                 'start_y', 'end_x', 'end_y')
 
     def __init__(self):
         super().__init__()
@@ -401,6 +420,8 @@ class DrawText(object):
                         r'([01])\s+'                 # 9 Bold
                         r'([CLR])\s+'                # 10 HJustify
                         r'([CBT])')                  # 11 VJustify
+    __slots__ = ('orientation', 'pos_x', 'pos_y', 'size', 'type', 'sub_part', 'convert', 'text', 'italic', 'bold',
+                 'hjustify', 'vjustify')
 
     def __init__(self):
         super().__init__()
@@ -452,6 +473,8 @@ class Pin(object):
                         r'((?:\s+)\S+)?')   # 11 Graphic type
     type2name = {'I': 'input', 'O': 'output', 'B': 'BiDi', 'T': '3state', 'P': 'passive', 'U': 'unspc',
                  'W': 'power_in', 'w': 'power_out', 'C': 'openCol', 'E': 'openEm', 'N': 'NotConnected'}
+    __slots__ = ('name', 'number', 'pos_x', 'pos_y', 'len', 'dir', 'size_name', 'size_num', 'sub_part', 'convert',
+                 'type', 'gtype')
 
     def __init__(self):
         super().__init__()
@@ -653,6 +676,136 @@ class LibComponent(object):
 #         return s
 
 
+class LibIndex(object):
+    """ Index for a symbols library or a doc-lib.
+        Contains the offset and line number of each entry, so we can parse only the entries we need.
+        The index is stored in the user cache directory and validated using the size and date of the file. """
+    VERSION = 1
+    # Indexes already loaded in this run
+    _loaded = {}
+
+    def __init__(self, file, key, is_dcm):
+        super().__init__()
+        self.file = file
+        # Size and date of the indexed file
+        self.key = key
+        self.is_dcm = is_dcm
+        # [offset, line, names] for each entry, `names` is None for entries we must always parse (broken)
+        self.entries = []
+        # [offset, line] for an entry we don't know (or the end of file for a doc-lib), the load must fail there
+        self.error = None
+        # The end of file comment is missing (symbols library)
+        self.no_end = False
+
+    @staticmethod
+    def get(file, is_dcm=False):
+        """ Index for `file`, from the cache if the file didn't change """
+        st = os.stat(file)
+        key = [st.st_mtime_ns, st.st_size]
+        file = os.path.abspath(file)
+        index = LibIndex._loaded.get(file)
+        if index is not None and index.key == key:
+            return index
+        index = LibIndex(file, key, is_dcm)
+        name = os.path.join(GS.get_cache_dir('libs'), sha256(file.encode()).hexdigest()+'.json')
+        if not GS.sch_cache or not index.load(name):
+            index.scan()
+            if GS.sch_cache:
+                index.save(name)
+        LibIndex._loaded[file] = index
+        return index
+
+    def load(self, name):
+        try:
+            with open(name, 'rt') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('version') != self.VERSION or data.get('key') != self.key or data.get('file') != self.file:
+            return False
+        logger.debug('Using the index `{}` for `{}`'.format(name, self.file))
+        self.entries = data['entries']
+        self.error = data['error']
+        self.no_end = data['no_end']
+        return True
+
+    def save(self, name):
+        data = {'version': self.VERSION, 'key': self.key, 'file': self.file, 'entries': self.entries, 'error': self.error,
+                'no_end': self.no_end}
+        tmp = '{}.{}.tmp'.format(name, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(name), exist_ok=True)
+            with open(tmp, 'wt') as f:
+                json.dump(data, f)
+            os.replace(tmp, name)
+        except OSError as e:
+            logger.debug('Unable to save the index for `{}`: {}'.format(self.file, e))
+
+    def scan(self):
+        """ Finds the entries without parsing them.
+            Mimics the way SymLib and DocLib read the file. """
+        logger.debug('Indexing `{}`'.format(self.file))
+        if self.is_dcm:
+            start, end, lib_end = '$CMP', '$ENDCMP', ('#End Doc Library',)
+        else:
+            start, end, lib_end = 'DEF', 'ENDDEF', ('#End Library', '# End Library')
+        pos = 0
+        n_line = 0
+        entry = None
+        block = None
+        with open(self.file, 'rb') as fh:
+            # Skip the signature, checked by the loader
+            pos += len(fh.readline())
+            n_line += 1
+            for raw in fh:
+                line = raw.decode(errors='replace').rstrip()
+                if entry is None:
+                    # Looking for an entry
+                    if line.startswith(lib_end):
+                        return
+                    if line[:1] != '#':
+                        if not line.startswith(start):
+                            self.error = [pos, n_line]
+                            return
+                        if self.is_dcm:
+                            names = [line[5:].lstrip()]
+                        else:
+                            m = LibComponent.def_re.match(line)
+                            names = [m.group(1)[1:] if m.group(1)[0] == '~' else m.group(1)] if m else None
+                        entry = [pos, n_line, names]
+                        self.entries.append(entry)
+                elif block is not None:
+                    # Inside a list of footprints or the drawings
+                    if line.startswith(block):
+                        block = None
+                elif line.startswith(end):
+                    entry = None
+                elif self.is_dcm:
+                    pass
+                elif line.startswith('ALIAS'):
+                    if entry[2] is not None:
+                        entry[2] = entry[2][:1]+_split_space(line[6:])
+                elif line.startswith('$FPLIST'):
+                    block = '$ENDFPLIST'
+                elif line.startswith('DRAW'):
+                    block = 'ENDDRAW'
+                pos += len(raw)
+                n_line += 1
+        if entry is not None:
+            # Truncated, parse it to get the error
+            entry[2] = None
+        elif self.is_dcm:
+            # The doc-lib reader fails here
+            self.error = [pos, n_line]
+        else:
+            self.no_end = True
+
+    def seek(self, f, pos, line):
+        """ Moves the reader `f` to the `pos` offset, `line` is the number of lines before it """
+        f.f.seek(pos)
+        f.line = line
+
+
 class SymLib(object):
     """ Content from a symbols library """
     def __init__(self):
@@ -680,33 +833,40 @@ class SymLib(object):
         return False
 
     def load(self, file, lib_alias, needed):
-        """ Populates the class, file must exist """
+        """ Populates the class, file must exist.
+            Only the components in `needed` are parsed, we use an index to find them. """
         logger.debug('Loading library `{}`'.format(file))
         with open(file, 'rt') as fh:
             f = LibLineReader(fh, file)
             line = f.get_line()
             if not line.startswith('EESchema-LIBRARY'):
                 raise SchLibError('Missing library signature', line, f)
-            line = f.get_line()
-            translate = {k.replace(':', '_'): k for k, v in needed.items() if v is None} if lib_alias is None else None
-            while not (line.startswith('#End Library') or line.startswith('# End Library')):
-                if line.startswith('DEF'):
-                    o = LibComponent(line, f, file)
-                    if o.name:
-                        # Only add components we need
-                        if self._check_add(o, o.name, lib_alias, needed, translate):
-                            self.comps[o.name] = o
-                        if o.alias and lib_alias is not None:
-                            for a in o.alias:
-                                if self._check_add(o, a, lib_alias, needed, translate):
-                                    self.alias[a] = o
-                else:
-                    raise SchLibError('Unknown library entry', line, f)
-                try:
-                    line = f.get_line()
-                except SchLibError:
-                    logger.warning(W_NOENDLIB + 'Library without end of file comment: `{}`'.format(file))
-                    break
+            index = LibIndex.get(file)
+            if lib_alias is None:
+                # From a cache, we just look for the names
+                translate = {k.replace(':', '_'): k for k, v in needed.items() if v is None}
+                wanted = set(translate.keys())
+            else:
+                translate = None
+                wanted = {k.split(':', 1)[1] for k in needed.keys() if k.startswith(lib_alias+':') or k.startswith('None:')}
+            for pos, n_line, names in index.entries:
+                if names is not None and (names[0] not in wanted if lib_alias is None else wanted.isdisjoint(names)):
+                    continue
+                index.seek(f, pos, n_line)
+                o = LibComponent(f.get_line(), f, file)
+                if o.name:
+                    # Only add components we need
+                    if self._check_add(o, o.name, lib_alias, needed, translate):
+                        self.comps[o.name] = o
+                    if o.alias and lib_alias is not None:
+                        for a in o.alias:
+                            if self._check_add(o, a, lib_alias, needed, translate):
+                                self.alias[a] = o
+            if index.error:
+                index.seek(f, *index.error)
+                raise SchLibError('Unknown library entry', f.get_line(), f)
+            if index.no_end:
+                logger.warning(W_NOENDLIB + 'Library without end of file comment: `{}`'.format(file))
 
 
 class DocLibEntry(object):
@@ -742,30 +902,37 @@ class DocLib(object):
         super().__init__()
         self.comps = OrderedDict()
 
-    def load(self, file):
-        """ Populates the class, file must exist """
+    def load(self, file, needed=None):
+        """ Populates the class, file must exist.
+            When we get a set of `needed` names we parse only these entries. """
         logger.debug('Loading doc-lib `{}`'.format(file))
         with open(file, 'rb') as fh:
             f = DCMLineReader(fh, file)
             line = f.get_line()
             if not line.startswith('EESchema-DOCLIB'):
                 raise SchLibError('Missing DCM signature', line, f)
-            line = f.get_line()
-            while not line.startswith('#End Doc Library'):
-                if line.startswith('$CMP'):
-                    o = DocLibEntry(line[5:].lstrip(), f)
-                    self.comps[o.name] = o
-                    if GS.debug_level > 1:
-                        logger.debug('- '+repr(o))
-                else:
-                    raise SchLibError('Unknown DCM entry', line, f)
+            index = LibIndex.get(file, is_dcm=True)
+            for pos, n_line, names in index.entries:
+                if needed is not None and names is not None and names[0] not in needed:
+                    continue
+                index.seek(f, pos, n_line)
                 line = f.get_line()
+                o = DocLibEntry(line[5:].lstrip(), f)
+                self.comps[o.name] = o
+                if GS.debug_level > 1:
+                    logger.debug('- '+repr(o))
+            if index.error:
+                # Note: get_line raises an error if this is the end of file
+                index.seek(f, *index.error)
+                raise SchLibError('Unknown DCM entry', f.get_line(), f)
 
 
 class SchematicField(object):
     # F n "text" orientation posx posy dimension flags hjustify vjustify/italic/bold "name"
     field_re = re.compile(r'F\s*(\d+)\s+"((?:[^\\]|(?:\\.))*)"\s+([HV])\s+(-?\d+)\s+(-?\d+)\s+(\d+)\s+(\d+)'
                           r'\s+([LRCBT])\s+([LRCBT][IN][BN])\s*("(?:[^\\]|(?:\\.))*")?')
+    __slots__ = ('number', 'value', 'name', 'horizontal', 'x', 'y', 'size', 'flags', 'hjustify', 'vjustify', 'italic',
+                 'bold')
 
     def __init__(self):
         super().__init__()
@@ -798,7 +965,8 @@ class SchematicField(object):
         field.italic = gs[8][1] == 'I'
         field.bold = gs[8][2] == 'B'
         if gs[9]:
-            field.name = gs[9][1:-1]
+            # The same names are used by a lot of fields
+            field.name = intern(gs[9][1:-1])
         else:
             if field.number > 3:
                 raise SchFileError('Missing component field name', line, f)
@@ -818,6 +986,8 @@ class SchematicField(object):
 
 
 class SchematicAltRef():
+    __slots__ = ('path', 'ref', 'part')
+
     def __init__(self):
         super().__init__()
         self.path = None
@@ -876,6 +1046,12 @@ class SchematicComponent(object):
         - qty: amount of this part used.
         """
     ref_re = re.compile(r'([^\d]+)([\?\d]+)')
+    # No __dict__, all the attributes used by the components, including the ones added by the outputs, must be here
+    __slots__ = ('field_ref', 'value', 'footprint', 'datasheet', 'desc', 'fields', 'dfields', 'fields_bkp', 'dfields_bkp',
+                 'fields_changed', 'fitted', 'included', 'fixed', 'bottom', 'footprint_rot', 'footprint_x', 'footprint_y',
+                 'footprint_w', 'footprint_h', 'qty', 'annotation_error', 'smd', 'virtual', 'tht', 'name', 'lib', 'unit',
+                 'unit2', 'id', 'x', 'y', 'matrix', 'ar', 'ref', 'ref_prefix', 'ref_suffix', 'f_ref', 'is_power',
+                 'footprint_lib', 'project', 'sheet_path', 'sheet_path_h', 'ref_id', 'value_sort')
 
     def __init__(self):
         super().__init__()
@@ -886,8 +1062,10 @@ class SchematicComponent(object):
         self.desc = ''
         self.fields = []
         self.dfields = {}
+        # Original fields, shared with `fields` until a filter changes them (copy-on-write)
         self.fields_bkp = None
         self.dfields_bkp = None
+        self.fields_changed = False
         # Will be computed
         self.fitted = True
         self.included = True
@@ -897,6 +1075,9 @@ class SchematicComponent(object):
         self.footprint_x = self.footprint_y = 0
         self.footprint_w = self.footprint_h = 0
         self.qty = 1
+        # Added by the BoM: prefix for the reference and parsed value (see comp_match())
+        self.ref_id = ''
+        self.value_sort = None
         self.annotation_error = False
         # KiCad 5 PCB flags (mutually exclusive)
         self.smd = False
@@ -924,7 +1105,7 @@ class SchematicComponent(object):
         """ Change the value for an existing field """
         field_lc = field.lower()
         if field_lc in self.dfields:
-            target = self.dfields[field_lc]
+            target = self._writable_field(field_lc)
             target.value = value
             # Adjust special fields
             if target.number < 4:
@@ -945,28 +1126,75 @@ class SchematicComponent(object):
         return [(f.name, f.value) for f in self.fields if f.number > 3]
 
     def add_field(self, field):
+        self._start_fields_change()
         self.fields.append(field)
-        self.dfields[field.name.lower()] = field
+        self.dfields[intern(field.name.lower())] = field
 
     def rename_field(self, old_name, new_name):
         old_name = old_name.lower()
-        field = self.dfields[old_name]
+        field = self._writable_field(old_name)
         field.name = new_name
         del self.dfields[old_name]
-        self.dfields[new_name.lower()] = field
+        self.dfields[intern(new_name.lower())] = field
+
+    def _start_fields_change(self):
+        """ Makes `fields` and `dfields` private copies of the back-up, so we can add or remove fields """
+        if self.fields_bkp is not None and not self.fields_changed:
+            self.fields = list(self.fields_bkp)
+            self.dfields = dict(self.dfields_bkp)
+            self.fields_changed = True
+
+    def _writable_field(self, field_lc):
+        """ Returns the field named `field_lc`, ready to be modified.
+            The fields in the back-up are never modified, we replace them by a copy. """
+        field = self.dfields[field_lc]
+        if self.dfields_bkp is None or self.dfields_bkp.get(field_lc) is not field:
+            # Not in the back-up, we can modify it
+            return field
+        self._start_fields_change()
+        new_field = copy(field)
+        self.fields[next(i for i, f in enumerate(self.fields) if f is field)] = new_field
+        self.dfields[field_lc] = new_field
+        return new_field
 
     def back_up_fields(self):
         """ First call makes a back-up of the fields.
-            Next calls restores the back-up. """
-        if self.fields_bkp:
+            Next calls restores the back-up.
+            The back-up shares the field objects, they are copied only when changed. """
+        if self.fields_bkp is not None:
             # We have a back-up, restore from it
-            self.fields = deepcopy(self.fields_bkp)
-            self.dfields = {f.name.lower(): f for f in self.fields}
-            self._solve_fields(LineReader(None, '**Internal**'))
+            if self.fields_changed:
+                self.fields = self.fields_bkp
+                self.dfields = self.dfields_bkp
+                self.fields_changed = False
+                self._solve_fields(LineReader(None, '**Internal**'))
         else:
             # No back-up. Make one for the next reset
-            self.fields_bkp = deepcopy(self.fields)
-            self.dfields_bkp = {f.name.lower(): f for f in self.fields_bkp}
+            self.fields_bkp = self.fields
+            self.dfields_bkp = self.dfields
+
+    def is_modified(self):
+        """ True when the filters changed something we save in a variant: crossed component or changed fields """
+        # The filters always start making a back-up of the fields, so `fields_changed` is reliable
+        return self.fields_changed or not (self.fitted or not self.included)
+
+    def get_state(self):
+        """ Current values for the attributes, including the ones changed by the filters """
+        state = {}
+        for cls in type(self).__mro__:
+            for attr in cls.__dict__.get('__slots__', ()):
+                if hasattr(self, attr):
+                    state[attr] = getattr(self, attr)
+        state['fields'] = list(self.fields)
+        state['dfields'] = dict(self.dfields)
+        return state
+
+    def set_state(self, state):
+        """ Restores the values returned by get_state() """
+        for attr, value in state.items():
+            setattr(self, attr, value)
+        self.fields = list(state['fields'])
+        self.dfields = dict(state['dfields'])
 
     def _solve_ref(self, path):
         """ Look for the correct reference for this path.
@@ -1125,24 +1353,44 @@ class SchematicComponent(object):
         while not line.startswith('$EndComp'):
             line = f.get_line()
         comp._solve_fields(f)
-        comp.ref = comp._solve_ref(sheet_path)
+        if sheet_path is not None:
+            comp._solve_instance(sheet_path, sheet_path_h, f)
+        return comp
+
+    def _solve_instance(self, sheet_path, sheet_path_h, f):
+        """ Fills the data that depends on the sheet instance """
+        self.ref = self._solve_ref(sheet_path)
         # Power, ground or power flag
-        comp.is_power = comp.ref.startswith('#PWR') or comp.ref.startswith('#FLG')
-        if comp.ref[-1] == '?':
-            logger.warning(W_NOANNO + 'Component {} is not annotated'.format(comp))
-            comp.annotation_error = True
+        self.is_power = self.ref.startswith('#PWR') or self.ref.startswith('#FLG')
+        if self.ref[-1] == '?':
+            logger.warning(W_NOANNO + 'Component {} is not annotated'.format(self))
+            self.annotation_error = True
         # Separate the reference in its components
-        m = SchematicComponent.ref_re.match(comp.ref)
+        m = SchematicComponent.ref_re.match(self.ref)
         if not m:
-            raise SchFileError('Malformed component reference', comp.ref, f)
-        comp.ref_prefix, comp.ref_suffix = m.groups()
+            raise SchFileError('Malformed component reference', self.ref, f)
+        self.ref_prefix, self.ref_suffix = m.groups()
         # Location in the project
-        comp.sheet_path = sheet_path
-        comp.sheet_path_h = sheet_path_h
+        self.sheet_path = sheet_path
+        self.sheet_path_h = sheet_path_h
         if GS.debug_level > 1:
-            logger.debug("- Loaded component {}".format(comp))
+            logger.debug("- Loaded component {}".format(self))
         # Report abnormal situations
-        comp._validate()
+        self._validate()
+
+    def copy_for_instance(self):
+        """ Creates a copy of this component for another instance of the same sheet.
+            Only the fields are copied, the rest of the data is shared. """
+        comp = copy(self)
+        comp.fields = [copy(f) for f in self.fields]
+        comp.dfields = {f.name.lower(): f for f in comp.fields}
+        return comp
+
+    def instantiate(self, sheet_path, sheet_path_h):
+        """ A copy of this component using the data for another instance of the same sheet """
+        comp = self.copy_for_instance()
+        comp.annotation_error = False
+        comp._solve_instance(sheet_path, sheet_path_h, LineReader(None, '**Internal**'))
         return comp
 
     def write(self, f, crossed=False):
@@ -1169,6 +1417,7 @@ class SchematicComponent(object):
 
 class SchematicConnection(object):
     conn_re = re.compile(r'\s*~\s+(-?\d+)\s+(-?\d+)')
+    __slots__ = ('connect', 'x', 'y')
 
     def __init__(self):
         super().__init__()
@@ -1191,6 +1440,7 @@ class SchematicConnection(object):
 class SchematicText(object):
     label_re = re.compile(r'Text\s+(Notes|HLabel|GLabel|Label)\s+(-?\d+)\s+(-?\d+)\s+(\d)\s+(\d+)\s+(\S+)')
     TYPES = ['Notes', 'HLabel', 'GLabel', 'Label']
+    __slots__ = ('type', 'x', 'y', 'orient', 'size', 'shape', 'italic', 'thickness', 'text')
 
     def __init__(self):
         super().__init__()
@@ -1246,6 +1496,7 @@ class SchematicWire(object):
     ENTRY_BUS = 4
     ENTRIES = {'Wire': ENTRY_WIRE, 'Bus': ENTRY_BUS}
     NAMES = ['Wire Wire Line', 'Wire Bus Line', 'Wire Notes Line', 'Entry Wire Line', 'Entry Bus Bus']
+    __slots__ = ('width', 'rgb', 'style', 'type', 'x', 'y', 'ex', 'ey')
 
     def __init__(self, width=None, style=None, rgb=None):
         super().__init__()
@@ -1478,6 +1729,41 @@ class SchematicSheet(object):
         f.write('$EndSheet\n')
 
 
+def _load_sheet_template(fname, project):
+    """ Loads a sheet without its sub-sheets and without solving the instance data.
+        Used by the worker processes, see Schematic.load() """
+    sch = Schematic()
+    sch.load(fname, project, sheet_path=None)
+    # Only used by the root sheet
+    del sch.sheet_templates
+    del sch.sheet_jobs
+    return sch
+
+
+def _load_lib(file, lib_alias, needed):
+    """ Loads a library and its doc-lib.
+        Returns them and the components found. Can be used by a worker process. """
+    if os.path.isfile(file):
+        lib = SymLib()
+        lib.load(file, lib_alias, needed)
+    else:
+        logger.warning(W_MISSLIB + 'Missing library `{}` ({})'.format(file, lib_alias))
+        lib = None
+    # Load doc-lib
+    file = os.path.splitext(file)[0]+'.dcm'
+    if os.path.isfile(file):
+        dcm = DocLib()
+        # Only the used components and the ones loaded from the library
+        dcm_needed = {n.split(':', 1)[1] for n in needed.keys() if n.startswith(lib_alias+':')}
+        if lib is not None:
+            dcm_needed.update(lib.comps.keys())
+            dcm_needed.update(lib.alias.keys())
+        dcm.load(file, dcm_needed)
+    else:
+        dcm = None
+    return lib, dcm, {k: v for k, v in needed.items() if v is not None}
+
+
 def _path(p):
     if not p.startswith('/'):
         p = '/'+p
@@ -1487,6 +1773,8 @@ def _path(p):
 
 
 class Schematic(object):
+    sheet_file_re = re.compile(r'^F1\s+"(.*?)"\s+\d+\s*$', re.M)
+
     def __init__(self):
         super().__init__()
         self.dcms = {}
@@ -1535,10 +1823,86 @@ class Schematic(object):
                     raise SchFileError('Wrong entry in title block', line, f)
                 self.title_block[m.group(1)] = m.group(2)
 
+    @classmethod
+    def _find_sub_sheets(cls, fname):
+        """ Looks for the files used by the sub-sheets, without parsing them """
+        pending = [os.path.abspath(fname)]
+        found = set(pending)
+        files = []
+        while pending:
+            file = pending.pop()
+            try:
+                with open(file, 'rt') as f:
+                    names = cls.sheet_file_re.findall(f.read())
+            except (OSError, UnicodeDecodeError):
+                # Reported when we load it
+                continue
+            for name in names:
+                name = os.path.abspath(os.path.join(os.path.dirname(file), name))
+                if name not in found and os.path.isfile(name):
+                    found.add(name)
+                    files.append(name)
+                    pending.append(name)
+        return files
+
+    def _start_sheet_jobs(self, fname, project):
+        """ Starts loading the sub-sheets using worker processes """
+        files = self._find_sub_sheets(fname)
+        return Jobs(_load_sheet_template, {f: (f, project) for f in files}) if use_jobs(len(files)) else None
+
+    def _join(self, result, sheet_path, sheet_path_h, libs, fields, fields_lc, parent):
+        """ Uses a sheet loaded by a worker process, joining it with the data collected by the main process """
+        if result.error is not None:
+            # Repeats the messages and raises the error
+            result.get()
+        loaded = result.result
+        self.__dict__.update(loaded.__dict__)
+        del self.log_marks
+        for lib in loaded.libs.keys():
+            libs[lib] = None
+        for name in loaded.fields:
+            name_lc = name.lower()
+            if name_lc not in fields_lc:
+                fields.append(name)
+                fields_lc.add(name_lc)
+        self.libs = libs
+        self.fields = fields
+        self.fields_lc = fields_lc
+        self.sheet_path = sheet_path
+        self.sheet_path_h = sheet_path_h
+        f = LineReader(None, self.fname)
+        for c, n in zip(self.components, loaded.log_marks):
+            # Messages from the worker, up to the point where a sequential load solves the instance
+            result.replay(n)
+            c._solve_instance(sheet_path, sheet_path_h, f)
+            if c.annotation_error:
+                self.annotation_error = True
+        result.get()
+        self._load_sub_sheets(parent)
+
     def load(self, fname, project, sheet_path='', sheet_path_h='/', libs=None, fields=None, fields_lc=None, parent=None):
         """ Load a v5.x KiCad Schematic.
             The caller must be sure the file exists.
-            Only the schematics are loaded not the libs. """
+            Only the schematics are loaded not the libs.
+            When `sheet_path` is None we load a template, without sub-sheets and instance data. """
+        if parent is not None:
+            if not self._use_loaded(fname, sheet_path, sheet_path_h, libs, fields, fields_lc, parent):
+                self._load(fname, project, sheet_path, sheet_path_h, libs, fields, fields_lc, parent)
+            return
+        # Sheets already loaded, used for sheets with more than one instance
+        self.sheet_templates = {}
+        # Sub-sheets loaded by worker processes
+        self.sheet_jobs = self._start_sheet_jobs(fname, project) if sheet_path is not None else None
+        try:
+            self._load(fname, project, sheet_path, sheet_path_h, libs, fields, fields_lc, parent)
+        finally:
+            # Also when a sheet fails to load, so we don't leave the workers behind
+            if self.sheet_jobs is not None:
+                self.sheet_jobs.close()
+                self.sheet_jobs = None
+
+    def _load(self, fname, project, sheet_path, sheet_path_h, libs, fields, fields_lc, parent):
+        """ Loads the sheet, see load() """
         logger.debug("Loading sheet from "+fname)
         self.fname = fname
         if libs is None:
@@ -1555,23 +1919,7 @@ class Schematic(object):
         self.sheet_path_h = sheet_path_h
         with open(fname, 'rt') as fh:
             f = SCHLineReader(fh, fname)
-            line = f.get_line()
-            m = re.match(r'EESchema Schematic File Version (\d+)', line)
-            if not m:
-                raise SchFileError('No eeschema signature', line, f)
-            self.version = int(m.group(1))
-            line = f.get_line()
-            if line.startswith('LIBS'):
-                # LIBS is optional and can be skipped
-                line = f.get_line()
-            m = re.match(r'EELAYER (\d+) (\d+)', line)
-            if not m:
-                raise SchFileError('Missing EELAYER', line, f)
-            self.eelayer_n = int(m.group(1))
-            self.eelayer_m = int(m.group(2))
-            line = f.get_line()
-            if not line.startswith('EELAYER END'):
-                raise SchFileError('Missing EELAYER END', line, f)
+            self._get_header(f)
             # Load the title block
             self._get_title_block(f)
             # Fill in some missing info
@@ -1590,12 +1938,17 @@ class Schematic(object):
             self.wires = []
             self.bitmaps = []
             self.sheets = []
+            if sheet_path is None:
+                # Messages collected by the worker when each component was loaded, used by _join()
+                self.log_marks = []
             while not line.startswith('$EndSCHEMATC'):
                 if line.startswith('$Comp'):
                     obj = SchematicComponent.load(f, project, sheet_path, sheet_path_h, libs, fields, fields_lc)
                     if obj.annotation_error:
                         self.annotation_error = True
                     self.components.append(obj)
+                    if sheet_path is None:
+                        self.log_marks.append(n_records())
                 elif line.startswith('NoConn'):
                     obj = SchematicConnection.parse(False, line[7:], f)
                     self.conn.append(obj)
@@ -1618,16 +1971,78 @@ class Schematic(object):
                     raise SchFileError('Unknown definition', line, f)
                 self.all.append(obj)
                 line = f.get_line()
-            # Load sub-sheets
-            self.sub_sheets = []
+            if sheet_path is None:
+                # Just a template
+                return
             if parent is None:
                 self.all_sheets = [self]
-            for sch in self.sheets:
-                sheet = sch.load_sheet(project, fname, sheet_path, sheet_path_h, libs, fields, fields_lc,
-                                       self if parent is None else parent)
-                if sheet.annotation_error:
-                    self.annotation_error = True
-                self.sub_sheets.append(sheet)
+            self._load_sub_sheets(self if parent is None else parent)
+
+    def _get_header(self, f):
+        line = f.get_line()
+        m = re.match(r'EESchema Schematic File Version (\d+)', line)
+        if not m:
+            raise SchFileError('No eeschema signature', line, f)
+        self.version = int(m.group(1))
+        line = f.get_line()
+        if line.startswith('LIBS'):
+            # LIBS is optional and can be skipped
+            line = f.get_line()
+        m = re.match(r'EELAYER (\d+) (\d+)', line)
+        if not m:
+            raise SchFileError('Missing EELAYER', line, f)
+        self.eelayer_n = int(m.group(1))
+        self.eelayer_m = int(m.group(2))
+        line = f.get_line()
+        if not line.startswith('EELAYER END'):
+            raise SchFileError('Missing EELAYER END', line, f)
+
+    def _use_loaded(self, fname, sheet_path, sheet_path_h, libs, fields, fields_lc, parent):
+        """ Uses an already loaded sheet, or the one loaded by a worker process.
+            Returns False if we must load the sheet. """
+        abs_fname = os.path.abspath(fname)
+        template = parent.sheet_templates.get(abs_fname)
+        if template is not None:
+            logger.debug("Using the already loaded "+fname)
+            self._instantiate(template, sheet_path, sheet_path_h, parent)
+            return True
+        parent.sheet_templates[abs_fname] = self
+        if parent.sheet_jobs is None or abs_fname not in parent.sheet_jobs:
+            return False
+        self._join(parent.sheet_jobs.get_result(abs_fname), sheet_path, sheet_path_h, libs, fields, fields_lc, parent)
+        return True
+
+    def _load_sub_sheets(self, parent):
+        self.sub_sheets = []
+        for sch in self.sheets:
+            sheet = sch.load_sheet(self.project, self.fname, self.sheet_path, self.sheet_path_h, self.libs, self.fields,
+                                   self.fields_lc, parent)
+            if sheet.annotation_error:
+                self.annotation_error = True
+            self.sub_sheets.append(sheet)
+
+    def _instantiate(self, template, sheet_path, sheet_path_h, parent):
+        """ Creates a new instance of an already loaded sheet.
+            The components and sub-sheets are copied, the rest of the data is shared. """
+        self.__dict__.update(template.__dict__)
+        self.sheet_path = sheet_path
+        self.sheet_path_h = sheet_path_h
+        self.annotation_error = False
+        new_objs = {}
+        self.components = []
+        for c in template.components:
+            comp = c.instantiate(sheet_path, sheet_path_h)
+            if comp.annotation_error:
+                self.annotation_error = True
+            self.components.append(comp)
+            new_objs[id(c)] = comp
+        self.sheets = []
+        for s in template.sheets:
+            sheet = copy(s)
+            self.sheets.append(sheet)
+            new_objs[id(s)] = sheet
+        self.all = [new_objs.get(id(o), o) for o in template.all]
+        self._load_sub_sheets(parent)
 
     def get_files(self):
         """ A list of the names for all the sheets, including this one.
@@ -1693,28 +2108,21 @@ class Schematic(object):
         if GS.debug_level > 1:
             logger.debug("Components before loading: "+str(self.comps_data))
         # Load the libraries and descriptions
-        for k, v in self.libs.items():
-            if v:
-                # Load library
-                if os.path.isfile(v):
-                    o = SymLib()
-                    o.load(v, k, self.comps_data)
-                else:
-                    logger.warning(W_MISSLIB + 'Missing library `{}` ({})'.format(v, k))
-                    o = None
-                self.lib_comps[k] = o
-                # Load doc-lib
-                file = os.path.splitext(v)[0]+'.dcm'
-                if os.path.isfile(file):
-                    o = DocLib()
-                    o.load(file)
+        files = {k: (v, k, self.comps_data) for k, v in self.libs.items() if v}
+        jobs = Jobs(_load_lib, files) if use_jobs(len(files)) else None
+        try:
+            for k, v in self.libs.items():
+                if v:
+                    lib, dcm, found = jobs.get(k) if jobs is not None else _load_lib(v, k, self.comps_data)
+                    self.comps_data.update(found)
                 else:
-                    o = None
-                self.dcms[k] = o
-            else:
-                # Mark as None if we don't know the file
-                self.lib_comps[k] = None
-                self.dcms[k] = None
+                    # Mark as None if we don't know the file
+                    lib = dcm = None
+                self.lib_comps[k] = lib
+                self.dcms[k] = dcm
+        finally:
+            if jobs is not None:
+                jobs.close()
         # Do we have all the components?
         if next((k for k, v in self.comps_data.items() if v is None), None) is not None:
             cache_name = fname.replace('.sch', '-cache.lib')
@@ -1754,9 +2162,22 @@ class Schematic(object):
                     logger.warning(W_MISSCMP + 'Missing component `{}`'.format(k))
             f.write('#\n#End Library\n')
 
+    def variant_changed(self):
+        """ True if the variant version of this sheet (without its sub-sheets) isn't the original file """
+        # All the components use the y/n libs and the sub-sheets with paths are flattened
+        return bool(self.components) or any('/' in sch.file for sch in self.sheets)
+
+    def copy_original(self, fname):
+        """ Saves a sheet that doesn't need changes, just a copy of the original file """
+        logger.debug('Copying unchanged schematic: `{}`'.format(fname))
+        if os.path.isfile(fname):
+            GS.make_bkp(fname)
+        copyfile(self.fname, fname)
+
     def save(self, fname=None, dest_dir=None, base_sheet=None, saved=None):
         """ Save the schematic and its sub-sheets.
-            If dest_dir is not None all files are stored in dest_dir (for variants). """
+            If dest_dir is not None all files are stored in dest_dir (for variants).
+            In this case the sheets without changes are just copied. """
         if base_sheet is None:
             # We are the base sheet
             base_sheet = self
@@ -1775,7 +2196,10 @@ class Schematic(object):
             # Save all in dest_dir (variant)
             fname = os.path.join(dest_dir, fname)
         # Save the sheet
-        if fname not in saved:
+        if fname not in saved and dest_dir is not None and not self.variant_changed():
+            self.copy_original(fname)
+            saved.add(fname)
+        elif fname not in saved:
             logger.debug('Saving schematic: `{}`'.format(fname))
             # Keep a back-up of existing files
             if os.path.isfile(fname):
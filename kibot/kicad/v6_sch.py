@@ -12,12 +12,14 @@ Documentation: https://dev-docs.kicad.org/en/file-formats/sexpr-schematic/
 # Encapsulate file/line
 import os
 import re
-from collections import OrderedDict
+from copy import copy
+from sys import intern
 from ..gs import GS
 from .. import log
 from ..misc import W_NOLIB, W_UNKFLD, W_MISSCMP
 from .v5_sch import SchError, SchematicComponent, Schematic
-from .sexpdata import load, SExpData, Symbol, dumps, Sep
+from .sexpdata import load, SExpData, Symbol, Sep, SExpWriter
+from .parallel_load import use_jobs, Jobs
 
 logger = log.get_logger()
 CROSSED_LIB = 'kibot_crossed'
@@ -134,6 +136,8 @@ def _get_at(items, pos, name):
 
 
 class Point(object):
+    __slots__ = ('x', 'y')
+
     def __init__(self, items):
         super().__init__()
         self.x = _check_float(items, 1, 'x coord')
@@ -145,6 +149,8 @@ class Point(object):
 
 
 class PointXY(object):
+    __slots__ = ('x', 'y')
+
     def __init__(self, x, y):
         super().__init__()
         self.x = x
@@ -152,6 +158,8 @@ class PointXY(object):
 
 
 class Box(object):
+    __slots__ = ('x1', 'y1', 'x2', 'y2', 'set')
+
     def __init__(self, points=None):
         self.x1 = self.y1 = self.x2 = self.y2 = 0
         self.set = False
@@ -208,6 +216,8 @@ def _get_points(items):
 
 class FontEffects(object):
     """ Class used to describe text attributes """
+    __slots__ = ('hide', 'w', 'h', 'thickness', 'bold', 'italic', 'hjustify', 'vjustify', 'mirror')
+
     def __init__(self):
         super().__init__()
         self.hide = False
@@ -316,6 +326,8 @@ class FontEffects(object):
 
 
 class Color(object):
+    __slots__ = ('r', 'g', 'b', 'a')
+
     def __init__(self, items=None):
         super().__init__()
         if items:
@@ -336,6 +348,8 @@ class Color(object):
 
 
 class Stroke(object):
+    __slots__ = ('width', 'type', 'color')
+
     def __init__(self):
         super().__init__()
         self.width = 0
@@ -365,6 +379,8 @@ class Stroke(object):
 
 
 class Fill(object):
+    __slots__ = ('type', 'color')
+
     def __init__(self):
         super().__init__()
         self.type = None
@@ -394,6 +410,8 @@ class Fill(object):
 
 
 class DrawArcV6(object):
+    __slots__ = ('start', 'mid', 'end', 'stroke', 'fill', 'box')
+
     def __init__(self):
         super().__init__()
         self.start = None
@@ -433,6 +451,8 @@ class DrawArcV6(object):
 
 
 class DrawCircleV6(object):
+    __slots__ = ('center', 'radius', 'stroke', 'fill', 'box')
+
     def __init__(self):
         super().__init__()
         self.center = None
@@ -470,6 +490,8 @@ class DrawCircleV6(object):
 
 
 class DrawRectangleV6(object):
+    __slots__ = ('start', 'end', 'stroke', 'fill', 'box')
+
     def __init__(self):
         super().__init__()
         self.start = None
@@ -506,6 +528,8 @@ class DrawRectangleV6(object):
 
 class DrawCurve(object):
     """ Qubic Bezier """
+    __slots__ = ('points', 'stroke', 'fill', 'box')
+
     def __init__(self):
         super().__init__()
         self.points = []
@@ -540,6 +564,8 @@ class DrawCurve(object):
 
 
 class DrawPolyLine(object):
+    __slots__ = ('points', 'stroke', 'fill', 'box')
+
     def __init__(self):
         super().__init__()
         self.points = []
@@ -574,6 +600,8 @@ class DrawPolyLine(object):
 
 
 class DrawTextV6(object):
+    __slots__ = ('text', 'x', 'y', 'ang', 'effects', 'box')
+
     def __init__(self):
         super().__init__()
         self.text = None
@@ -601,6 +629,9 @@ def _get_effects(items, pos, name):
 
 
 class PinV6(object):
+    __slots__ = ('type', 'gtype', 'name', 'number', 'pos_x', 'pos_y', 'ang', 'len', 'name_effects', 'number_effects',
+                 'hide', 'box')
+
     def __init__(self):
         super().__init__()
         self.type = self.gtype = self.name = self.number = ''
@@ -671,6 +702,8 @@ class SchematicFieldV6(object):
     # 2 Footprint
     # 3 Datasheet
     # Reserved names: ki_keywords, ki_description, ki_locked, ki_fp_filters
+    __slots__ = ('name', 'value', 'number', 'x', 'y', 'ang', 'effects', 'hide')
+
     def __init__(self, name='', value='', id=0, x=0, y=0, ang=0):
         super().__init__()
         self.name = name
@@ -688,7 +721,8 @@ class SchematicFieldV6(object):
         #    _check_len_total(items, 5, 'property')
         print("Delka pole items", len(items), items)
         field = SchematicFieldV6()
-        field.name = _check_str(items, 1, 'field name')
+        # The same names are used by a lot of fields
+        field.name = intern(_check_str(items, 1, 'field name'))
         field.value = _check_str(items, 2, 'field value')
         field.number = _get_id(items, 3, 'field id')
         field.x, field.y, field.ang = _get_at(items, 4, 'field')
@@ -708,8 +742,26 @@ class SchematicFieldV6(object):
         return _symbol('property', data)
 
 
+def _lazy_member(name):
+    """ Property for the LibComponent members filled by load_pending() """
+    def get(self):
+        if self.pending is not None:
+            self.load_pending()
+        return getattr(self, name)
+    return property(get)
+
+
 class LibComponent(object):
+    # Filled by the graphic items, which are parsed on first access
+    draw = _lazy_member('_draw')
+    box = _lazy_member('_box')
+    units = _lazy_member('_units')
+    unit_count = _lazy_member('_unit_count')
+    pins = _lazy_member('_pins')
+    all_pins = _lazy_member('_all_pins')
     unit_regex = re.compile(r'^(.*)_(\d+)_(\d+)$')
+    # Items only needed to draw the symbol, can be parsed later (see load_pending)
+    graphic_items = {'arc', 'circle', 'gr_curve', 'polyline', 'rectangle', 'text', 'pin', 'symbol'}
     cross_color = Color()
     cross_stroke = Stroke()
     cross_stroke.width = 0.6
@@ -726,16 +778,18 @@ class LibComponent(object):
         self.on_board = False
         self.is_power = False
         self.unit = 0
-        self.draw = []
+        self._draw = []
         self.fields = []
         self.dfields = {}
-        self.box = Box()
+        self._box = Box()
         self.alias = None
         self.dcm = None
         self.fp_list = None
         # This member is used to generate crossed components (DNF).
         # When defined means we need to add a cross in this box and then reset the box.
         self.cross_box = None
+        # Graphic items not yet parsed
+        self.pending = None
 
     def get_field_value(self, field):
         field = field.lower()
@@ -744,7 +798,9 @@ class LibComponent(object):
         return ''
 
     @staticmethod
-    def load(c, project, parent=None):  # noqa: C901
+    def load(c, project, parent=None, lazy=False):
+        """ Loads a library symbol.
+            When `lazy` is True the graphic items are just stored, see load_pending() """
         if not isinstance(c, list):
             raise SchError('Library component definition is not a list')
         if len(c) < 3:
@@ -768,15 +824,22 @@ class LibComponent(object):
         else:
             if parent is None:
                 logger.warning(W_NOLIB + "Component `{}` with more than one `:`".format(comp.name))
-        comp.units = []
-        comp.pins = []
-        comp.all_pins = []
-        comp.unit_count = 1
+        comp._units = []
+        comp._pins = []
+        comp._all_pins = []
+        comp._unit_count = 1
+        comp.parent = parent
+        if lazy:
+            comp.pending = []
         # Variable list
         for i in c[2:]:
             i_type = _check_is_symbol_list(i)
-            vis_obj = None
-            if i_type == 'pin_numbers':
+            if i_type in LibComponent.graphic_items:
+                if lazy:
+                    comp.pending.append((i, i_type))
+                else:
+                    comp.load_graphic(i, i_type)
+            elif i_type == 'pin_numbers':
                 comp.pin_numbers_hide = _check_hide(i, 1, i_type)
             elif i_type == 'pin_names':
                 value = _check_len(i, 1, i_type)
@@ -802,54 +865,67 @@ class LibComponent(object):
                 field = SchematicFieldV6.parse(i)
                 comp.fields.append(field)
                 comp.dfields[field.name.lower()] = field
-            # GRAPHIC_ITEMS...
-            elif i_type == 'arc':
-                vis_obj = DrawArcV6.parse(i)
-                comp.draw.append(vis_obj)
-            elif i_type == 'circle':
-                vis_obj = DrawCircleV6.parse(i)
-                comp.draw.append(vis_obj)
-            elif i_type == 'gr_curve':
-                vis_obj = DrawCurve.parse(i)
-                comp.draw.append(vis_obj)
-            elif i_type == 'polyline':
-                vis_obj = DrawPolyLine.parse(i)
-                comp.draw.append(vis_obj)
-            elif i_type == 'rectangle':
-                vis_obj = DrawRectangleV6.parse(i)
-                comp.draw.append(vis_obj)
-            elif i_type == 'text':
-                comp.draw.append(DrawTextV6.parse(i))
-            # PINS...
-            elif i_type == 'pin':
-                vis_obj = PinV6.parse(i)
-                comp.pins.append(vis_obj)
-                if parent:
-                    parent.all_pins.append(vis_obj)
-            # UNITS...
-            elif i_type == 'symbol':
-                # They use a special naming scheme:
-                # 1) A symbol without real units:
-                #    - *_0_1 the body
-                #    - *_1_1 the pins
-                # 2) A symbol with real units:
-                #    - Each unit is *_N_* where N is the unit starting from 1
-                #    - If the unit has alternative drawing they are *_N_1 and *_N_2
-                #    - If the unit doesn't have alternative we have *_N_x x starts from 0
-                #      Pins and drawings can be in _N_0 and/or _N_1
-                vis_obj = LibComponent.load(i, project, parent=comp if parent is None else parent)
-                comp.units.append(vis_obj)
-                m = LibComponent.unit_regex.search(vis_obj.lib_id)
-                if m is None:
-                    raise SchError('Malformed unit id `{}`'.format(vis_obj.lib_id))
-                unit = int(m.group(2))
-                comp.unit_count = max(unit, comp.unit_count)
             else:
                 raise SchError('Unknown symbol attribute `{}`'.format(i))
-            if vis_obj:
-                comp.box.union(vis_obj.box)
         return comp
 
+    def load_pending(self):
+        """ Parses the graphic items skipped by a lazy load """
+        pending = self.pending
+        self.pending = None
+        if pending:
+            for i, i_type in pending:
+                self.load_graphic(i, i_type)
+
+    def load_graphic(comp, i, i_type):
+        # Note: we use the real members, the properties could call load_pending() again
+        vis_obj = None
+        parent = comp.parent
+        # GRAPHIC_ITEMS...
+        if i_type == 'arc':
+            vis_obj = DrawArcV6.parse(i)
+            comp._draw.append(vis_obj)
+        elif i_type == 'circle':
+            vis_obj = DrawCircleV6.parse(i)
+            comp._draw.append(vis_obj)
+        elif i_type == 'gr_curve':
+            vis_obj = DrawCurve.parse(i)
+            comp._draw.append(vis_obj)
+        elif i_type == 'polyline':
+            vis_obj = DrawPolyLine.parse(i)
+            comp._draw.append(vis_obj)
+        elif i_type == 'rectangle':
+            vis_obj = DrawRectangleV6.parse(i)
+            comp._draw.append(vis_obj)
+        elif i_type == 'text':
+            comp._draw.append(DrawTextV6.parse(i))
+        # PINS...
+        elif i_type == 'pin':
+            vis_obj = PinV6.parse(i)
+            comp._pins.append(vis_obj)
+            if parent:
+                parent._all_pins.append(vis_obj)
+        # UNITS...
+        elif i_type == 'symbol':
+            # They use a special naming scheme:
+            # 1) A symbol without real units:
+            #    - *_0_1 the body
+            #    - *_1_1 the pins
+            # 2) A symbol with real units:
+            #    - Each unit is *_N_* where N is the unit starting from 1
+            #    - If the unit has alternative drawing they are *_N_1 and *_N_2
+            #    - If the unit doesn't have alternative we have *_N_x x starts from 0
+            #      Pins and drawings can be in _N_0 and/or _N_1
+            vis_obj = LibComponent.load(i, comp.project, parent=comp if parent is None else parent)
+            comp._units.append(vis_obj)
+            m = LibComponent.unit_regex.search(vis_obj.lib_id)
+            if m is None:
+                raise SchError('Malformed unit id `{}`'.format(vis_obj.lib_id))
+            unit = int(m.group(2))
+            comp._unit_count = max(unit, comp._unit_count)
+        if vis_obj:
+            comp._box.union(vis_obj.box)
+
     def assign_crosses(self):
         """ Compute the box for the crossed components """
         name0 = self.name+"_0"
@@ -924,11 +1000,14 @@ class LibComponent(object):
 
 
 class SchematicComponentV6(SchematicComponent):
+    __slots__ = ('in_bom', 'on_board', 'pins', 'unit_specified', 'local_name', 'fields_autoplaced', 'mirror', 'lib_id', 'ang',
+                 'uuid', 'parent_sheet', 'lib_symbol')
+
     def __init__(self):
         super().__init__()
         self.in_bom = False
         self.on_board = False
-        self.pins = OrderedDict()
+        self.pins = {}
         self.unit = 1
         self.unit_specified = False
         self.ref = None
@@ -1090,6 +1169,8 @@ def _get_uuid(items, pos, where):
 
 
 class Junction(object):
+    __slots__ = ('pos_x', 'pos_y', 'ang', 'diameter', 'color', 'uuid')
+
     @staticmethod
     def parse(items):
         _check_len_total(items, 5, 'junction')
@@ -1123,6 +1204,8 @@ class BusAlias(object):
 
 
 class NoConnect(object):
+    __slots__ = ('pos_x', 'pos_y', 'ang', 'uuid')
+
     @staticmethod
     def parse(items):
         _check_len_total(items, 3, 'no_connect')
@@ -1138,6 +1221,8 @@ class NoConnect(object):
 
 
 class BusEntry(object):
+    __slots__ = ('pos_x', 'pos_y', 'ang', 'size', 'stroke', 'uuid')
+
     @staticmethod
     def parse(items):
         _check_len_total(items, 5, 'bus entry')
@@ -1158,6 +1243,8 @@ class BusEntry(object):
 
 
 class SchematicWireV6(object):
+    __slots__ = ('type', 'points', 'stroke', 'uuid')
+
     @staticmethod
     def parse(items, name):
         _check_len_total(items, 4, name)
@@ -1203,6 +1290,8 @@ class SchematicBitmapV6(object):
 
 
 class Text(object):
+    __slots__ = ('name', 'text', 'pos_x', 'pos_y', 'ang', 'effects', 'uuid')
+
     @staticmethod
     def parse(items, name):
         #_check_len_total(items, 5, name)
@@ -1273,6 +1362,8 @@ class GlobalLabel(object):
 
 
 class HierarchicalLabel(object):
+    __slots__ = ('text', 'shape', 'pos_x', 'pos_y', 'ang', 'effects', 'uuid')
+
     @staticmethod
     def parse(items):
         name = 'hierarchical_label'
@@ -1297,6 +1388,8 @@ class HierarchicalLabel(object):
 class HSPin(object):
     """ Hierarchical Sheet Pin """
     # TODO base class with HierarchicalLabel
+    __slots__ = ('name', 'type', 'pos_x', 'pos_y', 'ang', 'effects', 'uuid')
+
     @staticmethod
     def parse(items):
         name = 'hierarchical sheet pin'
@@ -1395,6 +1488,8 @@ class Sheet(object):
 
 
 class SheetInstance(object):
+    __slots__ = ('path', 'page')
+
     @staticmethod
     def parse(items):
         name = 'sheet instance'
@@ -1412,6 +1507,8 @@ class SheetInstance(object):
 
 
 class SymbolInstance(object):
+    __slots__ = ('path', 'reference', 'unit', 'value', 'footprint', 'component')
+
     @staticmethod
     def parse(items):
         name = 'symbol instance'
@@ -1505,7 +1602,46 @@ def _add_items_list(name, items, sch):
     sch.extend([Sep(), _symbol(name, data), Sep()])
 
 
+def _lazy_list(name):
+    """ Property for the items we parse only when needed """
+    def get(self):
+        if self._pending is not None:
+            self._load_pending()
+        return self._lists[name]
+    return property(get)
+
+
+def _parse_file(fname):
+    """ Parses a schematic file, can be used by a worker process """
+    with open(fname, 'rt') as fh:
+        error = None
+        try:
+            sch = load(fh)[0]
+        except SExpData as e:
+            error = str(e)
+        if error:
+            raise SchError(error)
+    return sch
+
+
 class SchematicV6(Schematic):
+    # Only needed to save the schematic, parsed on first access
+    lib_symbols = _lazy_list('lib_symbols')
+    junctions = _lazy_list('junctions')
+    no_conn = _lazy_list('no_conn')
+    bus_entry = _lazy_list('bus_entry')
+    wires = _lazy_list('wires')
+    bitmaps = _lazy_list('bitmaps')
+    # Parsers for the lazy items
+    graphic_items = {'junction': ('junctions', Junction.parse),
+                     'no_connect': ('no_conn', NoConnect.parse),
+                     'bus_entry': ('bus_entry', BusEntry.parse),
+                     'bus': ('wires', lambda e: SchematicWireV6.parse(e, 'bus')),
+                     'wire': ('wires', lambda e: SchematicWireV6.parse(e, 'wire')),
+                     'polyline': ('wires', lambda e: SchematicWireV6.parse(e, 'polyline')),
+                     'image': ('bitmaps', SchematicBitmapV6.parse)}
+    sheet_file_re = re.compile(r'\(property\s+"Sheet file"\s+"((?:[^"\\]|\\.)*)"')
+
     def __init__(self):
         super().__init__()
         self.annotation_error = False
@@ -1561,10 +1697,21 @@ class SchematicV6(Schematic):
         if not isinstance(comps, list):
             raise SchError('The lib symbols is not a list')
         for c in comps[1:]:
-            obj = LibComponent.load(c, self.project)
-            self.lib_symbols.append(obj)
+            # The graphics aren't needed to get the components, load them later
+            obj = LibComponent.load(c, self.project, lazy=True)
+            self._lists['lib_symbols'].append(obj)
             self.lib_symbol_names[obj.lib_id] = obj
 
+    def _load_pending(self):
+        """ Parses the items skipped by load() """
+        pending = self._pending
+        self._pending = None
+        for s in self._lists['lib_symbols']:
+            s.load_pending()
+        for e, e_type in pending:
+            name, parser = SchematicV6.graphic_items[e_type]
+            self._lists[name].append(parser(e))
+
     def path_to_human(self, path):
         """ Converts a UUID path into something we can read """
         if path == '/':
@@ -1623,58 +1770,10 @@ class SchematicV6(Schematic):
             # Save all in dest_dir (variant)
             fname = os.path.join(dest_dir, fname)
         # Save the sheet
-        if fname not in saved:
-            sch = [Symbol('kicad_sch')]
-            sch.append(_symbol('version', [self.version]))
-            sch.append(_symbol('generator', [Symbol(self.generator)]))
-            sch.append(Sep())
-            sch.append(Sep())
-            sch.append(_symbol('uuid', [Symbol(self.uuid)]))
-            sch.extend(self.write_paper())
-            if self.title_ori is not None:
-                sch.extend(self.write_title_block())
-            sch.extend(self.write_lib_symbols(cross))
-            # Bus aliases
-            _add_items(self.bus_alias, sch)
-            # Connections (aka Junctions)
-            _add_items(self.junctions, sch, pre_sep=(len(self.bus_alias) == 0))
-            # No connect
-            _add_items(self.no_conn, sch)
-            # Bus entry
-            _add_items(self.bus_entry, sch)
-            # Lines (wire, bus and polyline)
-            if self.wires:
-                old_type = 'none'
-                for e in self.wires:
-                    if e.type != old_type and old_type != 'wire':
-                        sch.append(Sep())
-                    sch.append(e.write())
-                    old_type = e.type
-                    sch.append(Sep())
-            # Images
-            _add_items(self.bitmaps, sch)
-            # Texts
-            _add_items(self.texts, sch)
-            # Labels
-            _add_items(self.labels, sch)
-            # Global Labels
-            _add_items(self.glabels, sch)
-            # Hierarchical Labels
-            _add_items(self.hlabels, sch)
-            # Symbols
-            _add_items(self.symbols, sch, sep=True, cross=cross)
-            # Sheets
-            _add_items(self.sheets, sch, sep=True, cross=cross)
-            # Sheet instances
-            _add_items_list('sheet_instances', self.sheet_instances, sch)
-            # Symbol instances
-            # Copy potentially modified data from components
-            for s in self.symbol_instances:
-                comp = s.component
-                s.reference = comp.ref
-                s.value = comp.value
-                s.footprint = comp.footprint_lib+':'+comp.footprint if comp.footprint_lib else comp.footprint
-            _add_items_list('symbol_instances', self.symbol_instances, sch)
+        if fname not in saved and cross and not self.variant_changed():
+            self.copy_original(fname)
+            saved.add(fname)
+        elif fname not in saved:
             logger.debug('Saving schematic: `{}`'.format(fname))
             # Keep a back-up of existing files
             if os.path.isfile(fname):
@@ -1683,13 +1782,76 @@ class SchematicV6(Schematic):
                     os.remove(bkp)
                 os.rename(fname, bkp)
             with open(fname, 'wt') as f:
-                f.write(dumps(sch))
+                # Each element is written as soon as we add it, no need to create the whole file in memory
+                sch = SExpWriter(f)
+                sch.open()
+                self._write_sheet(sch, cross)
+                sch.close()
+                sch.flush()
                 f.write('\n')
             saved.add(fname)
         for sch in self.sheets:
             if sch.sch:
                 sch.sch.save(sch.flat_file if cross else sch.file, dest_dir, base_sheet, saved)
 
+    def variant_changed(self):
+        # The sub-sheets use flat names, the root has the instances for all the symbols
+        return bool(self.sheets) or any(c.is_modified() for c in self.symbols)
+
+    def _write_sheet(self, sch, cross):
+        """ Adds the sheet elements to `sch`, used like a list """
+        sch.append(Symbol('kicad_sch'))
+        sch.append(_symbol('version', [self.version]))
+        sch.append(_symbol('generator', [Symbol(self.generator)]))
+        sch.append(Sep())
+        sch.append(Sep())
+        sch.append(_symbol('uuid', [Symbol(self.uuid)]))
+        sch.extend(self.write_paper())
+        if self.title_ori is not None:
+            sch.extend(self.write_title_block())
+        sch.extend(self.write_lib_symbols(cross))
+        # Bus aliases
+        _add_items(self.bus_alias, sch)
+        # Connections (aka Junctions)
+        _add_items(self.junctions, sch, pre_sep=(len(self.bus_alias) == 0))
+        # No connect
+        _add_items(self.no_conn, sch)
+        # Bus entry
+        _add_items(self.bus_entry, sch)
+        # Lines (wire, bus and polyline)
+        if self.wires:
+            old_type = 'none'
+            for e in self.wires:
+                if e.type != old_type and old_type != 'wire':
+                    sch.append(Sep())
+                sch.append(e.write())
+                old_type = e.type
+                sch.append(Sep())
+        # Images
+        _add_items(self.bitmaps, sch)
+        # Texts
+        _add_items(self.texts, sch)
+        # Labels
+        _add_items(self.labels, sch)
+        # Global Labels
+        _add_items(self.glabels, sch)
+        # Hierarchical Labels
+        _add_items(self.hlabels, sch)
+        # Symbols
+        _add_items(self.symbols, sch, sep=True, cross=cross)
+        # Sheets
+        _add_items(self.sheets, sch, sep=True, cross=cross)
+        # Sheet instances
+        _add_items_list('sheet_instances', self.sheet_instances, sch)
+        # Symbol instances
+        # Copy potentially modified data from components
+        for s in self.symbol_instances:
+            comp = s.component
+            s.reference = comp.ref
+            s.value = comp.value
+            s.footprint = comp.footprint_lib+':'+comp.footprint if comp.footprint_lib else comp.footprint
+        _add_items_list('symbol_instances', self.symbol_instances, sch)
+
     def save_variant(self, dest_dir):
         fname = os.path.basename(self.fname)
         self.save(fname, dest_dir)
@@ -1706,10 +1868,57 @@ class SchematicV6(Schematic):
         fparts = os.path.splitext(file)
         sch.flat_file = fparts[0]+'_'+str(len(self.sheet_names))+fparts[1]
 
-    def load(self, fname, project, parent=None):  # noqa: C901
+    def _instantiate(self, template, parent):
+        """ Creates a new instance of an already loaded sheet.
+            The symbols and sub-sheets are copied, the rest of the data is shared. """
+        sheet_path = self.sheet_path
+        sheet_path_h = self.sheet_path_h
+        self.__dict__.update(template.__dict__)
+        self.sheet_path = sheet_path
+        self.sheet_path_h = sheet_path_h
+        self.parent = parent
+        # Each instance parses the graphic items when needed
+        self._lists = {k: list(v) for k, v in template._lists.items()}
+        self._pending = None if template._pending is None else list(template._pending)
+        self.components = []
+        self.symbols = []
+        self.symbol_uuids = {}
+        for s in template.symbols:
+            comp = s.copy_for_instance()
+            comp.parent_sheet = self
+            self.symbols.append(comp)
+            self.symbol_uuids[comp.uuid] = comp
+        self.sheets = []
+        for s in template.sheets:
+            sheet = copy(s)
+            self.sheets.append(sheet)
+            self._create_flat_name(sheet)
+        for sch in self.sheets:
+            sch.sch = sch.load_sheet(self.project, self.fname, self)
+
+    def load(self, fname, project, parent=None):
         """ Load a v6.x KiCad Schematic.
             The caller must be sure the file exists.
             Only the schematics are loaded not the libs. """
+        if parent is not None:
+            self._load(fname, project, parent)
+            return
+        # Sub-sheets parsed by worker processes
+        self.sheet_jobs = None
+        files = self._find_sub_sheets(fname)
+        if use_jobs(len(files)):
+            self.sheet_jobs = Jobs(_parse_file, {f: (f,) for f in files})
+        try:
+            self._load(fname, project, parent)
+        finally:
+            # Also when a sheet fails to load, so we don't leave the workers behind
+            if self.sheet_jobs is not None:
+                self.sheet_jobs.close()
+                for sheet in self.sheet_paths.values():
+                    sheet.sheet_jobs = None
+
+    def _load(self, fname, project, parent):  # noqa: C901
+        """ Loads the sheet, see load() """
         logger.debug("Loading sheet from "+fname)
         if parent is None:
             self.fields = ['part']
@@ -1719,24 +1928,33 @@ class SchematicV6(Schematic):
             self.sheet_path = '/'
             self.sheet_path_h = '/'
             self.sheet_names = {}
+            # Sheets already loaded, used for sheets with more than one instance
+            self.sheet_templates = {}
         else:
+            template = parent.sheet_templates.get(os.path.abspath(fname))
+            # Only the root sheet should have symbol instances
+            if template is not None and not template.symbol_instances:
+                logger.debug("Using the already loaded "+fname)
+                self._instantiate(template, parent)
+                return
+            parent.sheet_templates[os.path.abspath(fname)] = self
             self.fields = parent.fields
             self.fields_lc = parent.fields_lc
             self.sheet_paths = parent.sheet_paths
             self.lib_symbol_names = parent.lib_symbol_names
             self.sheet_names = parent.sheet_names
+            self.sheet_templates = parent.sheet_templates
+            self.sheet_jobs = parent.sheet_jobs
             # self.sheet_path is set by sch.load_sheet
         self.parent = parent
         self.fname = fname
         self.project = project
-        self.lib_symbols = []
+        # lib_symbols, junctions (connect), no_conn, bus_entry, wires and bitmaps
+        self._lists = {name: [] for name in ('lib_symbols', 'junctions', 'no_conn', 'bus_entry', 'wires', 'bitmaps')}
+        # Items not yet parsed (see _lazy_list)
+        self._pending = []
         self.symbols = []
         self.components = []
-        self.junctions = []  # Connect
-        self.no_conn = []
-        self.bus_entry = []
-        self.wires = []
-        self.bitmaps = []
         self.texts = []
         self.labels = []
         self.glabels = []
@@ -1751,14 +1969,11 @@ class SchematicV6(Schematic):
         # If we don't want to expand the schematic this member should be shared with the parent
         # TODO: We must fix some UUIDs because now we expanded them.
         self.symbol_uuids = {}
-        with open(fname, 'rt') as fh:
-            error = None
-            try:
-                sch = load(fh)[0]
-            except SExpData as e:
-                error = str(e)
-            if error:
-                raise SchError(error)
+        if self.sheet_jobs is not None and os.path.abspath(fname) in self.sheet_jobs:
+            # Parsed by a worker process
+            sch = self.sheet_jobs.get(os.path.abspath(fname))
+        else:
+            sch = _parse_file(fname)
         if not isinstance(sch, list) or sch[0].value() != 'kicad_sch':
             raise SchError('No kicad_sch signature')
         for e in sch[1:]:
@@ -1787,16 +2002,9 @@ class SchematicV6(Schematic):
                 self._get_lib_symbols(e)
             elif e_type == 'bus_alias':
                 self.bus_alias.append(BusAlias.parse(e))
-            elif e_type == 'junction':
-                self.junctions.append(Junction.parse(e))
-            elif e_type == 'no_connect':
-                self.no_conn.append(NoConnect.parse(e))
-            elif e_type == 'bus_entry':
-                self.bus_entry.append(BusEntry.parse(e))
-            elif e_type == 'bus' or e_type == 'wire' or e_type == 'polyline':
-                self.wires.append(SchematicWireV6.parse(e, e_type))
-            elif e_type == 'image':
-                self.bitmaps.append(SchematicBitmapV6.parse(e))
+            elif e_type in SchematicV6.graphic_items:
+                # Connections, wires, images, etc. Just for the netlist or to save the schematic
+                self._pending.append((e, e_type))
             elif e_type == 'text':
                 self.texts.append(Text.parse(e, e_type))
             elif e_type == 'label':
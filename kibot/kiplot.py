@@ -19,24 +19,35 @@ from glob import glob
 from distutils.version import StrictVersion
 from importlib.util import (spec_from_file_location, module_from_spec)
 from collections import OrderedDict
+from multiprocessing import get_context
+from multiprocessing.connection import wait
 
 from .gs import GS
-from .registrable import RegOutput
+from .registrable import RegOutput, RegVariant, RegFilter, Registrable
 from .misc import (PLOT_ERROR, MISSING_TOOL, CMD_EESCHEMA_DO, URL_EESCHEMA_DO, CORRUPTED_PCB,
                    EXIT_BAD_ARGS, CORRUPTED_SCH, EXIT_BAD_CONFIG, WRONG_INSTALL, UI_SMD, UI_VIRTUAL,
                    MOD_SMD, MOD_THROUGH_HOLE, MOD_VIRTUAL, W_PCBNOSCH, W_NONEEDSKIP, W_WRONGCHAR, name2make, W_TIMEOUT,
                    W_KIAUTO)
 from .error import PlotError, KiPlotConfigurationError, config_error, trace_dump
 from .pre_base import BasePreFlight
+from .board_state import BoardState
 from .kicad.v5_sch import Schematic, SchFileError, SchError
 from .kicad.v6_sch import SchematicV6
 from .kicad.config import KiConfError
+from .kicad.pcb import PCB
+from .sch_cache import SchCache
 from . import log
+from . import profiler
 
 logger = log.get_logger()
 # Cache to avoid running external many times to check their versions
 script_versions = {}
+# Tools checked by the outputs we are running, one set for each nested run_output()
+used_tools = []
 actions_loaded = False
+# Plug-in classes, they are registered using these decorators
+plugin_re = re.compile(r'^@(output|pre|variant|filter)_class\s*\nclass\s+(\w+)', re.M)
+plugin_kinds = {'output': RegOutput, 'pre': BasePreFlight, 'variant': RegVariant, 'filter': RegFilter}
 
 
 def _import(name, path):
@@ -53,12 +64,30 @@ def _import(name, path):
         exit(WRONG_INSTALL)
 
 
+def _load_plugin(name, path):
+    """ Imports a plug-in from the manifest, the first time we need it """
+    from kibot.mcpyrate import activate
+    activate.activate()
+    logger.debug("- Importing "+name)
+    with profiler.phase('plugins', name):
+        _import(name, path)
+    # de_activate in old mcpy
+    if 'deactivate' in activate.__dict__:
+        activate.deactivate()
+
+
 def _load_actions(path, load_internals=False):
     logger.debug("Importing from "+path)
     lst = glob(os.path.join(path, 'out_*.py')) + glob(os.path.join(path, 'pre_*.py'))
     lst += glob(os.path.join(path, 'var_*.py')) + glob(os.path.join(path, 'fil_*.py'))
     if load_internals:
-        lst += [os.path.join(path, 'globals.py')]
+        # Just make a list of the plug-ins, they are imported when needed
+        for p in lst:
+            name = os.path.splitext(os.path.basename(p))[0]
+            with open(p, 'rt') as f:
+                for kind, cls in plugin_re.findall(f.read()):
+                    plugin_kinds[kind].add_to_manifest(cls.lower(), name, p)
+        lst = [os.path.join(path, 'globals.py')]
     for p in lst:
         name = os.path.splitext(os.path.basename(p))[0]
         logger.debug("- Importing "+name)
@@ -73,34 +102,59 @@ def load_actions():
     actions_loaded = True
     from kibot.mcpyrate import activate
     # activate.activate()
-    _load_actions(os.path.abspath(os.path.dirname(__file__)), True)
-    home = os.environ.get('HOME')
-    if home:
-        dir = os.path.join(home, '.config', 'kiplot', 'plugins')
-        if os.path.isdir(dir):
-            _load_actions(dir)
-        dir = os.path.join(home, '.config', 'kibot', 'plugins')
-        if os.path.isdir(dir):
-            _load_actions(dir)
+    Registrable._loader = _load_plugin
+    with profiler.phase('plugins'):
+        _load_actions(os.path.abspath(os.path.dirname(__file__)), True)
+        home = os.environ.get('HOME')
+        if home:
+            dir = os.path.join(home, '.config', 'kiplot', 'plugins')
+            if os.path.isdir(dir):
+                _load_actions(dir)
+            dir = os.path.join(home, '.config', 'kibot', 'plugins')
+            if os.path.isdir(dir):
+                _load_actions(dir)
     # de_activate in old mcpy
     if 'deactivate' in activate.__dict__:
         logger.debug('Deactivating macros')
         activate.deactivate()
 
 
-def check_version(command, version):
-    global script_versions
-    if command in script_versions:
-        return
+def run_version(command):
+    """ Runs `command --version`, returns the match for the version (or None) and the output """
     cmd = [command, '--version']
     logger.debug('Running: '+str(cmd))
     result = run(cmd, stdout=PIPE, stderr=PIPE, universal_newlines=True)
     z = re.match(command + r' (\d+\.\d+\.\d+)', result.stdout, re.IGNORECASE)
     if not z:
         z = re.search(r'Version: (\d+\.\d+\.\d+)', result.stdout, re.IGNORECASE)
+    return z, result.stdout
+
+
+def get_tool_version(command):
+    """ Returns the version of an external tool, None if we can't determine it.
+        Used to check if the tools changed since the last run (incremental mode). """
+    if command in script_versions:
+        return script_versions[command]
+    try:
+        z, _ = run_version(command)
+    except OSError:
+        return None
+    if not z:
+        return None
+    script_versions[command] = z.group(1)
+    return script_versions[command]
+
+
+def check_version(command, version):
+    if used_tools:
+        # Recorded in the manifest, a new version must generate the output again
+        used_tools[-1].add(command)
+    if command in script_versions:
+        return
+    z, stdout = run_version(command)
     if not z:
         logger.error('Unable to determine ' + command + ' version:\n' +
-                     result.stdout)
+                     stdout)
         exit(MISSING_TOOL)
     res = z.groups()
     if StrictVersion(res[0]) < StrictVersion(version):
@@ -170,7 +224,8 @@ def exec_with_retry(cmd):
         logger.debug('Command line: '+' '.join(cmd))
     retry = 2
     while retry:
-        result = run(cmd, stdout=PIPE, stderr=PIPE, universal_newlines=True)
+        with profiler.phase('exec', os.path.basename(cmd[0])):
+            result = run(cmd, stdout=PIPE, stderr=PIPE, universal_newlines=True)
         ret = result.returncode
         retry -= 1
         if ret > 0 and ret < 128 and retry:
@@ -211,9 +266,10 @@ def load_board(pcb_file=None):
         GS.check_pcb()
         pcb_file = GS.pcb_file
     try:
-        board = pcbnew.LoadBoard(pcb_file)
-        if BasePreFlight.get_option('check_zone_fills'):
-            pcbnew.ZONE_FILLER(board).Fill(board.Zones())
+        with profiler.phase('load', 'PCB'):
+            board = pcbnew.LoadBoard(pcb_file)
+            if BasePreFlight.get_option('check_zone_fills'):
+                pcbnew.ZONE_FILLER(board).Fill(board.Zones())
         if GS.global_units and GS.ki6():
             # In KiCad 6 "dimensions" has units.
             # The default value is DIM_UNITS_MODE_AUTOMATIC.
@@ -237,8 +293,37 @@ def load_board(pcb_file=None):
     return board
 
 
+def load_pcb_data():
+    """ Loads the PCB for the outputs that just read data from it.
+        Uses the board loaded by pcbnew, or our read-only model (much faster) """
+    board = GS.get_board()
+    if board is not None:
+        # Already loaded
+        return board
+    if GS.ki5():
+        # The KiCad 5 API uses other coordinates and attributes
+        return load_board()
+    GS.check_pcb()
+    try:
+        with profiler.phase('load', 'PCB data'):
+            GS.pcb_data = PCB.load(GS.pcb_file)
+    except (OSError, SchError) as e:
+        trace_dump()
+        logger.error('Error loading PCB file. Corrupted?')
+        logger.error(e)
+        exit(CORRUPTED_PCB)
+    return GS.pcb_data
+
+
 def load_any_sch(file, project):
     logger.debug("Loading Schematic file: "+file)
+    cache = None
+    if GS.sch_cache:
+        cache = SchCache(file, project)
+        sch = cache.get()
+        if sch is not None:
+            return sch
+        cache.start()
     if file[-9:] == 'kicad_sch':
         sch = SchematicV6()
         load_libs = False
@@ -268,6 +353,11 @@ def load_any_sch(file, project):
         logger.error('At line {} of `{}`: {}'.format(e.line, e.file, e.msg))
         logger.error('Line content: `{}`'.format(e.code))
         exit(EXIT_BAD_CONFIG)
+    finally:
+        if cache:
+            cache.stop()
+    if cache:
+        cache.put(sch)
     return sch
 
 
@@ -275,7 +365,8 @@ def load_sch():
     if GS.sch:  # Already loaded
         return
     GS.check_sch()
-    GS.sch = load_any_sch(GS.sch_file, GS.sch_basename)
+    with profiler.phase('load', 'schematic'):
+        GS.sch = load_any_sch(GS.sch_file, GS.sch_basename)
 
 
 def get_board_comps_data(comps):
@@ -283,7 +374,7 @@ def get_board_comps_data(comps):
         Note that we do it every time the function is called to reset transformation filters like rot_footprint. """
     if not GS.pcb_file:
         return
-    load_board()
+    load_pcb_data()
     comps_hash = {c.ref: c for c in comps}
     for m in GS.get_modules():
         ref = m.GetReference()
@@ -356,16 +447,21 @@ def get_output_dir(o_dir, obj, dry=False):
 def config_output(out, dry=False):
     if out._configured:
         return
-    # Should we load the PCB?
-    if not dry:
-        if out.is_pcb():
-            load_board()
-        if out.is_sch():
-            load_sch()
-    try:
-        out.config(None)
-    except KiPlotConfigurationError as e:
-        config_error("In section '"+out.name+"' ("+out.type+"): "+str(e))
+    with profiler.task('output', out.name):
+        # Should we load the PCB?
+        if not dry:
+            if out.is_pcb():
+                if out._pcb_data_only:
+                    load_pcb_data()
+                else:
+                    load_board()
+            if out.is_sch():
+                load_sch()
+        try:
+            with profiler.phase('config'):
+                out.config(None)
+        except KiPlotConfigurationError as e:
+            config_error("In section '"+out.name+"' ("+out.type+"): "+str(e))
 
 
 def run_output(out):
@@ -373,8 +469,25 @@ def run_output(out):
         return
     GS.current_output = out.name
     try:
-        out.run(get_output_dir(out.dir, out))
-        out._done = True
+        with profiler.task('output', out.name):
+            out_dir = get_output_dir(out.dir, out)
+            if GS.manifest and GS.manifest.is_up_to_date(out, out_dir):
+                logger.debug('Skipping `{}`, is up-to-date'.format(out.name))
+                out._done = True
+                return
+            used_tools.append(set())
+            # Outputs used by another output (i.e. compress) share the process with it, they must undo their changes
+            isolated = BoardState.isolated
+            if len(used_tools) > 1:
+                BoardState.isolated = False
+            try:
+                out.run(out_dir)
+            finally:
+                tools = used_tools.pop()
+                BoardState.isolated = isolated
+            out._done = True
+            if GS.manifest:
+                GS.manifest.update(out, out_dir, tools)
     except PlotError as e:
         logger.error("In output `"+str(out)+"`: "+str(e))
         exit(PLOT_ERROR)
@@ -382,7 +495,111 @@ def run_output(out):
         config_error("In section '"+out.name+"' ("+out.type+"): "+str(e))
 
 
-def generate_outputs(outputs, target, invert, skip_pre, cli_order):
+def _run_output_job(name, done):
+    """ Runs an output inside a worker process.
+        Used by generate_outputs_parallel(), returns the exit code and the warnings we found. """
+    # Outputs finished after this process was forked
+    for d in done:
+        RegOutput.get_output(d)._done = True
+    # This process is used only for this output, no need to undo the changes to the PCB.
+    # The outputs it runs (i.e. compress `from_output`) are restored, see run_output()
+    BoardState.isolated = True
+    cnt = (log.MyLogger.warn_cnt, log.MyLogger.warn_tcnt, log.MyLogger.n_filtered)
+    n_events = len(profiler.events)
+    # Filtered PCBs saved by the main process are removed by it
+    n_temporal = len(BoardState.temporal)
+    ret = 0
+    try:
+        run_output(RegOutput.get_output(name))
+    except SystemExit as e:
+        ret = e.code if e.code is not None else 0
+    finally:
+        BoardState.remove_saved(n_temporal)
+    manifest = GS.manifest.outputs.get(name) if GS.manifest else None
+    return (name, ret, log.MyLogger.warn_cnt-cnt[0], log.MyLogger.warn_tcnt-cnt[1], log.MyLogger.n_filtered-cnt[2],
+            manifest, profiler.get_events(n_events))
+
+
+def _run_output_process(conn, name, done):
+    """ Entry point for the worker processes, sends the result of _run_output_job() using `conn` """
+    try:
+        res = _run_output_job(name, done)
+    except BaseException as e:
+        res = (name, e)
+    conn.send(res)
+    conn.close()
+
+
+def generate_outputs_parallel(outs, jobs):
+    """ Generates the outputs using `jobs` worker processes.
+        The outputs that mutate the board are generated first, by this process and in order.
+        The rest are scheduled following the dependencies reported by `get_out_dependencies()` """
+    # Configure all the outputs before forking, so the PCB and schematic are loaded only once
+    for out in outs:
+        config_output(out)
+    done = set()
+    for out in outs:
+        if out._mutates_board:
+            logger.info('- '+str(out))
+            run_output(out)
+            done.add(out.name)
+    pending = OrderedDict((o.name, o) for o in outs if o.name not in done)
+    # Dependency graph, only for the outputs we will generate
+    deps = {name: {d for d in o.get_out_dependencies() if d in pending and d != name} for name, o in pending.items()}
+    logger.debug('Generating {} outputs using {} jobs'.format(len(pending), jobs))
+    # One process for each output, so they get a private copy of the PCB.
+    # We don't use a Pool because we must detect processes dying without a result (i.e. KiCad crashes)
+    ctx = get_context('fork')
+    # Connection -> (output name, process)
+    running = {}
+    try:
+        while pending or running:
+            # Start the outputs with their dependencies solved, up to `jobs` at the same time
+            for name in [n for n in pending if deps[n].issubset(done)][:jobs-len(running)]:
+                out = pending.pop(name)
+                logger.info('- '+str(out))
+                r_conn, w_conn = ctx.Pipe(duplex=False)
+                p = ctx.Process(target=_run_output_process, args=(w_conn, name, list(done)))
+                p.start()
+                # Only the child must keep the write end, so we get an EOF if it dies
+                w_conn.close()
+                running[r_conn] = (name, p)
+            if not running:
+                logger.error('Circular dependency between outputs: '+', '.join(pending.keys()))
+                exit(EXIT_BAD_CONFIG)
+            conn = wait(list(running.keys()))[0]
+            name, p = running.pop(conn)
+            try:
+                res = conn.recv()
+            except EOFError:
+                res = None
+            conn.close()
+            p.join()
+            if res is None:
+                logger.error('The process generating `{}` died unexpectedly (exit code {})'.format(name, p.exitcode))
+                exit(PLOT_ERROR)
+            if len(res) == 2:
+                # Unhandled exception in the worker
+                raise res[1]
+            if res[1]:
+                exit(res[1])
+            log.MyLogger.warn_cnt += res[2]
+            log.MyLogger.warn_tcnt += res[3]
+            log.MyLogger.n_filtered += res[4]
+            if res[5] is not None:
+                GS.manifest.outputs[name] = res[5]
+            profiler.add_events(res[6])
+            RegOutput.get_output(name)._done = True
+            done.add(name)
+    except BaseException:
+        for conn, (_, p) in running.items():
+            p.terminate()
+            p.join()
+            conn.close()
+        raise
+
+
+def generate_outputs(outputs, target, invert, skip_pre, cli_order, jobs=1):
     logger.debug("Starting outputs for board {}".format(GS.pcb_file))
     preflight_checks(skip_pre)
     # Check if the preflights pulled options
@@ -402,24 +619,27 @@ def generate_outputs(outputs, target, invert, skip_pre, cli_order):
         if out is None:
             logger.error('Unknown output `{}`'.format(name))
             exit(EXIT_BAD_ARGS)
-    # Generate outputs
+    # Select the outputs
     if cli_order and not invert:
         # Use the CLI order
-        for name in target:
-            out = RegOutput.get_output(name)
-            config_output(out)
-            logger.info('- '+str(out))
-            run_output(out)
+        outs = [RegOutput.get_output(name) for name in target]
     else:
         # Use the declaration order
+        outs = []
         for out in RegOutput.get_outputs():
             if (((n == 0 or ((out.name not in target) and invert)) and out.run_by_default) or
                ((out.name in target) and not invert)):
-                config_output(out)
-                logger.info('- '+str(out))
-                run_output(out)
+                outs.append(out)
             else:
                 logger.debug('Skipping `%s` output', str(out))
+    # Generate outputs
+    if jobs > 1 and len(outs) > 1:
+        generate_outputs_parallel(outs, jobs)
+        return
+    for out in outs:
+        config_output(out)
+        logger.info('- '+str(out))
+        run_output(out)
 
 
 def adapt_file_name(name):
@@ -568,4 +788,5 @@ def generate_makefile(makefile, cfg_file, outputs, kibot_sys=False):
 
 # To avoid circular dependencies: Optionable needs it, but almost everything needs Optionable
 GS.load_board = load_board
+GS.load_pcb_data = load_pcb_data
 GS.load_sch = load_sch
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+Incremental build support.
+Keeps track of the inputs used to generate each output, so we can skip the outputs that are up-to-date.
+"""
+import os
+import json
+from hashlib import sha256
+from .gs import GS
+from .registrable import RegOutput
+from .error import KiPlotConfigurationError
+from .kiplot import get_tool_version, script_versions
+from . import log
+
+logger = log.get_logger()
+MANIFEST_VERSION = 1
+
+
+class Manifest(object):
+    """ Persistent record of the inputs and targets for each generated output.
+        Stored as a JSON file in the output directory. """
+    file_name = '.kibot_manifest.json'
+
+    def __init__(self, out_dir):
+        self.file = os.path.join(out_dir, self.file_name)
+        # Output name -> {'inputs': hash, 'targets': [files], 'tools': {command: version}}
+        self.outputs = {}
+        # File name -> [mtime, size, hash]. Avoids reading big files again
+        self.files = {}
+        # Hashes computed during this run
+        self._hashes = {}
+        self.load()
+
+    def load(self):
+        if not os.path.isfile(self.file):
+            return
+        try:
+            with open(self.file, 'rt') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.debug('Discarding the build manifest `{}`: {}'.format(self.file, e))
+            return
+        if data.get('version') != MANIFEST_VERSION or data.get('kibot') != GS.kibot_version:
+            logger.debug('Discarding the build manifest `{}`, created by another version'.format(self.file))
+            return
+        self.outputs = data.get('outputs', {})
+        self.files = data.get('files', {})
+
+    def save(self):
+        data = {'version': MANIFEST_VERSION, 'kibot': GS.kibot_version, 'outputs': self.outputs, 'files': self.files}
+        os.makedirs(os.path.dirname(self.file), exist_ok=True)
+        with open(self.file, 'wt') as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        logger.debug('Build manifest saved to `{}`'.format(self.file))
+
+    def file_hash(self, fname):
+        """ SHA256 for the content of a file.
+            We use the cached value when the modification time and size didn't change. """
+        hash = self._hashes.get(fname)
+        if hash is not None:
+            return hash
+        try:
+            st = os.stat(fname)
+        except OSError:
+            hash = 'missing'
+        else:
+            cached = self.files.get(fname)
+            if cached is not None and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                hash = cached[2]
+            else:
+                h = sha256()
+                with open(fname, 'rb') as f:
+                    for block in iter(lambda: f.read(1 << 20), b''):
+                        h.update(block)
+                hash = h.hexdigest()
+                self.files[fname] = [st.st_mtime_ns, st.st_size, hash]
+        self._hashes[fname] = hash
+        return hash
+
+    @staticmethod
+    def get_input_files(out):
+        """ Files used to generate the output """
+        files = set(out.get_dependencies())
+        if out.is_pcb() and GS.pcb_file:
+            files.add(GS.pcb_file)
+        if out.is_sch() and GS.sch_file:
+            files.update(GS.sch.get_files() if GS.sch else [GS.sch_file])
+        if GS.pro_file:
+            files.add(GS.pro_file)
+        return sorted(files)
+
+    def inputs_hash(self, out):
+        """ Hash for everything that can affect the output """
+        config = {'output': out._tree,
+                  'variants': {k: v._tree for k, v in RegOutput._def_variants.items()},
+                  'filters': {k: v._tree for k, v in RegOutput._def_filters.items()},
+                  'globals': {k: v for k, v in vars(GS).items() if k.startswith('global_')},
+                  'kicad': GS.kicad_version}
+        h = sha256(json.dumps(config, sort_keys=True, default=str).encode())
+        for fname in self.get_input_files(out):
+            h.update(fname.encode())
+            h.update(self.file_hash(fname).encode())
+        return h.hexdigest()
+
+    def is_up_to_date(self, out, out_dir):
+        """ True if the output was generated using the same inputs and all the targets are there """
+        entry = self.outputs.get(out.name)
+        if entry is None:
+            return False
+        try:
+            targets = out.get_targets(out_dir)
+            if not targets or targets != entry['targets'] or not all(os.path.isfile(f) for f in targets):
+                return False
+            for command, version in entry['tools'].items():
+                if get_tool_version(command) != version:
+                    return False
+            return self.inputs_hash(out) == entry['inputs']
+        except (KiPlotConfigurationError, OSError) as e:
+            logger.debug('Unable to check if `{}` is up-to-date: {}'.format(out.name, e))
+            return False
+
+    def update(self, out, out_dir, tools):
+        """ Records the inputs and targets for an output we just generated.
+            `tools` are the external tools checked by the output. """
+        try:
+            self.outputs[out.name] = {'inputs': self.inputs_hash(out), 'targets': out.get_targets(out_dir),
+                                      'tools': {c: script_versions[c] for c in tools if c in script_versions}}
+        except (KiPlotConfigurationError, OSError) as e:
+            logger.debug('Unable to record the inputs for `{}`: {}'.format(out.name, e))
+            self.outputs.pop(out.name, None)
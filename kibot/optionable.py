@@ -225,7 +225,7 @@ class Optionable(object):
     def expand_filename_common(self, name, parent):
         """ Expansions common to the PCB and Schematic """
         # PCB expansions, explicit
-        if GS.board and '%b' in name:
+        if GS.get_board() and '%b' in name:
             name = name.replace('%bc', _cl(GS.pcb_comp))
             name = name.replace('%bd', _cl(GS.pcb_date))
             name = name.replace('%bF', GS.pcb_no_ext)
@@ -279,8 +279,8 @@ class Optionable(object):
         do_pcb = not is_sch and has_dep_exp
         # Load the needed data
         if GS.pcb_file and (do_pcb or '%b' in name):
-            if GS.board is None:
-                GS.load_board()
+            if GS.get_board() is None:
+                GS.load_pcb_data()
             GS.load_pcb_title_block()
         if GS.sch_file and (do_sch or '%s' in name):
             if GS.sch is None:
@@ -288,7 +288,7 @@ class Optionable(object):
             GS.load_sch_title_block()
         # This member can be called with a preflight object
         name = Optionable.expand_filename_common(self, name, parent)
-        if GS.board and do_pcb:
+        if GS.get_board() and do_pcb:
             name = name.replace('%c', _cl(GS.pcb_comp))
             name = name.replace('%d', _cl(GS.pcb_date))
             name = name.replace('%F', GS.pcb_no_ext)
@@ -17,6 +17,7 @@ from .gs import GS
 from .misc import W_NOLAYER
 from .macros import macros, document  # noqa: F401
 from . import log
+from . import profiler
 
 logger = log.get_logger()
 
@@ -97,13 +98,9 @@ class AnyLayerOptions(VariantOptions):
         """  Apply the variants and filters """
         if not self._comps:
             return None
-        self.comps_hash = self.get_refs_hash()
-        self.cross_modules(board, self.comps_hash)
-        return self.remove_paste_and_glue(board, self.comps_hash)
-
-    def unfilter_components(self, board):
-        self.uncross_modules(board, self.comps_hash)
-        self.restore_paste_and_glue(board, self.comps_hash)
+        comps_hash = self.get_refs_hash()
+        self.cross_modules(board, comps_hash)
+        return self.remove_paste_and_glue(board, comps_hash)
 
     def compute_name(self, k_filename, output_dir, output, id, suffix):
         if output:
@@ -135,7 +132,7 @@ class AnyLayerOptions(VariantOptions):
             jobfile_writer = GERBER_JOBFILE_WRITER(GS.board)
         plot_ctrl.SetColorMode(True)
         # Apply the variants and filters
-        exclude = self.filter_components(GS.board)
+        self.filter_components(GS.board)
         # Plot every layer in the output
         generated = {}
         layers = Layer.solve(layers)
@@ -154,15 +151,16 @@ class AnyLayerOptions(VariantOptions):
             po.SetSkipPlotNPTH_Pads(is_cu)
             # Plot single layer to file
             logger.debug("Opening plot file for layer `{}` format `{}`".format(la, self._plot_format))
-            if not plot_ctrl.OpenPlotfile(suffix, self._plot_format, desc):
-                # Shouldn't happen
-                raise PlotError("OpenPlotfile failed!")  # pragma: no cover (Internal)
-            # Compute the current file name and the one we want
-            k_filename = plot_ctrl.GetPlotFileName()
-            filename = self.compute_name(k_filename, output_dir, self.output, id, suffix)
-            logger.debug("Plotting layer `{}` to `{}`".format(la, filename))
-            plot_ctrl.PlotLayer()
-            plot_ctrl.ClosePlot()
+            with profiler.phase('write', suffix):
+                if not plot_ctrl.OpenPlotfile(suffix, self._plot_format, desc):
+                    # Shouldn't happen
+                    raise PlotError("OpenPlotfile failed!")  # pragma: no cover (Internal)
+                # Compute the current file name and the one we want
+                k_filename = plot_ctrl.GetPlotFileName()
+                filename = self.compute_name(k_filename, output_dir, self.output, id, suffix)
+                logger.debug("Plotting layer `{}` to `{}`".format(la, filename))
+                plot_ctrl.PlotLayer()
+                plot_ctrl.ClosePlot()
             if self.output:
                 os.rename(k_filename, filename)
             if create_job:
@@ -191,8 +189,7 @@ class AnyLayerOptions(VariantOptions):
             with open(os.path.join(output_dir, filename), 'wt') as f:
                 f.write(content)
         # Restore the eliminated layers
-        if exclude:
-            self.unfilter_components(GS.board)
+        self.restore_board()
 
     def solve_extension(self, layer):
         if self._plot_format == PLOT_FORMAT_GERBER and self.use_protel_extensions:
@@ -4,9 +4,10 @@
 # License: GPL-3.0
 # Project: KiBot (formerly KiPlot)
 import os
-from shutil import copy2, rmtree
+from shutil import copy2
 from tempfile import mkdtemp
 from .pre_base import BasePreFlight
+from .board_state import BoardState
 from .error import KiPlotConfigurationError
 from .gs import GS
 from .kiplot import check_script, exec_with_retry, add_extra_options
@@ -78,9 +79,15 @@ class Any_PCB_PrintOptions(VariantOptions):
         copy2(pro_name, pro_copy)
         return pro_copy
 
-    def filter_components(self, board, force_copy):
-        if not self._comps and not force_copy:
-            return GS.pcb_file, None
+    def filter_components(self, board):
+        if not self._comps and not self.title:
+            return GS.pcb_file
+        # Other outputs could be using the same filtered PCB
+        key = ('pcb_print', self.expand_filename_pcb(self.title), self.hide_excluded)+self.variant_key()
+        fname = BoardState.get_saved(key)
+        if fname is not None:
+            return fname
+        self.set_title(self.title)
         comps_hash = self.get_refs_hash()
         self.cross_modules(board, comps_hash)
         self.remove_paste_and_glue(board, comps_hash)
@@ -93,11 +100,10 @@ class Any_PCB_PrintOptions(VariantOptions):
         GS.board.Save(fname)
         # Copy the project: avoids warnings, could carry some options
         self._copy_project(fname)
-        self.uncross_modules(board, comps_hash)
-        self.restore_paste_and_glue(board, comps_hash)
-        if self.hide_excluded:
-            self.restore_fab(board, comps_hash)
-        return fname, pcb_dir
+        self.restore_board()
+        # The temporal dir is removed when we finish
+        BoardState.add_saved(key, fname, [pcb_dir])
+        return fname
 
     def get_targets(self, out_dir):
         return [self._parent.expand_filename(out_dir, self.output)]
@@ -122,8 +128,7 @@ class Any_PCB_PrintOptions(VariantOptions):
             cmd.extend(['--color_theme', self.color_theme])
         if svg:
             cmd.append('--svg')
-        self.set_title(self.title)
-        board_name, board_dir = self.filter_components(GS.board, self.title != '')
+        board_name = self.filter_components(GS.board)
         cmd.extend([board_name, os.path.dirname(output)])
         cmd, video_remove = add_extra_options(cmd)
         # Add the layers
@@ -132,11 +137,6 @@ class Any_PCB_PrintOptions(VariantOptions):
             cmd.append('Edge.Cuts')
         # Execute it
         ret = exec_with_retry(cmd)
-        self.restore_title()
-        # Remove the temporal PCB
-        if board_dir:
-            logger.debug('Removing temporal variant dir `{}`'.format(board_dir))
-            rmtree(board_dir)
         if ret:
             logger.error(CMD_PCBNEW_PRINT_LAYERS+' returned %d', ret)
             exit(PDF_PCB_PRINT)
@@ -5,6 +5,8 @@
 # Project: KiBot (formerly KiPlot)
 import os
 from copy import deepcopy
+from shutil import copy2
+from tempfile import mkdtemp
 from .gs import GS
 from .kiplot import load_sch, get_board_comps_data
 from .misc import Rect, W_WRONGPASTE
@@ -18,15 +20,30 @@ if GS.ki6():
 else:
     from pcbnew import EDGE_MODULE, wxPoint, LSET
 from .registrable import RegOutput
+from .board_state import BoardState
 from .optionable import Optionable, BaseOptions
 from .fil_base import BaseFilter, apply_fitted_filter, reset_filters
 from .macros import macros, document  # noqa: F401
 from .error import KiPlotConfigurationError
 from . import log
+from . import profiler
 
 logger = log.get_logger()
 
 
+def copy_project(sch_dir):
+    """ Copy the project file to the temporal dir """
+    ext = GS.pro_ext
+    source = GS.pro_file
+    prj_file = os.path.join(sch_dir, GS.sch_basename+ext)
+    if source is not None and os.path.isfile(source):
+        copy2(source, prj_file)
+    else:
+        # Create a dummy project file to avoid warnings
+        f = open(prj_file, 'wt')
+        f.close()
+
+
 class BaseOutput(RegOutput):
     def __init__(self):
         super().__init__()
@@ -55,6 +72,10 @@ class BaseOutput(RegOutput):
         self._both_related = False
         self._unkown_is_error = True
         self._done = False
+        # Outputs that change GS.board can't be generated in parallel
+        self._mutates_board = False
+        # Outputs that just read data from the PCB, they don't need pcbnew to load it
+        self._pcb_data_only = False
 
     @staticmethod
     def attr2longopt(attr):
@@ -75,6 +96,12 @@ class BaseOutput(RegOutput):
             return []
         return self.options.get_targets(out_dir)
 
+    def get_out_dependencies(self):
+        """ Returns a list of outputs that must be generated before this output """
+        if hasattr(self, "options") and hasattr(self.options, "get_out_dependencies"):
+            return self.options.get_out_dependencies()
+        return []
+
     def get_dependencies(self):
         """ Returns a list of files needed to create this output """
         if self._sch_related:
@@ -160,6 +187,7 @@ class VariantOptions(BaseOptions):
                 A short-cut to use for simple cases where a variant is an overkill """
         super().__init__()
         self._comps = None
+        self._board_state = None
 
     def config(self, parent):
         super().config(parent)
@@ -190,35 +218,47 @@ class VariantOptions(BaseOptions):
         return EDGE_MODULE(m)
 
     @staticmethod
-    def cross_module(m, rect, layer):
+    def cross_module(m, rect, layer, state):
         """ Draw a cross over a module.
             The rect is a Rect object with the size.
-            The layer is which layer id will be used. """
+            The layer is which layer id will be used.
+            The state is the BoardState used to undo it. """
         seg1 = VariantOptions.create_module_element(m)
         seg1.SetWidth(120000)
         seg1.SetStart(wxPoint(rect.x1, rect.y1))
         seg1.SetEnd(wxPoint(rect.x2, rect.y2))
         seg1.SetLayer(layer)
         seg1.SetLocalCoord()  # Update the local coordinates
-        m.Add(seg1)
+        state.add(m, seg1)
         seg2 = VariantOptions.create_module_element(m)
         seg2.SetWidth(120000)
         seg2.SetStart(wxPoint(rect.x1, rect.y2))
         seg2.SetEnd(wxPoint(rect.x2, rect.y1))
         seg2.SetLayer(layer)
         seg2.SetLocalCoord()  # Update the local coordinates
-        m.Add(seg2)
+        state.add(m, seg2)
         return [seg1, seg2]
 
+    def board_state(self, board):
+        """ Changes we applied to the board """
+        if self._board_state is None:
+            self._board_state = BoardState(board)
+        return self._board_state
+
+    def restore_board(self):
+        """ Undo all the changes we applied to the board """
+        if self._board_state is not None:
+            self._board_state.restore()
+            self._board_state = None
+
     def cross_modules(self, board, comps_hash):
         """ Draw a cross in all 'not fitted' modules using *.Fab layer """
         if comps_hash is None:
             return
+        state = self.board_state(board)
         # Cross the affected components
         ffab = board.GetLayerID('F.Fab')
         bfab = board.GetLayerID('B.Fab')
-        extra_ffab_lines = []
-        extra_bfab_lines = []
         for m in GS.get_modules_board(board):
             ref = m.GetReference()
             # Rectangle containing the drawings, no text
@@ -236,49 +276,22 @@ class VariantOptions(BaseOptions):
                             brect.Union(gi.GetBoundingBox().getWxRect())
                 # Cross the graphics in *.Fab
                 if frect.x1 is not None:
-                    extra_ffab_lines.append(self.cross_module(m, frect, ffab))
-                else:
-                    extra_ffab_lines.append(None)
+                    self.cross_module(m, frect, ffab, state)
                 if brect.x1 is not None:
-                    extra_bfab_lines.append(self.cross_module(m, brect, bfab))
-                else:
-                    extra_bfab_lines.append(None)
-        # Remmember the data used to undo it
-        self.extra_ffab_lines = extra_ffab_lines
-        self.extra_bfab_lines = extra_bfab_lines
-
-    def uncross_modules(self, board, comps_hash):
-        """ Undo the crosses in *.Fab layer """
-        if comps_hash is None:
-            return
-        # Undo the drawings
-        for m in GS.get_modules_board(board):
-            ref = m.GetReference()
-            c = comps_hash.get(ref, None)
-            if c and c.included and not c.fitted:
-                restore = self.extra_ffab_lines.pop(0)
-                if restore:
-                    for line in restore:
-                        m.Remove(line)
-                restore = self.extra_bfab_lines.pop(0)
-                if restore:
-                    for line in restore:
-                        m.Remove(line)
+                    self.cross_module(m, brect, bfab, state)
 
     def remove_paste_and_glue(self, board, comps_hash):
         """ Remove from solder paste layers the filtered components. """
         if comps_hash is None:
             return
+        state = self.board_state(board)
         exclude = LSET()
         fpaste = board.GetLayerID('F.Paste')
         bpaste = board.GetLayerID('B.Paste')
         exclude.addLayer(fpaste)
         exclude.addLayer(bpaste)
-        old_layers = []
         fadhes = board.GetLayerID('F.Adhes')
         badhes = board.GetLayerID('B.Adhes')
-        old_fadhes = []
-        old_badhes = []
         rescue = board.GetLayerID(GS.work_layer)
         fmask = board.GetLayerID('F.Mask')
         bmask = board.GetLayerID('B.Mask')
@@ -287,62 +300,31 @@ class VariantOptions(BaseOptions):
             c = comps_hash.get(ref, None)
             if c and c.included and not c.fitted:
                 # Remove all pads from *.Paste
-                old_c_layers = []
                 for p in m.Pads():
                     pad_layers = p.GetLayerSet()
                     is_front = fpaste in pad_layers.Seq()
-                    old_c_layers.append(pad_layers.FmtHex())
+                    old_layers = pad_layers.FmtHex()
                     pad_layers.removeLayerSet(exclude)
                     if len(pad_layers.Seq()) == 0:
                         # No layers at all. Ridiculous, but happends.
                         # At least add an F.Mask
                         pad_layers.addLayer(fmask if is_front else bmask)
                         logger.warning(W_WRONGPASTE+'Pad with solder paste, but no copper or solder mask aperture in '+ref)
-                    p.SetLayerSet(pad_layers)
-                old_layers.append(old_c_layers)
+                    state.set_pad_layers(p, pad_layers, old_layers)
                 # Remove any graphical item in the *.Adhes layers
                 for gi in m.GraphicalItems():
                     l_gi = gi.GetLayer()
-                    if l_gi == fadhes:
-                        gi.SetLayer(rescue)
-                        old_fadhes.append(gi)
-                    if l_gi == badhes:
-                        gi.SetLayer(rescue)
-                        old_badhes.append(gi)
-        # Store the data to undo the above actions
-        self.old_layers = old_layers
-        self.old_fadhes = old_fadhes
-        self.old_badhes = old_badhes
-        self.fadhes = fadhes
-        self.badhes = badhes
+                    if l_gi == fadhes or l_gi == badhes:
+                        state.set_layer(gi, rescue)
         return exclude
 
-    def restore_paste_and_glue(self, board, comps_hash):
-        if comps_hash is None:
-            return
-        for m in GS.get_modules_board(board):
-            ref = m.GetReference()
-            c = comps_hash.get(ref, None)
-            if c and c.included and not c.fitted:
-                restore = self.old_layers.pop(0)
-                for p in m.Pads():
-                    pad_layers = p.GetLayerSet()
-                    res = restore.pop(0)
-                    pad_layers.ParseHex(res, len(res))
-                    p.SetLayerSet(pad_layers)
-        for gi in self.old_fadhes:
-            gi.SetLayer(self.fadhes)
-        for gi in self.old_badhes:
-            gi.SetLayer(self.badhes)
-
     def remove_fab(self, board, comps_hash):
         """ Remove from Fab the excluded components. """
         if comps_hash is None:
             return
+        state = self.board_state(board)
         ffab = board.GetLayerID('F.Fab')
         bfab = board.GetLayerID('B.Fab')
-        old_ffab = []
-        old_bfab = []
         rescue = board.GetLayerID(GS.work_layer)
         for m in GS.get_modules_board(board):
             ref = m.GetReference()
@@ -351,54 +333,65 @@ class VariantOptions(BaseOptions):
                 # Remove any graphical item in the *.Fab layers
                 for gi in m.GraphicalItems():
                     l_gi = gi.GetLayer()
-                    if l_gi == ffab:
-                        gi.SetLayer(rescue)
-                        old_ffab.append(gi)
-                    if l_gi == bfab:
-                        gi.SetLayer(rescue)
-                        old_bfab.append(gi)
-        # Store the data to undo the above actions
-        self.old_ffab = old_ffab
-        self.old_bfab = old_bfab
-        self.ffab = ffab
-        self.bfab = bfab
-
-    def restore_fab(self, board, comps_hash):
-        if comps_hash is None:
-            return
-        for gi in self.old_ffab:
-            gi.SetLayer(self.ffab)
-        for gi in self.old_bfab:
-            gi.SetLayer(self.bfab)
+                    if l_gi == ffab or l_gi == bfab:
+                        state.set_layer(gi, rescue)
+
+    def variant_key(self):
+        """ Identifies the PCB and the variant/filter applied, used to share the filtered PCBs and components """
+        return (GS.pcb_file, self.variant.name if self.variant else None, self.dnf_filter.name if self.dnf_filter else None)
 
     def set_title(self, title):
-        self.old_title = None
         if title:
             tb = GS.board.GetTitleBlock()
-            self.old_title = tb.GetTitle()
             text = self.expand_filename_pcb(title)
             if text[0] == '+':
-                text = self.old_title+text[1:]
-            tb.SetTitle(text)
+                text = tb.GetTitle()+text[1:]
+            self.board_state(GS.board).set_title(text)
+
+    def sch_variant_key(self):
+        """ Used to share the schematic with the variant applied """
+        return ('sch_variant',)+self.variant_key()
 
-    def restore_title(self):
-        self.old_title = None
-        if self.old_title is not None:
-            GS.board.GetTitleBlock().SetTitle(self.old_title)
+    def save_tmp_sch(self):
+        """ Saves the schematic with the variant applied to a temporal dir, returns the name of the main sheet.
+            Outputs using the same variant and filter share it. """
+        key = self.sch_variant_key()
+        fname = BoardState.get_saved(key)
+        if fname is not None:
+            return fname
+        sch_dir = mkdtemp(prefix='tmp-kibot-sch_variant-')
+        copy_project(sch_dir)
+        fname = os.path.join(sch_dir, GS.sch.save_variant(sch_dir))
+        BoardState.add_saved(key, fname, [sch_dir])
+        return fname
 
     def run(self, output_dir):
         """ Makes the list of components available """
         if not self.dnf_filter and not self.variant:
             return
         load_sch()
+        # Outputs using the same variant and filter share the result
+        key = self.variant_key()
+        filtered = GS.filtered_comps.get(key)
+        if filtered is not None:
+            logger.debug('Using the already filtered components')
+            # Other outputs could change the components, restore the state we got after filtering
+            comps, states = filtered
+            for c, state in zip(comps, states):
+                c.set_state(state)
+            self._comps = comps
+            return
         # Get the components list from the schematic
         comps = GS.sch.get_components()
         get_board_comps_data(comps)
-        # Apply the filter
-        reset_filters(comps)
-        apply_fitted_filter(comps, self.dnf_filter)
-        # Apply the variant
-        if self.variant:
+        with profiler.phase('variant', self.variant.name if self.variant else None):
+            # Apply the filter
+            reset_filters(comps)
+            apply_fitted_filter(comps, self.dnf_filter)
             # Apply the variant
-            comps = self.variant.filter(comps)
-        self._comps = comps
+            if self.variant:
+                # Apply the variant
+                comps = self.variant.filter(comps)
+        # A tuple, the list is shared by all the outputs using this variant
+        self._comps = tuple(comps)
+        GS.filtered_comps[key] = (self._comps, [c.get_state() for c in comps])
@@ -12,6 +12,7 @@ from .error import KiPlotConfigurationError
 from .misc import W_MISS3D, W_FAILDL
 from .gs import (GS)
 from .out_base import VariantOptions, BaseOutput
+from .board_state import BoardState
 from .kicad.config import KiConf
 from .macros import macros, document  # noqa: F401
 from . import log
@@ -50,26 +51,7 @@ class Base3DOptions(VariantOptions):
             f.write(r.content)
         return dest
 
-    def undo_3d_models_rename(self):
-        """ Restores the file name for any renamed 3D module """
-        for m in GS.get_modules():
-            # Get the model references
-            models = m.Models()
-            models_l = []
-            while not models.empty():
-                models_l.append(models.pop())
-            # Fix any changed path
-            replaced = self.undo_3d_models_rep.get(m.GetReference())
-            for i, m3d in enumerate(models_l):
-                if m3d.m_Filename in self.undo_3d_models:
-                    m3d.m_Filename = self.undo_3d_models[m3d.m_Filename]
-                if replaced:
-                    m3d.m_Filename = replaced[i]
-            # Push the models back
-            for model in models_l:
-                models.push_front(model)
-
-    def replace_models(self, models, new_model, c):
+    def replace_models(self, m, models, new_model, c):
         """ Changes the 3D model using a provided model """
         logger.debug('Changing 3D models for '+c.ref)
         # Get the model references
@@ -91,7 +73,7 @@ class Base3DOptions(VariantOptions):
         for i, m3d in enumerate(models_l):
             replaced.append(m3d.m_Filename)
             m3d.m_Filename = new_model[i]
-        self.undo_3d_models_rep[c.ref] = replaced
+        self.board_state(GS.board).changed_models(m, models_l[::-1], replaced[::-1])
         # Push the models back
         for model in models_l:
             models.push_front(model)
@@ -105,7 +87,7 @@ class Base3DOptions(VariantOptions):
         KiConf.init(GS.pcb_file)
         # List of models we already downloaded
         downloaded = set()
-        self.undo_3d_models = {}
+        state = self.board_state(GS.board)
         # Look for all the footprints
         for m in GS.get_modules():
             ref = m.GetReference()
@@ -114,6 +96,8 @@ class Base3DOptions(VariantOptions):
             models_l = []
             while not models.empty():
                 models_l.append(models.pop())
+            names = [m3d.m_Filename for m3d in models_l]
+            m_replaced = False
             # Look for all the 3D models for this footprint
             for m3d in models_l:
                 if m3d.m_Filename.endswith(DISABLE_TEXT):
@@ -138,7 +122,6 @@ class Base3DOptions(VariantOptions):
                             if replace:
                                 # Successfully downloaded
                                 downloaded.add(full_name)
-                                self.undo_3d_models[replace] = m3d.m_Filename
                                 # If this is a .wrl also download the .step
                                 if url.endswith('.wrl'):
                                     url = url[:-4]+'.step'
@@ -146,10 +129,13 @@ class Base3DOptions(VariantOptions):
                                     self.download_model(url, fname)
                         if replace:
                             m3d.m_Filename = replace
-                            models_replaced = True
+                            m_replaced = True
             # Push the models back
             for model in models_l:
                 models.push_front(model)
+            if m_replaced:
+                state.changed_models(m, models_l[::-1], names[::-1])
+                models_replaced = True
         return models_replaced
 
     def list_models(self):
@@ -176,14 +162,14 @@ class Base3DOptions(VariantOptions):
             pass
         return fname
 
-    def apply_variant_aspect(self, enable=False):
-        """ Disable/Enable the 3D models that aren't for this variant.
+    def apply_variant_aspect(self):
+        """ Disable the 3D models that aren't for this variant.
             This mechanism uses the MTEXT attributes. """
         # The magic text is %variant:slot1,slot2...%
         field_regex = re.compile(r'\%([^:]+):(.*)\%')
         if GS.debug_level > 3:
-            logger.debug("{} 3D models that aren't for this variant".format('Enable' if enable else 'Disable'))
-        len_disable = len(DISABLE_TEXT)
+            logger.debug("Disable 3D models that aren't for this variant")
+        state = self.board_state(GS.board)
         for m in GS.get_modules():
             if GS.debug_level > 3:
                 logger.debug("Processing module " + m.GetReference())
@@ -205,21 +191,32 @@ class Base3DOptions(VariantOptions):
                             # Extract the models, we get a copy
                             while not models.empty():
                                 m_objs.insert(0, models.pop())
+                            state.changed_models(m, m_objs, [m3d.m_Filename for m3d in m_objs])
                             for i, m3d in enumerate(m_objs):
                                 if GS.debug_level > 3:
                                     logger.debug('- {} {} {}'.format(i+1, i+1 in slots, m3d.m_Filename))
                                 if i+1 not in slots:
-                                    if enable:
-                                        # Revert the added text
-                                        m3d.m_Filename = m3d.m_Filename[:-len_disable]
-                                    else:
-                                        # Not used, add text to make their name invalid
-                                        m3d.m_Filename += DISABLE_TEXT
+                                    # Not used, add text to make their name invalid
+                                    m3d.m_Filename += DISABLE_TEXT
                                 # Push it back to the module
                                 models.push_back(m3d)
 
     def filter_components(self, dir):
-        self.undo_3d_models_rep = {}
+        # Other outputs could be using the same filtered PCB
+        key = ('3D', dir, self.download, self.kicad_3d_url)+self.variant_key()
+        fname = BoardState.get_saved(key)
+        if fname is None:
+            fname = self._filter_components(dir)
+            # The PCB and the downloaded models are removed when we finish
+            # KiCad likes to create project files ...
+            temporal = [fname.replace('.kicad_pcb', '.*')] if fname != GS.pcb_file else []
+            if self._tmp_dir:
+                temporal.append(self._tmp_dir)
+                self._tmp_dir = None
+            BoardState.add_saved(key, fname, temporal)
+        return fname
+
+    def _filter_components(self, dir):
         if not self._comps:
             # No variant/filter to apply
             if self.download_models():
@@ -227,14 +224,14 @@ class Base3DOptions(VariantOptions):
                 # Save the fixed board
                 ret = self.save_board(dir)
                 # Undo the changes
-                self.undo_3d_models_rename()
+                self.restore_board()
                 return ret
             return GS.pcb_file
         comps_hash = self.get_refs_hash()
+        state = self.board_state(GS.board)
         # Disable the models that aren't for this variant
         self.apply_variant_aspect()
         # Remove the 3D models for not fitted components
-        rem_models = []
         for m in GS.get_modules():
             ref = m.GetReference()
             c = comps_hash.get(ref, None)
@@ -243,30 +240,19 @@ class Base3DOptions(VariantOptions):
                 models = m.Models()
                 if c.included and not c.fitted:
                     # Not fitted, remove the 3D model
-                    rem_m_models = []
+                    state.save_models(m)
                     while not models.empty():
-                        rem_m_models.append(models.pop())
-                    rem_models.append(rem_m_models)
+                        models.pop()
                 else:
                     # Fitted
                     new_model = c.get_field_value(GS.global_3D_model_field)
                     if new_model:
                         # We will change the 3D model
-                        self.replace_models(models, new_model, c)
+                        self.replace_models(m, models, new_model, c)
         self.download_models()
         fname = self.save_board(dir)
-        self.undo_3d_models_rename()
-        # Undo the removing
-        for m in GS.get_modules():
-            ref = m.GetReference()
-            c = comps_hash.get(ref, None)
-            if c and c.included and not c.fitted:
-                models = m.Models()
-                restore = rem_models.pop(0)
-                for model in restore:
-                    models.push_front(model)
-        # Re-enable the modules that aren't for this variant
-        self.apply_variant_aspect(enable=True)
+        # Undo the changes
+        self.restore_board()
         return fname
 
     def get_targets(self, out_dir):
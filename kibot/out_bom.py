@@ -27,6 +27,8 @@ from . import log
 
 logger = log.get_logger()
 VALID_STYLES = {'modern-blue', 'modern-green', 'modern-red', 'classic'}
+# Formats supported by the internal BoM
+BOM_FORMATS = ['html', 'csv', 'txt', 'tsv', 'xml', 'xlsx']
 DEFAULT_ALIASES = [['r', 'r_small', 'res', 'resistor'],
                    ['l', 'l_small', 'inductor'],
                    ['c', 'c_small', 'cap', 'capacitor'],
@@ -197,6 +199,9 @@ class BoMHTML(BoMLinkable):
             self.style = 'modern-blue'
             """ Page style. Internal styles: modern-blue, modern-green, modern-red and classic.
                 Or you can provide a CSS file name. Please use .css as file extension. """
+            self.json_data = False
+            """ Store the rows as JSON data, they are created by the browser. Makes the file smaller for big BoMs.
+                Needs JavaScript """
 
     def config(self, parent):
         super().config(parent)
@@ -374,6 +379,10 @@ class BoMOptions(BaseOptions):
             self.format = ''
             """ [HTML,CSV,TXT,TSV,XML,XLSX] format for the BoM.
                 Defaults to CSV or a guess according to the options. """
+            self.formats = Optionable
+            """ [string|list(string)=''] Formats for the BoM (HTML, CSV, TXT, TSV, XML and/or XLSX).
+                Used to generate the BoM in more than one format, the components are grouped only once.
+                The `output` name must contain %x to get different names. When used `format` is ignored """
             # Equivalent to KiBoM INI:
             self.ignore_dnf = True
             """ Exclude DNF (Do Not Fit) components """
@@ -471,6 +480,7 @@ class BoMOptions(BaseOptions):
             self.footprint_type_values = Optionable
             """ [string|list(string)='SMD,THT,VIRTUAL'] Values for the `Footprint Type` column """
         self._format_example = 'CSV'
+        self._formats_example = 'CSV'
         self._footprint_populate_values_example = 'no,yes'
         self._footprint_type_values_example = 'SMD,THT,VIRTUAL'
         super().__init__()
@@ -574,21 +584,32 @@ class BoMOptions(BaseOptions):
 
     def config(self, parent):
         super().config(parent)
-        self.format = self._guess_format()
+        # Formats
+        self.formats = [f.lower() for f in Optionable.force_list(self.formats)]
+        for f in self.formats:
+            if f not in BOM_FORMATS:
+                raise KiPlotConfigurationError("Unknown BoM format `{}`".format(f))
+        if self.formats:
+            self.format = self.formats[0]
+            if len(self.formats) > 1 and '%x' not in self.output:
+                raise KiPlotConfigurationError("The `output` must contain %x when using more than one format")
+        else:
+            self.format = self._guess_format()
+            self.formats = [self.format]
         self._expand_id = 'bom'
         self._expand_ext = self.format.lower()
         # HTML options
-        if self.format == 'html' and isinstance(self.html, type):
+        if 'html' in self.formats and isinstance(self.html, type):
             # If no options get the defaults
             self.html = BoMHTML()
             self.html.config(self)
         # CSV options
-        if self.format in ['csv', 'tsv', 'txt'] and isinstance(self.csv, type):
+        if any(f in ['csv', 'tsv', 'txt'] for f in self.formats) and isinstance(self.csv, type):
             # If no options get the defaults
             self.csv = BoMCSV()
             self.csv.config(self)
         # XLSX options
-        if self.format == 'xlsx' and isinstance(self.xlsx, type):
+        if 'xlsx' in self.formats and isinstance(self.xlsx, type):
             # If no options get the defaults
             self.xlsx = BoMXLSX()
             self.xlsx.config(self)
@@ -673,7 +694,10 @@ class BoMOptions(BaseOptions):
             prj.source = os.path.basename(prj.file)
 
     def run(self, output):
-        format = self.format.lower()
+        if len(self.formats) > 1:
+            outputs = list(zip(self.get_targets(self._parent.output_dir), self.formats))
+        else:
+            outputs = [(output, self.format)]
         # Add some info needed for the output to the config object.
         # So all the configuration is contained in one object.
         self.source = GS.sch_basename
@@ -713,7 +737,7 @@ class BoMOptions(BaseOptions):
         if self.source_by_id:
             self.source_to_id = {prj.name: prj.ref_id for prj in self.aggregate}
         try:
-            do_bom(output, format, comps, self)
+            do_bom(outputs, comps, self)
         except BoMError as e:
             raise KiPlotConfigurationError(str(e))
         # Undo the reference prefix
@@ -724,7 +748,7 @@ class BoMOptions(BaseOptions):
                 c.ref_id = ''
 
     def get_targets(self, out_dir):
-        return [self._parent.expand_filename(out_dir, self.output)]
+        return [self.expand_filename(out_dir, self.output, self._expand_id, f) for f in self.formats]
 
 
 @output_class
@@ -6,6 +6,7 @@
 import re
 import os
 import glob
+from itertools import takewhile
 import sys
 from sys import exit
 from subprocess import check_output, STDOUT, CalledProcessError
@@ -169,6 +170,16 @@ class CompressOptions(BaseOptions):
     def get_targets(self, out_dir):
         return [self._parent.expand_filename(out_dir, self.output)]
 
+    def get_out_dependencies(self):
+        deps = []
+        for f in self.files:
+            if f.from_output:
+                deps.append(f.from_output)
+            else:
+                # Files collected using wildcards, could come from any previously declared output
+                deps.extend(o.name for o in takewhile(lambda o: o is not self._parent, RegOutput.get_outputs()))
+        return deps
+
     def get_dependencies(self):
         output = self.get_targets(self.expand_filename_sch(GS.out_dir))[0]
         files = self.get_files(output, no_out_run=True)
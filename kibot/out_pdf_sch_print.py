@@ -4,8 +4,6 @@
 # License: GPL-3.0
 # Project: KiBot (formerly KiPlot)
 import os
-from tempfile import mkdtemp
-from shutil import rmtree, copy2
 from .gs import (GS)
 from .kiplot import check_eeschema_do, exec_with_retry, add_extra_options
 from .misc import (CMD_EESCHEMA_DO, PDF_SCH_PRINT)
@@ -16,19 +14,6 @@ from . import log
 logger = log.get_logger()
 
 
-def copy_project(sch_dir):
-    """ Copy the project file to the temporal dir """
-    ext = GS.pro_ext
-    source = GS.pro_file
-    prj_file = os.path.join(sch_dir, GS.sch_basename+ext)
-    if source is not None and os.path.isfile(source):
-        copy2(source, prj_file)
-    else:
-        # Create a dummy project file to avoid warnings
-        f = open(prj_file, 'wt')
-        f.close()
-
-
 class PDF_Sch_PrintOptions(VariantOptions):
     def __init__(self):
         with document:
@@ -53,13 +38,9 @@ class PDF_Sch_PrintOptions(VariantOptions):
         output_dir = os.path.dirname(name)
         check_eeschema_do()
         if self._comps:
-            # Save it to a temporal dir
-            sch_dir = mkdtemp(prefix='tmp-kibot-pdf_sch_print-')
-            copy_project(sch_dir)
-            fname = GS.sch.save_variant(sch_dir)
-            sch_file = os.path.join(sch_dir, fname)
+            # Save it to a temporal dir, shared with other outputs using the same variant
+            sch_file = self.save_tmp_sch()
         else:
-            sch_dir = None
             sch_file = GS.sch_file
         cmd = [CMD_EESCHEMA_DO, 'export', '--all_pages', '--file_format', 'pdf']
         if self.monochrome:
@@ -76,10 +57,6 @@ class PDF_Sch_PrintOptions(VariantOptions):
             cur = self._parent.expand_filename(output_dir, '%f.%x')
             logger.debug('Moving '+cur+' -> '+name)
             os.rename(cur, name)
-        # Remove the temporal dir if needed
-        if sch_dir:
-            logger.debug('Removing temporal variant dir `{}`'.format(sch_dir))
-            rmtree(sch_dir)
         if video_remove:
             video_name = os.path.join(output_dir, 'export_eeschema_screencast.ogv')
             if os.path.isfile(video_name):
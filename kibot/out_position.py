@@ -300,3 +300,5 @@ class Position(BaseOutput):  # noqa: F821
         with document:
             self.options = PositionOptions
             """ [dict] Options for the `position` output """
+        # We just read the components data, no need to load the PCB using pcbnew
+        self._pcb_data_only = True
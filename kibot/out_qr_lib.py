@@ -9,7 +9,7 @@ from tempfile import NamedTemporaryFile
 from .gs import GS
 from .optionable import BaseOptions, Optionable
 from .error import KiPlotConfigurationError
-from .kicad.sexpdata import Symbol, dumps, Sep, load, SExpData, sexp_iter
+from .kicad.sexpdata import Symbol, dump, Sep, load, SExpData, sexp_iter
 from .kicad.v6_sch import DrawRectangleV6, PointXY, Stroke, Fill, SchematicFieldV6, FontEffects
 from .kiplot import load_board
 from .macros import macros, document, output_class  # noqa: F401
@@ -240,7 +240,7 @@ class QR_LibOptions(BaseOptions):
         # The QR itself
         mod.extend(self.qr_draw_fp(size, size_rect, center, qrc, qr.pcb_negative, qr.layer))
         with open(fname, 'wt') as f:
-            f.write(dumps(mod))
+            dump(mod, f)
             f.write('\n')
 
     def symbol_lib_k5(self):
@@ -310,7 +310,7 @@ class QR_LibOptions(BaseOptions):
             lib.append(sym)
             lib.append(Sep())
         with open(output, 'wt') as f:
-            f.write(dumps(lib))
+            dump(lib, f)
             f.write('\n')
 
     def update_footprint(self, name, sexp, qr):
@@ -363,7 +363,7 @@ class QR_LibOptions(BaseOptions):
             # Save it to a temporal
             with NamedTemporaryFile(mode='wt', suffix='.kicad_pcb', delete=False) as f:
                 logger.debug('- Saving updated PCB to: '+f.name)
-                f.write(dumps(separated))
+                dump(separated, f)
                 f.write('\n')
                 tmp_pcb = f.name
             # Reload it
@@ -437,7 +437,7 @@ class QR_LibOptions(BaseOptions):
             logger.debug('- Replacing the old SCH')
             GS.make_bkp(fname)
             with open(fname, 'wt') as f:
-                f.write(dumps(separated))
+                dump(separated, f)
                 f.write('\n')
 
     def load_sexp_file(self, fname):
@@ -5,8 +5,6 @@
 # Project: KiBot (formerly KiPlot)
 # KiCad 6 bug: https://gitlab.com/kicad/code/kicad/-/issues/9890
 import os
-from glob import glob
-from shutil import rmtree
 from .misc import (CMD_PCBNEW_3D, URL_PCBNEW_3D, RENDER_3D_ERR, PCB_MAT_COLORS, PCB_FINISH_COLORS, SOLDER_COLORS, SILK_COLORS,
                    KICAD_VERSION_6_0_2, MISSING_TOOL)
 from .gs import (GS)
@@ -161,14 +159,6 @@ class Render3DOptions(Base3DOptions):
         cmd, video_remove = add_extra_options(cmd)
         # Execute it
         ret = exec_with_retry(cmd)
-        # Remove the temporal PCB
-        if board_name != GS.pcb_file:
-            # KiCad likes to create project files ...
-            for f in glob(board_name.replace('.kicad_pcb', '.*')):
-                os.remove(f)
-        # Remove the downloaded 3D models
-        if self._tmp_dir:
-            rmtree(self._tmp_dir)
         if ret:
             logger.error(CMD_PCBNEW_3D+' returned %d', ret)
             exit(RENDER_3D_ERR)
@@ -3,9 +3,15 @@
 # Copyright (c) 2020-2021 Instituto Nacional de Tecnología Industrial
 # License: GPL-3.0
 # Project: KiBot (formerly KiPlot)
+import os
+from shutil import copyfile
+from .board_state import BoardState
 from .gs import GS
 from .out_base import VariantOptions
 from .macros import macros, document, output_class  # noqa: F401
+from . import log
+
+logger = log.get_logger()
 
 
 class Sch_Variant_Options(VariantOptions):
@@ -17,8 +23,22 @@ class Sch_Variant_Options(VariantOptions):
 
     def run(self, output_dir):
         super().run(output_dir)
-        # Create the schematic
-        GS.sch.save_variant(output_dir)
+        tmp_sch = BoardState.get_saved(self.sch_variant_key())
+        if tmp_sch is None:
+            # Create the schematic
+            GS.sch.save_variant(output_dir)
+            return
+        # Another output already saved it, just copy the files
+        sch_dir = os.path.dirname(tmp_sch)
+        prj_file = GS.sch_basename+GS.pro_ext
+        for fname in os.listdir(sch_dir):
+            if fname == prj_file:
+                continue
+            dest = os.path.join(output_dir, fname)
+            logger.debug('Copying `{}` -> `{}`'.format(fname, output_dir))
+            if os.path.isfile(dest):
+                GS.make_bkp(dest)
+            copyfile(os.path.join(sch_dir, fname), dest)
 
 
 @output_class
@@ -5,8 +5,6 @@
 # License: GPL-3.0
 # Project: KiBot (formerly KiPlot)
 import os
-from tempfile import mkdtemp
-from shutil import rmtree
 from .gs import (GS)
 from .kiplot import check_eeschema_do, exec_with_retry, add_extra_options
 from .misc import (CMD_EESCHEMA_DO, SVG_SCH_PRINT)
@@ -37,12 +35,9 @@ class SVG_Sch_PrintOptions(VariantOptions):
         output_dir = os.path.dirname(name)
         check_eeschema_do()
         if self._comps:
-            # Save it to a temporal dir
-            sch_dir = mkdtemp(prefix='tmp-kibot-svg_sch_print-')
-            fname = GS.sch.save_variant(sch_dir)
-            sch_file = os.path.join(sch_dir, fname)
+            # Save it to a temporal dir, shared with other outputs using the same variant
+            sch_file = self.save_tmp_sch()
         else:
-            sch_dir = None
             sch_file = GS.sch_file
         cmd = [CMD_EESCHEMA_DO, 'export', '--all_pages', '--file_format', 'svg', sch_file, output_dir]
         cmd, video_remove = add_extra_options(cmd)
@@ -54,10 +49,6 @@ class SVG_Sch_PrintOptions(VariantOptions):
             cur = self._parent.expand_filename(output_dir, '%f.%x')
             logger.debug('Moving '+cur+' -> '+name)
             os.rename(cur, name)
-        # Remove the temporal dir if needed
-        if sch_dir:
-            logger.debug('Removing temporal variant dir `{}`'.format(sch_dir))
-            rmtree(sch_dir)
         if video_remove:
             video_name = os.path.join(output_dir, 'export_eeschema_screencast.ogv')
             if os.path.isfile(video_name):
@@ -9,12 +9,14 @@ from .optionable import Optionable
 from .error import PlotError, KiPlotConfigurationError
 from .misc import PLOT_ERROR, EXIT_BAD_CONFIG
 from .log import get_logger
+from . import profiler
 
 logger = get_logger(__name__)
 
 
 class BasePreFlight(Registrable):
     _registered = {}
+    _manifest = {}
     _in_use = {}
     _options = {}
 
@@ -28,6 +30,12 @@ class BasePreFlight(Registrable):
         self._expand_id = ''
         self._expand_ext = ''
 
+    @staticmethod
+    def reset():
+        """ Forget all the preflights defined by the configuration """
+        BasePreFlight._in_use = {}
+        BasePreFlight._options = {}
+
     @staticmethod
     def add_preflight(o_pre):
         BasePreFlight._in_use[o_pre._name] = o_pre
@@ -58,11 +66,13 @@ class BasePreFlight(Registrable):
                     if v.is_pcb():
                         GS.check_pcb()
                     logger.debug('Preflight apply '+k)
-                    v.apply()
+                    with profiler.task('preflight', k):
+                        v.apply()
             for k, v in BasePreFlight._in_use.items():
                 if v._enabled:
                     logger.debug('Preflight run '+k)
-                    v.run()
+                    with profiler.task('preflight', k):
+                        v.run()
         except PlotError as e:
             logger.error("In preflight `"+str(k)+"`: "+str(e))
             exit(PLOT_ERROR)
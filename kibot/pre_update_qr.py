@@ -29,4 +29,5 @@ class Update_QR(BasePreFlight):  # noqa: F821
             if o.type == 'qr_lib':
                 RegOutput.make_prioritary(o.name)
                 o._update_mode = True
+                o._mutates_board = True
                 logger.debug('Making {} prioritary'.format(o))
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+Time profiling
+
+Measures the time used by each preflight and output (tasks), and by the phases of each one (i.e. loading the PCB,
+applying the variants, running external tools and writing files).
+The results can be saved as a JSON report and as a Chrome trace (chrome://tracing or https://ui.perfetto.dev/).
+"""
+import os
+import json
+from time import perf_counter
+from contextlib import contextmanager
+from . import log
+
+logger = log.get_logger()
+enabled = False
+start = 0
+start_cpu = 0
+# Measured events, in the order they finished
+events = []
+# Name of the tasks we are measuring, nested
+tasks = []
+
+
+def enable():
+    global enabled
+    global start
+    global start_cpu
+    enabled = True
+    start = perf_counter()
+    start_cpu = _cpu()
+
+
+def _cpu():
+    """ CPU time used by this process and its finished children """
+    t = os.times()
+    return t[0]+t[1]+t[2]+t[3]
+
+
+@contextmanager
+def _measure(name, cat, task, args):
+    wall = perf_counter()
+    cpu = _cpu()
+    try:
+        yield
+    finally:
+        events.append({'name': name, 'cat': cat, 'task': task, 'ts': wall-start, 'dur': perf_counter()-wall,
+                       'cpu': _cpu()-cpu, 'pid': os.getpid(), 'args': args})
+
+
+@contextmanager
+def task(kind, name):
+    """ Measures a preflight or an output. `kind` is 'preflight' or 'output' """
+    if not enabled:
+        yield
+        return
+    tasks.append(name)
+    try:
+        with _measure(name, kind, name, None):
+            yield
+    finally:
+        tasks.pop()
+
+
+@contextmanager
+def phase(cat, detail=None):
+    """ Measures a phase of the current task. `cat` is the kind of phase, i.e. 'load', 'exec' or 'write' """
+    if not enabled:
+        yield
+        return
+    with _measure(cat, cat, tasks[-1] if tasks else None, {'detail': detail} if detail else None):
+        yield
+
+
+def get_events(n=0):
+    """ Events measured after the first `n`, used to collect the events from worker processes """
+    return events[n:]
+
+
+def add_events(evs):
+    events.extend(evs)
+
+
+def _add_time(d, ev):
+    d['wall'] = d.get('wall', 0)+ev['dur']
+    d['cpu'] = d.get('cpu', 0)+ev['cpu']
+    d['count'] = d.get('count', 0)+1
+
+
+def get_report():
+    """ Wall and CPU time for each task, split in phases. Times are in seconds """
+    report = {'wall': perf_counter()-start, 'cpu': _cpu()-start_cpu, 'preflights': {}, 'outputs': {}, 'other': {}}
+    where = {'preflight': report['preflights'], 'output': report['outputs']}
+    kinds = {}
+    for ev in events:
+        if ev['cat'] in where:
+            kinds[ev['task']] = ev['cat']
+            _add_time(where[ev['cat']].setdefault(ev['task'], {'phases': {}}), ev)
+    for ev in events:
+        if ev['cat'] in where:
+            continue
+        if ev['task'] is None:
+            # Not associated to a task, i.e. loading the schematic for a list of components
+            _add_time(report['other'].setdefault(ev['cat'], {}), ev)
+        else:
+            _add_time(where[kinds[ev['task']]][ev['task']]['phases'].setdefault(ev['cat'], {}), ev)
+    return report
+
+
+def save_report(fname):
+    with open(fname, 'wt') as f:
+        json.dump(get_report(), f, indent=2)
+    logger.debug('Profile report saved to `{}`'.format(fname))
+
+
+def save_trace(fname):
+    """ Chrome trace event format, times are in microseconds """
+    trace = []
+    for ev in events:
+        args = {'cpu_ms': round(ev['cpu']*1e3, 3)}
+        if ev['args']:
+            args.update(ev['args'])
+        trace.append({'name': ev['name'], 'cat': ev['cat'], 'ph': 'X', 'ts': round(ev['ts']*1e6),
+                      'dur': round(ev['dur']*1e6), 'pid': ev['pid'], 'tid': ev['pid'], 'args': args})
+    with open(fname, 'wt') as f:
+        json.dump({'traceEvents': trace, 'displayTimeUnit': 'ms'}, f)
+    logger.debug('Profile trace saved to `{}`'.format(fname))
@@ -9,7 +9,11 @@ from .error import KiPlotConfigurationError
 
 
 class Registrable(object):
-    """ This class adds the mechanism to register plug-ins """
+    """ This class adds the mechanism to register plug-ins.
+        The plug-ins listed in `_manifest` are imported the first time we need them. """
+    # Function used to import a plug-in, will be replaced by kiplot.py
+    _loader = None
+
     def __init__(self):
         super().__init__()
 
@@ -17,16 +21,32 @@ class Registrable(object):
     def register(cl, name, aclass):
         cl._registered[name] = aclass
 
+    @classmethod
+    def add_to_manifest(cl, name, module, path):
+        """ Adds a plug-in we can import on demand """
+        cl._manifest[name] = (module, path)
+
+    @classmethod
+    def _load(cl, name):
+        module, path = cl._manifest.pop(name)
+        if name not in cl._registered:
+            Registrable._loader(module, path)
+
     @classmethod
     def is_registered(cl, name):
-        return name in cl._registered
+        return name in cl._registered or name in cl._manifest
 
     @classmethod
     def get_class_for(cl, name):
+        if name in cl._manifest:
+            cl._load(name)
         return cl._registered[name]
 
     @classmethod
     def get_registered(cl):
+        """ All the plug-ins, we must import all of them """
+        for name in list(cl._manifest.keys()):
+            cl._load(name)
         return cl._registered
 
     def __str__(self):
@@ -38,6 +58,7 @@ class RegOutput(Optionable, Registrable):
         Used by BaseOutput.
         Here because it doesn't need macros. """
     _registered = {}
+    _manifest = {}
     # List of defined filters
     _def_filters = {}
     # List of defined variants
@@ -50,6 +71,14 @@ class RegOutput(Optionable, Registrable):
     def __init__(self):
         super().__init__()
 
+    @staticmethod
+    def reset():
+        """ Forget all the outputs, filters and variants defined by the configuration """
+        RegOutput._def_filters = {}
+        RegOutput._def_variants = {}
+        RegOutput._def_outputs = OrderedDict()
+        RegOutput._prio_outputs = OrderedDict()
+
     @staticmethod
     def add_variants(variants):
         RegOutput._def_variants.update(variants)
@@ -124,6 +153,7 @@ class RegVariant(Optionable, Registrable):
         Used by BaseVariant.
         Here because it doesn't need macros. """
     _registered = {}
+    _manifest = {}
 
     def __init__(self):
         super().__init__()
@@ -134,6 +164,7 @@ class RegFilter(Optionable, Registrable):
         Used by BaseFilter.
         Here because it doesn't need macros. """
     _registered = {}
+    _manifest = {}
 
     def __init__(self):
         super().__init__()
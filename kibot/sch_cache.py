@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+Cache for the loaded schematics.
+The loaded schematic is stored in the user cache directory, so we don't need to parse unchanged schematics and
+libraries again. The entries are validated using the SHA256 of all the files used and the KiBot version.
+"""
+import os
+import json
+import pickle
+import logging
+from glob import glob
+from hashlib import sha256
+from .gs import GS
+from .kicad.config import KiConf
+from . import log
+
+logger = log.get_logger()
+SCH_CACHE_VERSION = 4
+# Size limit for the cache, the least recently used entries are removed
+MAX_CACHE_SIZE = 256*1024*1024
+
+
+def file_hash(fname):
+    """ SHA256 for the content of a file, None if it doesn't exist """
+    h = sha256()
+    try:
+        with open(fname, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                h.update(block)
+    except OSError:
+        return None
+    return h.hexdigest()
+
+
+def get_lib_uris(sch):
+    """ Libraries used by a KiCad 5 schematic, as found in the libs tables """
+    KiConf.init(sch.fname)
+    res = {}
+    for k in sch.libs.keys():
+        alias = KiConf.lib_aliases.get(k)
+        res[k] = alias.uri if k and alias else None
+    return res
+
+
+class WarningsCollector(logging.Handler):
+    """ Collects the warnings emitted while loading a schematic, so we can repeat them """
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.warnings = []
+
+    def emit(self, record):
+        self.warnings.append(record.getMessage())
+
+
+class SchCache(object):
+    """ Cache entry for a schematic.
+        Stored as `<sha256>.pickle` where the hash is computed using the file name and its content. """
+    def __init__(self, fname, project):
+        self.fname = os.path.abspath(fname)
+        self.project = project
+        self.dir = GS.get_cache_dir('sch')
+        self.hash = file_hash(self.fname)
+        key = sha256('{}\n{}\n{}'.format(self.fname, project, self.hash).encode()).hexdigest()
+        self.file = os.path.join(self.dir, key+'.pickle')
+        self.collector = None
+
+    @staticmethod
+    def get_context():
+        """ Things outside the schematic files that can change the loaded data """
+        context = {'globals': {k: v for k, v in vars(GS).items() if k.startswith('global_')},
+                   'kicad': GS.kicad_version,
+                   'project': file_hash(GS.pro_file) if GS.pro_file else None}
+        return sha256(json.dumps(context, sort_keys=True, default=str).encode()).hexdigest()
+
+    def get_used_files(self, sch):
+        """ Schematic sheets and libraries used """
+        files = set(sch.get_files())
+        if sch.libs:
+            # KiCad 5 libs, the cache lib is used for missing components
+            for uri in sch.libs.values():
+                if uri:
+                    files.add(uri)
+                    files.add(os.path.splitext(uri)[0]+'.dcm')
+            files.add(sch.fname.replace('.sch', '-cache.lib'))
+        return files
+
+    def get(self):
+        """ The cached schematic or None """
+        if self.hash is None or not os.path.isfile(self.file):
+            return None
+        try:
+            with open(self.file, 'rb') as f:
+                data = pickle.load(f)
+        except Exception as e:
+            # Anything can happen when unpickling objects from another version
+            logger.debug('Discarding the cached schematic `{}`: {}'.format(self.file, e))
+            return None
+        if (data.get('version') != SCH_CACHE_VERSION or data.get('kibot') != GS.kibot_version or
+           data.get('context') != self.get_context()):
+            logger.debug('Discarding the cached schematic `{}`, created using other options'.format(self.file))
+            return None
+        for fname, hash in data['files'].items():
+            if file_hash(fname) != hash:
+                logger.debug('Discarding the cached schematic `{}`, `{}` changed'.format(self.file, fname))
+                return None
+        if data['mtime'] is not None and os.stat(self.fname).st_mtime_ns != data['mtime']:
+            logger.debug('Discarding the cached schematic `{}`, the date changed'.format(self.file))
+            return None
+        sch = data['sch']
+        if sch.libs and get_lib_uris(sch) != data['libs']:
+            logger.debug('Discarding the cached schematic `{}`, the libs table changed'.format(self.file))
+            return None
+        logger.debug('Using the cached schematic `{}`'.format(self.file))
+        # Mark it as recently used
+        os.utime(self.file)
+        for w in data['warnings']:
+            logger.warning(w)
+        return sch
+
+    def start(self):
+        """ Start collecting the warnings for a schematic we are about to load """
+        if not self.fname.endswith('.kicad_sch'):
+            # Load the KiCad configuration now, its warnings aren't part of the schematic
+            KiConf.init(self.fname)
+        self.collector = WarningsCollector()
+        log.get_logger().addHandler(self.collector)
+
+    def stop(self):
+        log.get_logger().removeHandler(self.collector)
+
+    def put(self, sch):
+        """ Store a schematic we just loaded """
+        files = {fname: file_hash(fname) for fname in self.get_used_files(sch)}
+        # When the title block doesn't have a date we use the file date
+        mtime = os.stat(self.fname).st_mtime_ns if sch.date == GS.format_date('', self.fname, 'SCH') else None
+        data = {'version': SCH_CACHE_VERSION, 'kibot': GS.kibot_version, 'context': self.get_context(), 'files': files,
+                'mtime': mtime, 'libs': get_lib_uris(sch) if sch.libs else {}, 'warnings': self.collector.warnings,
+                'sch': sch}
+        tmp = '{}.{}.tmp'.format(self.file, os.getpid())
+        try:
+            os.makedirs(self.dir, exist_ok=True)
+            with open(tmp, 'wb') as f:
+                pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+            # Atomic, other KiBot instances could be reading it
+            os.replace(tmp, self.file)
+        except (OSError, pickle.PicklingError, RecursionError) as e:
+            logger.debug('Unable to cache the schematic `{}`: {}'.format(self.fname, e))
+            if os.path.isfile(tmp):
+                os.remove(tmp)
+            return
+        logger.debug('Schematic cached as `{}`'.format(self.file))
+        self.evict()
+
+    def evict(self):
+        """ Remove the least recently used entries when the cache is too big """
+        entries = []
+        total = 0
+        for fname in glob(os.path.join(self.dir, '*.pickle')):
+            try:
+                st = os.stat(fname)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, fname))
+            total += st.st_size
+        entries.sort()
+        for _, size, fname in entries:
+            if total <= MAX_CACHE_SIZE:
+                break
+            logger.debug('Removing old cached schematic `{}`'.format(fname))
+            try:
+                os.remove(fname)
+            except OSError:
+                continue
+            total -= size
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2022 Salvador E. Tropea
+# Copyright (c) 2022 Instituto Nacional de Tecnología Industrial
+# License: GPL-3.0
+# Project: KiBot (formerly KiPlot)
+"""
+Server mode
+
+Keeps the plug-ins, PCB, schematic and configuration loaded and generates outputs on request.
+Requests and replies are JSON objects, one per line, using a UNIX socket.
+The server sends the log messages as `{"level": N, "msg": TEXT}` and finishes with `{"ret": EXIT_CODE}`.
+"""
+import os
+import sys
+import json
+import socket
+import logging
+from itertools import chain
+from .gs import GS
+from .registrable import RegOutput
+from .pre_base import BasePreFlight
+from .config_reader import CfgYamlReader
+from .kiplot import generate_outputs
+from .manifest import Manifest
+from .board_state import BoardState
+from .misc import INTERNAL_ERROR, SERVER_ERROR
+from . import log
+
+logger = log.get_logger()
+
+
+class SocketHandler(logging.Handler):
+    """ Sends the log messages to the client """
+    def __init__(self, conn):
+        super().__init__()
+        self.conn = conn
+        self.fmt_info = logging.Formatter("%(message)s")
+        self.fmt_other = logging.Formatter("%(levelname)s:%(message)s (%(name)s - %(filename)s:%(lineno)d)")
+
+    def emit(self, record):
+        fmt = self.fmt_info if record.levelno == logging.INFO else self.fmt_other
+        try:
+            self.conn.sendall((json.dumps({'level': record.levelno, 'msg': fmt.format(record)})+'\n').encode())
+        except OSError:
+            # The client went away, keep working
+            pass
+
+
+class Server(object):
+    """ Generates outputs for the requests received from a UNIX socket """
+    def __init__(self, socket_name, plot_config, incremental=False):
+        self.socket_name = socket_name
+        self.plot_config = plot_config
+        self.incremental = incremental
+        self.out_dir = GS.out_dir
+        # Modification time for the files we loaded
+        self.mtimes = {}
+        self.outputs = None
+        self.pre_enabled = {}
+
+    def _changed(self, files):
+        """ Checks if any of the files changed, and updates the recorded time """
+        changed = False
+        for fname in files:
+            try:
+                mtime = os.path.getmtime(fname)
+            except OSError:
+                mtime = None
+            if self.mtimes.get(fname) != mtime:
+                self.mtimes[fname] = mtime
+                changed = True
+        return changed
+
+    @staticmethod
+    def _sch_files():
+        if GS.sch:
+            return GS.sch.get_files()
+        return [GS.sch_file] if GS.sch_file else []
+
+    def refresh(self):
+        """ Discards the data from the files that changed since the last request """
+        reload = self.outputs is None
+        if GS.pcb_file and self._changed([GS.pcb_file]):
+            logger.debug('Loading the PCB from `{}`'.format(GS.pcb_file))
+            GS.board = None
+            GS.pcb_data = None
+            GS.pcb_title = None
+            reload = True
+        if self._changed(self._sch_files()):
+            logger.debug('Loading the schematic from `{}`'.format(GS.sch_file))
+            GS.sch = None
+            GS.sch_title = None
+            reload = True
+        if GS.pro_file and self._changed([GS.pro_file]):
+            GS.pro_variables = None
+            reload = True
+        if self._changed([self.plot_config]):
+            reload = True
+        if reload:
+            # The configuration is validated using the PCB and schematic, so we read it again
+            logger.debug('Reading the configuration from `{}`'.format(self.plot_config))
+            GS.reset_globals()
+            GS.out_dir = self.out_dir
+            RegOutput.reset()
+            BasePreFlight.reset()
+            # The filtered PCBs and components could be outdated
+            BoardState.remove_saved()
+            GS.filtered_comps = {}
+            self.outputs = CfgYamlReader().read_file(self.plot_config)
+            self.pre_enabled = {p._name: p._enabled for p in BasePreFlight.get_in_use_objs()}
+            if self.incremental:
+                GS.manifest = Manifest(GS.out_dir)
+        else:
+            # Forget the previous run
+            for o in chain(RegOutput.get_outputs(), RegOutput.get_prioritary_outputs()):
+                o._done = False
+            for p in BasePreFlight.get_in_use_objs():
+                p._enabled = self.pre_enabled[p._name]
+
+    def forget_all(self):
+        """ Discards all the loaded data, used after an error """
+        self.mtimes = {}
+        self.outputs = None
+        GS.board = None
+        GS.pcb_data = None
+        GS.sch = None
+
+    def process(self, req):
+        """ Generates the outputs for a request, returns the exit code """
+        log.MyLogger.reset_warn_hash()
+        log.MyLogger.warn_tcnt = log.MyLogger.warn_cnt = log.MyLogger.n_filtered = 0
+        ret = 0
+        try:
+            self.refresh()
+            generate_outputs(self.outputs, req.get('targets', []), req.get('invert', False), req.get('skip_pre'),
+                             req.get('cli_order', False), req.get('jobs', 1))
+            if GS.manifest:
+                GS.manifest.save()
+            logger.log_totals()
+        except SystemExit as e:
+            ret = e.code if isinstance(e.code, int) else INTERNAL_ERROR
+        except Exception as e:
+            logger.error('Internal error processing the request: {}'.format(e))
+            ret = INTERNAL_ERROR
+        if ret:
+            # The state after an error isn't reliable
+            self.forget_all()
+        else:
+            # Files loaded during this request
+            self._changed(self._sch_files())
+        return ret
+
+    def run(self):
+        if os.path.exists(self.socket_name):
+            os.remove(self.socket_name)
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.bind(self.socket_name)
+            sock.listen()
+            logger.info('KiBot server listening at `{}`'.format(self.socket_name))
+            while True:
+                conn, _ = sock.accept()
+                with conn:
+                    try:
+                        req = json.loads(conn.makefile('r').readline())
+                    except ValueError as e:
+                        logger.error('Malformed request: {}'.format(e))
+                        continue
+                    if req.get('quit'):
+                        conn.sendall(b'{"ret": 0}\n')
+                        break
+                    handler = SocketHandler(conn)
+                    logger.addHandler(handler)
+                    try:
+                        ret = self.process(req)
+                    finally:
+                        logger.removeHandler(handler)
+                    try:
+                        conn.sendall((json.dumps({'ret': ret})+'\n').encode())
+                    except OSError:
+                        pass
+        os.remove(self.socket_name)
+        logger.info('KiBot server finished')
+
+
+def run_client(socket_name, req):
+    """ Sends a request to the server and shows the log messages. Returns the exit code """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(socket_name)
+        except OSError as e:
+            logger.error('Unable to connect to the KiBot server at `{}`: {}'.format(socket_name, e))
+            return SERVER_ERROR
+        sock.sendall((json.dumps(req)+'\n').encode())
+        for line in sock.makefile('r'):
+            msg = json.loads(line)
+            if 'ret' in msg:
+                return msg['ret']
+            print(msg['msg'], file=sys.stdout if msg['level'] == logging.INFO else sys.stderr)
+    logger.error('The KiBot server closed the connection')
+    return SERVER_ERROR
@@ -423,6 +423,13 @@ def test_int_bom_simple_html_9(test_dir):
     simple_html_test(ctx, rows, headers, sh_head, prj, do_title=False, do_logo=False, do_info=False, do_stats=False)
 
 
+def test_int_bom_simple_html_10(test_dir):
+    """ Rows stored as JSON """
+    (rows, headers, sh_head), prj, ctx = simple_html_setup(test_dir, 'int_bom_simple_html_10')
+    ctx.search_in_file(os.path.join(BOM_DIR, prj+'-bom.html'), ['<tbody></tbody>', 'class="content-data"'])
+    simple_html_test(ctx, rows, headers, sh_head, prj)
+
+
 def adapt_xml(h):
     h = h.replace(' ', '_')
     h = h.replace('"', '')
@@ -441,12 +448,26 @@ def test_int_bom_simple_xml(test_dir):
     ctx.clean_up()
 
 
+def test_int_bom_formats(test_dir):
+    """ CSV, HTML and XML from the same groups """
+    ctx, out = kibom_setup(test_dir, 'int_bom_formats')
+    rows, header, info = ctx.load_csv(out)
+    check_csv_info(info, KIBOM_PRJ_INFO, KIBOM_STATS)
+    kibom_verif(rows, header)
+    rows, header = ctx.load_xml(out.replace('.csv', '.xml'))
+    kibom_verif(rows, header, skip_head=True, qty_name=adapt_xml(STATUS_COLUMN_NAME))
+    rows, headers, sh_head = ctx.load_html(out.replace('.csv', '.html'))
+    simple_html_test(ctx, rows, headers, sh_head, 'kibom-test')
+
+
 def simple_xlsx_verify(ctx, prj, dnf=True):
     ext = 'xlsx'
     ctx.run()
     out = prj + '-bom.' + ext
     rows, header, sh_head = ctx.load_xlsx(out)
     check_head_xlsx(sh_head, KIBOM_PRJ_INFO, KIBOM_STATS)
+    # Generated in constant_memory mode, the strings are in-line
+    assert not os.path.isfile(ctx.get_out_path(os.path.join('desc', 'xl', 'sharedStrings.xml')))
     assert header == KIBOM_TEST_HEAD
     ref_column = header.index(REF_COLUMN_NAME)
     status_column = header.index(STATUS_COLUMN_NAME)
@@ -31,6 +31,8 @@ pytest-3 --log-cli-level debug
 import os
 import sys
 import re
+import time
+import json
 import shutil
 import logging
 import subprocess
@@ -44,7 +46,7 @@ prev_dir = os.path.dirname(prev_dir)
 if prev_dir not in sys.path:
     sys.path.insert(0, prev_dir)
 from kibot.misc import (EXIT_BAD_ARGS, EXIT_BAD_CONFIG, NO_PCB_FILE, NO_SCH_FILE, EXAMPLE_CFG, WONT_OVERWRITE, CORRUPTED_PCB,
-                        PCBDRAW_ERR, NO_PCBNEW_MODULE, NO_YAML_MODULE, INTERNAL_ERROR)
+                        PCBDRAW_ERR, NO_PCBNEW_MODULE, NO_YAML_MODULE, INTERNAL_ERROR, SERVER_ERROR)
 
 
 POS_DIR = 'positiondir'
@@ -1083,6 +1085,170 @@ def test_pdfunite_1(test_dir):
     ctx.clean_up(keep_project=True)
 
 
+def test_pdfunite_jobs(test_dir):
+    """ The joined PDF is declared first, so the scheduler must wait for its dependencies """
+    prj = 'light_control'
+    ctx = context.TestContext(test_dir, 'test_pdfunite_jobs', prj, 'pdfunite_1', POS_DIR)
+    ctx.run(extra=['-j', '3'])
+    ctx.expect_out_file(prj+'-PDF_Joined.pdf')
+    assert ctx.search_err('Generating 3 outputs using 3 jobs')
+    ctx.clean_up(keep_project=True)
+
+
+def test_incremental_1(test_dir):
+    """ The second run must skip the output """
+    ctx = context.TestContext(test_dir, 'test_incremental_1', '3Rs', 'simple_position', POS_DIR)
+    ctx.run(extra=['-I'])
+    ctx.expect_out_file(ctx.get_pos_top_filename())
+    ctx.search_err('is up-to-date', invert=True)
+    ctx.expect_out_file('.kibot_manifest.json')
+    ctx.run(extra=['-I'])
+    assert ctx.search_err('Skipping .?position.?, is up-to-date')
+    # A missing target must force the generation
+    os.remove(ctx.get_out_path(ctx.get_pos_top_filename()))
+    ctx.run(extra=['-I'])
+    ctx.expect_out_file(ctx.get_pos_top_filename())
+    ctx.search_err('is up-to-date', invert=True)
+    ctx.clean_up()
+
+
+def test_profile_1(test_dir):
+    ctx = context.TestContext(test_dir, 'test_profile_1', '3Rs', 'simple_position', POS_DIR)
+    report = ctx.get_out_path('profile.json')
+    trace = ctx.get_out_path('trace.json')
+    ctx.run(extra=['--profile', report, '--trace', trace])
+    ctx.expect_out_file(ctx.get_pos_top_filename())
+    with open(report, 'rt') as f:
+        data = json.load(f)
+    assert 'position' in data['outputs']
+    assert 'load' in data['outputs']['position']['phases']
+    assert 'plugins' in data['other']
+    with open(trace, 'rt') as f:
+        data = json.load(f)
+    assert any(ev['name'] == 'position' and ev['ph'] == 'X' for ev in data['traceEvents'])
+    ctx.clean_up()
+
+
+def test_server_1(test_dir):
+    """ Two requests to the same server """
+    ctx = context.TestContext(test_dir, 'test_server_1', '3Rs', 'simple_position', POS_DIR)
+    sock = ctx.get_out_path('kibot.sock')
+    kibot = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'kibot'))
+    server = subprocess.Popen([kibot, '-v', '-b', ctx.board_file, '-c', ctx.yaml_file, '-d', ctx.output_dir, '--server', sock])
+    try:
+        for _ in range(300):
+            if os.path.exists(sock):
+                break
+            time.sleep(0.1)
+        client = ['--client', sock, 'position']
+        ctx.run(extra=client, no_board_file=True, no_yaml_file=True, no_out_dir=True)
+        ctx.expect_out_file(ctx.get_pos_top_filename())
+        assert ctx.search_err('Reading the configuration')
+        os.remove(ctx.get_out_path(ctx.get_pos_top_filename()))
+        # Nothing changed, so nothing is loaded again
+        ctx.run(extra=client, no_board_file=True, no_yaml_file=True, no_out_dir=True)
+        ctx.expect_out_file(ctx.get_pos_top_filename())
+        ctx.search_err('Reading the configuration', invert=True)
+        ctx.run(extra=['--client', sock, '--quit'], no_board_file=True, no_yaml_file=True, no_out_dir=True, no_verbose=True)
+        server.wait(timeout=30)
+    finally:
+        if server.poll() is None:
+            server.kill()
+    ctx.clean_up()
+
+
+def test_server_pcb_changed(test_dir):
+    """ The PCB is edited between two requests, the server must use the new data """
+    ctx = context.TestContext(test_dir, 'test_server_pcb_changed', '3Rs', 'simple_position', POS_DIR)
+    board_file = ctx.get_out_path(os.path.basename(ctx.board_file))
+    shutil.copy2(ctx.board_file, board_file)
+    sock = ctx.get_out_path('kibot.sock')
+    kibot = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'src', 'kibot'))
+    server = subprocess.Popen([kibot, '-v', '-b', board_file, '-c', ctx.yaml_file, '-d', ctx.output_dir, '--server', sock])
+    try:
+        for _ in range(300):
+            if os.path.exists(sock):
+                break
+            time.sleep(0.1)
+        client = ['--client', sock, 'position']
+        ctx.run(extra=client, no_board_file=True, no_yaml_file=True, no_out_dir=True)
+        pos_top = ctx.get_pos_top_filename()
+        ctx.search_in_file(pos_top, [r'^R1\s'])
+        # Rename R1 to R9
+        with open(board_file, 'rt') as f:
+            pcb = f.read()
+        with open(board_file, 'wt') as f:
+            f.write(re.sub(r'(fp_text reference "?)R1\b', r'\1R9', pcb))
+        # Make sure the modification time changes
+        mtime = os.path.getmtime(board_file)+10
+        os.utime(board_file, (mtime, mtime))
+        ctx.run(extra=client, no_board_file=True, no_yaml_file=True, no_out_dir=True)
+        assert ctx.search_err('Loading the PCB')
+        ctx.search_in_file(pos_top, [r'^R9\s'])
+        ctx.search_not_in_file(pos_top, [r'^R1\s'])
+        ctx.run(extra=['--client', sock, '--quit'], no_board_file=True, no_yaml_file=True, no_out_dir=True, no_verbose=True)
+        server.wait(timeout=30)
+    finally:
+        if server.poll() is None:
+            server.kill()
+    ctx.clean_up()
+
+
+def test_server_no_server(test_dir):
+    ctx = context.TestContext(test_dir, 'test_server_no_server', '3Rs', 'simple_position', POS_DIR)
+    ctx.run(SERVER_ERROR, extra=['--client', ctx.get_out_path('kibot.sock')], no_board_file=True, no_yaml_file=True,
+            no_out_dir=True)
+    assert ctx.search_err('Unable to connect to the KiBot server')
+    ctx.clean_up()
+
+
+def test_batch_1(test_dir):
+    """ The same project twice, to check we start from scratch for each project """
+    ctx = context.TestContext(test_dir, 'test_batch_1', '3Rs', 'simple_position', POS_DIR)
+    batch = ctx.get_out_path('batch.yaml')
+    with open(batch, 'wt') as f:
+        f.write('projects:\n')
+        for n in range(2):
+            f.write('  - name: P{}\n    board: {}\n    config: {}\n    out_dir: P{}\n'.
+                    format(n, ctx.board_file, ctx.yaml_file, n))
+    ctx.run(extra=['--batch', batch], no_board_file=True, no_yaml_file=True, no_out_dir=True)
+    ctx.expect_out_file(os.path.join('P0', ctx.get_pos_top_filename()))
+    ctx.expect_out_file(os.path.join('P1', ctx.get_pos_top_filename()))
+    assert ctx.search_out('Processed 2 projects, 0 failed')
+    ctx.clean_up()
+
+
+def test_jobs_wrong(test_dir):
+    ctx = context.TestContext(test_dir, 'test_jobs_wrong', 'bom', 'pre_and_position', POS_DIR)
+    ctx.run(EXIT_BAD_ARGS, extra=['-j', 'many'])
+    assert ctx.search_err('The number of jobs must be a positive integer')
+    ctx.clean_up()
+
+
+def test_lazy_plugins(test_dir):
+    """ Only the plug-ins used by the configuration are imported """
+    ctx = context.TestContext(test_dir, 'test_lazy_plugins', '3Rs', 'simple_position', POS_DIR)
+    ctx.run()
+    ctx.expect_out_file(ctx.get_pos_top_filename())
+    assert ctx.search_err('- Importing out_position')
+    ctx.search_err('- Importing out_gerber', invert=True)
+    ctx.clean_up()
+
+
+def test_sch_cache(test_dir, monkeypatch):
+    """ The second run uses the cached schematic """
+    ctx = context.TestContext(test_dir, 'test_sch_cache', 'bom', 'int_bom_simple_csv', '')
+    with monkeypatch.context() as m:
+        m.setenv("XDG_CACHE_HOME", ctx.get_out_path('cache'))
+        ctx.run()
+        assert ctx.search_err('Schematic cached as')
+        ctx.run()
+        assert ctx.search_err('Using the cached schematic')
+        ctx.run(extra=['--no-sch-cache'])
+        ctx.search_err('Using the cached schematic', invert=True)
+    ctx.clean_up()
+
+
 def check_refs(ctx, refs):
     rows, _, _ = ctx.load_csv('ano_pcb-bom.csv')
     for r in rows:
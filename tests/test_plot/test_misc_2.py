@@ -3,8 +3,10 @@ import sys
 import re
 import pytest
 import coverage
+import io
 import logging
 import subprocess
+import shutil
 # Look for the 'utils' module from where the script is running
 prev_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 if prev_dir not in sys.path:
@@ -18,15 +20,25 @@ from kibot.layer import Layer
 from kibot.pre_base import BasePreFlight
 from kibot.out_base import BaseOutput
 from kibot.gs import GS
-from kibot.kiplot import load_actions, _import, load_board, search_as_plugin, generate_makefile
+from kibot import log
+from kibot.kiplot import load_actions, _import, load_board, search_as_plugin, generate_makefile, run_output, _run_output_job
 from kibot.registrable import RegOutput, RegFilter
 from kibot.misc import (MISSING_TOOL, WRONG_INSTALL, BOM_ERROR, DRC_ERROR, ERC_ERROR, PDF_PCB_PRINT, CMD_PCBNEW_PRINT_LAYERS,
                         KICAD2STEP_ERR)
 from kibot.bom.columnlist import ColumnList
-from kibot.bom.units import get_prefix
+from kibot.bom import units
+from kibot.bom.units import get_prefix, comp_match, value_key
+from kibot.bom.bom import compare_components, group_keys
+from kibot.fil_base import apply_pre_transform, reset_filters
 from kibot.__main__ import detect_kicad
 from kibot.kicad.config import KiConf
 from kibot.globals import Globals
+from kibot.kicad.sexpdata import Parser, FastParser, ExpectClosingBracket, Symbol, Sep, dump, dumps, load, SExpWriter
+from kibot.kicad.v5_sch import Schematic, SymLib, DocLib, LibIndex, SchError
+from kibot.kicad.v6_sch import SchematicV6
+from kibot.kicad import v5_sch, parallel_load
+from kibot.kicad.pcb import PCB, PCBPoint
+from kibot.board_state import BoardState
 
 cov = coverage.Coverage()
 mocked_check_output_FNF = True
@@ -289,6 +301,32 @@ def test_unknown_prefix(caplog):
     assert 'Unknown prefix, please report' in caplog.text
 
 
+def test_comp_match_cache(caplog):
+    """ The values are parsed once, but the warnings are repeated """
+    with context.cover_it(cov):
+        res = comp_match('100n', 'C', 'C1')
+        assert comp_match(' 100n', 'C', 'C2') is not res
+        assert comp_match('100n', 'C', 'C2') is res
+        assert value_key(res) == value_key(comp_match('0.1uF', 'C'))
+        assert comp_match('1.2.3', 'R', 'R1') is None
+        assert comp_match('1.2.3', 'R', 'R2') is None
+    assert 'Malformed value: `1.2.3` (no match in R1)' in caplog.text
+    assert 'Malformed value: `1.2.3` (no match in R2)' in caplog.text
+
+
+def test_comp_match_cache_unknown_prefix(caplog, monkeypatch):
+    """ The unknown prefix error is also repeated for each component """
+    # Force a prefix we don't know
+    monkeypatch.setattr(units, 'match', re.compile(r'(\d*\.?\d*)\s*(x)*()*(\d*)$'))
+    units._comp_match.cache_clear()
+    try:
+        with context.cover_it(cov):
+            assert comp_match('1x', 'R', 'R1') == comp_match('1x', 'R', 'R2')
+    finally:
+        units._comp_match.cache_clear()
+    assert caplog.text.count('Unknown prefix, please report') == 2
+
+
 def test_search_as_plugin_ok(test_dir, caplog):
     ctx = context.TestContext(test_dir, 'test_search_as_plugin_ok', 'test_v5', 'empty_zip', '')
     with context.cover_it(cov):
@@ -338,3 +376,404 @@ def test_makefile_kibot_sys(test_dir):
         generate_makefile(ctx.get_out_path('Makefile'), 'pp', [], kibot_sys=True)
     ctx.search_in_file('Makefile', [r'KIBOT\?=kibot'])
     ctx.clean_up()
+
+
+def test_fast_sexp_parser():
+    """ The fast parser must return exactly the same as the original one """
+    samples = ['(a b (c d) "e f" 1 -2.5e3 t nil)', '(a\\ b "x\\"y" [c d] \'(e f))', '(a ; comment\n b)  \n',
+               '(a (b) (c "d")) (1.5 .5 +3 inf)', '(a\\ 1 \\ 1 \\ -2.5\\  1\\ 2 \\ )']
+    dir_samples = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'board_samples', 'kicad_6')
+    for f in ('light_control.kicad_sch', 'light_control.kicad_pcb'):
+        with open(os.path.join(dir_samples, f), 'rt') as fh:
+            samples.append(fh.read())
+    with context.cover_it(cov):
+        for s in samples:
+            assert repr(FastParser(s).parse()) == repr(Parser(s).parse())
+        # Errors are the same
+        with pytest.raises(ExpectClosingBracket):
+            FastParser('(a (b c)').parse()
+
+
+def test_sexp_dump():
+    """ The streaming writer must generate exactly the same as dumps """
+    samples = [[Symbol('a'), Sep(), [Symbol('b'), 'c d', 1.5, Sep()], Sep()], (Symbol('a'), [Sep(), Symbol('b')]),
+               [Symbol('a b'), Sep(), Sep(), [Sep(), [Symbol('c'), Sep()], Sep()], Sep()]]
+    sch_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'board_samples', 'kicad_6',
+                            'light_control.kicad_sch')
+    with open(sch_file, 'rt') as fh:
+        samples.append(load(fh)[0])
+    with context.cover_it(cov):
+        for s in samples:
+            f = io.StringIO()
+            dump(s, f)
+            assert f.getvalue() == dumps(s)
+        # Item by item, the last one can be removed
+        f = io.StringIO()
+        w = SExpWriter(f)
+        w.open()
+        w.extend(samples[0])
+        w.append(Sep())
+        w.pop()
+        w.close()
+        w.flush()
+        assert f.getvalue() == dumps(samples[0])
+
+
+def test_v6_sch_lazy_load():
+    """ The graphic items are parsed only when needed """
+    GS.global_date_time_format = GS.global_date_format = '%Y-%m-%d'
+    sch_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'board_samples', 'kicad_6',
+                            'light_control.kicad_sch')
+    with context.cover_it(cov):
+        sch = SchematicV6()
+        sch.load(sch_file, 'light_control')
+        assert sch._pending
+        assert all(s.pending is not None for s in sch.lib_symbol_names.values())
+        assert len(sch.get_components())
+        assert len(sch.wires)
+        assert sch._pending is None
+        assert all(s.pending is None and (s.draw or s.pins or s.units) for s in sch.lib_symbols)
+        # The netlist uses the pins, they must be parsed on first access
+        sch = SchematicV6()
+        sch.load(sch_file, 'light_control')
+        f = io.BytesIO()
+        sch.save_netlist(f, sch.get_components())
+        assert f.getvalue().count(b'<pin ') == 98
+
+
+def test_sch_sheet_instances():
+    """ Sheets with more than one instance are loaded once """
+    GS.global_date_time_format = GS.global_date_format = '%Y-%m-%d'
+    sch_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'board_samples', 'kicad_5',
+                            'test_v5.sch')
+    with context.cover_it(cov):
+        sch = Schematic()
+        sch.load(sch_file, 'test_v5')
+        s1, s2 = sch.sub_sheets
+        assert s1.fname == s2.fname
+        # Shared data
+        assert s1.wires is s2.wires
+        # Instance data
+        assert s1.components[0] is not s2.components[0]
+        assert s1.components[0].sheet_path != s2.components[0].sheet_path
+        assert s1.sub_sheets[0].components[0].ref == 'R3'
+        assert s2.sub_sheets[0].components[0].ref == 'R4'
+
+
+def test_sch_lib_index(monkeypatch, test_dir):
+    """ Only the needed components are parsed, using an index """
+    ctx = context.TestContext(test_dir, 'test_sch_lib_index', 'test_v5', 'empty_zip', '')
+    cache_dir = ctx.get_out_path('cache')
+    monkeypatch.setenv('XDG_CACHE_HOME', cache_dir)
+    GS.sch_cache = True
+    lib_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'board_samples', 'kicad_5', 'l1.lib')
+    try:
+        with context.cover_it(cov):
+            needed = {'l1:Resistor': None, 'l1:SYM_CAUTION': None, 'l1:Bogus': None}
+            lib = SymLib()
+            lib.load(lib_file, 'l1', needed)
+            assert list(lib.comps.keys()) == ['SYM_CAUTION']
+            assert list(lib.alias.keys()) == ['Resistor']
+            assert needed['l1:Resistor'].name == 'R'
+            assert needed['l1:Bogus'] is None
+            index = LibIndex.get(lib_file)
+            assert [e[2] for e in index.entries] == [['R', 'Resistor'], ['SYM_CAUTION'], ['C']]
+            # Now from the disk cache
+            LibIndex._loaded = {}
+            assert LibIndex.get(lib_file).entries == index.entries
+            assert len(os.listdir(os.path.join(cache_dir, 'kibot', 'libs'))) == 1
+            dcm = DocLib()
+            dcm.load(lib_file.replace('.lib', '.dcm'), {'R'})
+            assert len(dcm.comps) == 0
+    finally:
+        GS.sch_cache = False
+    ctx.clean_up()
+
+
+def get_sch_data(sch):
+    return ([(c.ref, c.sheet_path, c.sheet_path_h, [(f.name, f.value) for f in c.fields]) for c in sch.get_components()],
+            sch.fields, [s.fname for s in sch.all_sheets])
+
+
+def test_sch_parallel_load():
+    """ Sheets loaded by worker processes """
+    GS.global_date_time_format = GS.global_date_format = '%Y-%m-%d'
+    samples = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'board_samples')
+    try:
+        with context.cover_it(cov):
+            for cls, sch_file in ((Schematic, os.path.join(samples, 'kicad_5', 'test_v5.sch')),
+                                  (SchematicV6, os.path.join(samples, 'kicad_6', 'test_v5.kicad_sch'))):
+                res = []
+                for jobs in (1, 2):
+                    GS.jobs = jobs
+                    sch = cls()
+                    sch.load(sch_file, 'test_v5')
+                    assert sch.sheet_jobs is None
+                    res.append(get_sch_data(sch))
+                assert res[0] == res[1]
+    finally:
+        GS.jobs = 1
+
+
+def test_sch_parallel_load_order(test_dir, caplog, monkeypatch):
+    """ The messages from the workers must be mixed with the ones from the main process like in a sequential load """
+    GS.global_date_time_format = GS.global_date_format = '%Y-%m-%d'
+    # The module loggers depend on the domain used when they were imported, use a MyLogger (skips repeated warnings),
+    # without filters, that propagates to the root logger (caplog)
+    logger = log.MyLogger('test_sch_parallel_load_order')
+    logger.parent = logging.getLogger()
+    monkeypatch.setattr(v5_sch, 'logger', logger)
+    monkeypatch.setattr(parallel_load, 'logger', logger)
+    monkeypatch.setattr(log, 'filters', None)
+    ctx = context.TestContext(test_dir, 'test_sch_parallel_load_order', 'test_v5', 'empty_zip', '')
+    samples = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'board_samples', 'kicad_5')
+    for name in ('test_v5', 'deeper'):
+        shutil.copy(os.path.join(samples, name+'.sch'), ctx.output_dir)
+    with open(os.path.join(samples, 'sub-sheet.sch'), 'rt') as f:
+        sub = f.read()
+    # Not annotated (reported when solving the instance) and inconsistent position (reported by the parser)
+    sub = re.sub(r'Ref="U[12]"', 'Ref="U?"', sub).replace(' U1\n', ' U?\n').replace('F 0 "U1"', 'F 0 "U?"')
+    sub = re.sub(r'\n\t(\d)    (\d+)', lambda m: '\n\t{}    {}'.format(m.group(1), int(m.group(2))+1), sub)
+    with open(ctx.get_out_path('sub-sheet.sch'), 'wt') as f:
+        f.write(sub)
+    res = []
+    try:
+        for jobs in (1, 2):
+            GS.jobs = jobs
+            log.MyLogger.reset_warn_hash()
+            caplog.clear()
+            with context.cover_it(cov):
+                Schematic().load(ctx.get_out_path('test_v5.sch'), 'test_v5')
+            res.append([r.getMessage() for r in caplog.records if r.getMessage().startswith(('(W039)', '(W040)'))])
+    finally:
+        GS.jobs = 1
+    assert len(res[0]) == 16
+    assert res[0] == res[1]
+    ctx.clean_up()
+
+
+def test_sch_parallel_load_fail(test_dir):
+    """ A sub-sheet loaded by a worker process fails, the workers must be stopped """
+    GS.global_date_time_format = GS.global_date_format = '%Y-%m-%d'
+    ctx = context.TestContext(test_dir, 'test_sch_parallel_load_fail', 'test_v5', 'empty_zip', '')
+    samples = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'board_samples')
+    GS.jobs = 2
+    try:
+        for cls, ext in ((Schematic, '.sch'), (SchematicV6, '.kicad_sch')):
+            for name in ('test_v5', 'sub-sheet'):
+                shutil.copy(os.path.join(samples, 'kicad_5' if ext == '.sch' else 'kicad_6', name+ext), ctx.output_dir)
+            with open(ctx.get_out_path('deeper'+ext), 'wt') as f:
+                f.write('(broken)\n')
+            sch = cls()
+            with context.cover_it(cov):
+                with pytest.raises(SchError):
+                    sch.load(ctx.get_out_path('test_v5'+ext), 'test_v5')
+            assert sch.sheet_jobs is None
+    finally:
+        GS.jobs = 1
+    ctx.clean_up()
+
+
+def test_sch_variant_incremental(test_dir):
+    """ Only the sheets with changed components are saved again, the rest are copied """
+    GS.global_date_time_format = GS.global_date_format = '%Y-%m-%d'
+    ctx = context.TestContext(test_dir, 'test_sch_variant_incremental', 'test_v5', 'empty_zip', '')
+    samples = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'board_samples', 'kicad_6')
+    with context.cover_it(cov):
+        sch = SchematicV6()
+        sch.load(os.path.join(samples, 'test_v5.kicad_sch'), 'test_v5')
+        comps = sch.get_components()
+        for c in comps:
+            c.back_up_fields()
+        # R3 is in the first instance of `deeper.kicad_sch`, R4 in the second
+        next(c for c in comps if c.ref == 'R3').fitted = False
+        assert sch.save_variant(ctx.output_dir) == 'test_v5.kicad_sch'
+    with open(os.path.join(samples, 'deeper.kicad_sch'), 'rb') as f:
+        deeper = f.read()
+    with open(ctx.get_out_path('deeper_3.kicad_sch'), 'rb') as f:
+        assert f.read() != deeper
+    with open(ctx.get_out_path('deeper_4.kicad_sch'), 'rb') as f:
+        assert f.read() == deeper
+    ctx.clean_up()
+
+
+def test_sch_fields_reset():
+    """ The fields changed by the transform filters are restored, the back-up is never modified """
+    GS.global_date_time_format = GS.global_date_format = '%Y-%m-%d'
+    samples = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'board_samples', 'kicad_5')
+    with context.cover_it(cov):
+        load_actions()
+        sch = Schematic()
+        sch.load(os.path.join(samples, 'f_rename_1.sch'), 'f_rename_1')
+        comps = sch.get_components()
+        c = next(c for c in comps if c.ref == 'R1')
+        orig_fields = list(c.fields)
+        orig = [(f.name, f.value) for f in c.fields]
+        # The first reset makes the back-up
+        reset_filters(comps)
+        # Sets the value and manufacturer, adds the description
+        var_rename = RegFilter.get_class_for('var_rename')()
+        var_rename.name = 'test_var_rename'
+        var_rename.force_variant = 'dev'
+        field_rename = RegFilter.get_class_for('field_rename')()
+        field_rename.name = 'test_field_rename'
+        field_rename.rename = {'manufacturer part number': 'MPN'}
+        # Twice, like two outputs using the same components
+        for _ in range(2):
+            comps = apply_pre_transform(apply_pre_transform(comps, var_rename), field_rename)
+            assert c.value == 'RES-000045-00'
+            assert c.get_field_value('manufacturer') == 'Yageo'
+            assert c.get_field_value('description') == 'RES SMD 1K OHM 1% 1/16W 0402'
+            assert c.get_field_value('mpn') == 'RC0402FR-071KL'
+            assert not c.is_field('manufacturer part number')
+            # The changes aren't applied to the back-up
+            assert c.fields is not c.fields_bkp and c.dfields is not c.dfields_bkp
+            assert c.dfields['manufacturer'] is not c.dfields_bkp['manufacturer']
+            assert [(f.name, f.value) for f in c.fields_bkp] == orig
+            reset_filters(comps)
+            assert not c.fields_changed
+            assert c.value == 'RES-000007-00'
+            assert [(f.name, f.value) for f in c.fields] == orig
+            assert all(f is o for f, o in zip(c.fields, orig_fields))
+
+
+def test_bom_group_keys():
+    """ The components that can be grouped must share a grouping key """
+    GS.global_date_time_format = GS.global_date_format = '%Y-%m-%d'
+    sch_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'board_samples', 'kicad_5',
+                            'kibom-test.sch')
+    sch = Schematic()
+    sch.load(sch_file, 'kibom-test')
+    comps = sch.get_components()
+    for c in comps:
+        c.value_sort = comp_match(c.value, c.ref_prefix) if c.ref_prefix in ('R', 'C', 'L') else None
+
+    class Config(object):
+        group_connectors = True
+        merge_both_blank = True
+        component_aliases = [['r', 'r_small', 'res', 'resistor'], ['c', 'c_small', 'cap', 'capacitor']]
+        group_fields = [ColumnList.COL_PART_L, ColumnList.COL_VALUE_L, ColumnList.COL_FP_L, 'config']
+        group_fields_fallbacks = [None, None, None, ColumnList.COL_VALUE_L]
+
+    for merge_blank in (False, True):
+        cfg = Config()
+        cfg.merge_blank_fields = merge_blank
+        with context.cover_it(cov):
+            keys = [group_keys(c, cfg) for c in comps]
+        for c1, k1 in zip(comps, keys):
+            for c2, k2 in zip(comps, keys):
+                if compare_components(c1, c2, cfg) and k1 is not None and k2 is not None:
+                    assert set(k1) & set(k2), (c1.ref, c2.ref)
+        assert (None in keys) == merge_blank
+
+
+class PlainObject(object):
+    pass
+
+
+def test_sch_memory(test_dir):
+    """ The components and fields use __slots__, compare them with the same objects using __dict__ """
+    GS.global_date_time_format = GS.global_date_format = '%Y-%m-%d'
+    samples = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'board_samples')
+    for cls, sch_file in ((Schematic, os.path.join(samples, 'kicad_5', 'light_control.sch')),
+                          (SchematicV6, os.path.join(samples, 'kicad_6', 'light_control.kicad_sch'))):
+        with context.cover_it(cov):
+            sch = cls()
+            sch.load(sch_file, 'light_control')
+        size = plain_size = 0
+        for c in sch.get_components(exclude_power=False):
+            for o in [c]+c.fields:
+                # A __dict__ here means the slots aren't saving memory
+                assert not hasattr(o, '__dict__')
+                plain = PlainObject()
+                plain.__dict__.update({a: getattr(o, a) for cls in type(o).__mro__ for a in cls.__dict__.get('__slots__', ())
+                                       if hasattr(o, a)})
+                size += sys.getsizeof(o)
+                plain_size += sys.getsizeof(plain)+sys.getsizeof(plain.__dict__)
+        logging.info('{}: {} bytes, {} bytes using __dict__'.format(os.path.basename(sch_file), size, plain_size))
+        assert size < plain_size/2
+    # Without a __dict__ the attributes added by the outputs must be in the slots, the internal BoM adds most of them
+    ctx = context.TestContextSCH(test_dir, 'test_sch_memory', 'kibom-test', 'int_bom_simple_csv', 'BoM')
+    ctx.run()
+    rows, header, info = ctx.load_csv('kibom-test-bom.csv')
+    assert len(rows) > 0
+    ctx.clean_up()
+
+
+def test_pcb_point():
+    """ PCBPoint behaves like a tuple, also as a dict key """
+    with context.cover_it(cov):
+        p = PCBPoint(1, 2)
+        assert p == (1, 2)
+        assert hash(p) == hash((1, 2))
+        assert {p: 'a'}[PCBPoint(1, 2)] == 'a'
+        assert len({PCBPoint(1, 2), PCBPoint(1, 2), PCBPoint(2, 1)}) == 2
+
+
+def test_pcb_data():
+    """ The read-only PCB model must match the data we get from pcbnew """
+    import pcbnew
+    samples = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'board_samples')
+    pcb_file = os.path.join(samples, 'kicad_6' if context.ki6() else 'kicad_5', 'light_control.kicad_pcb')
+    with context.cover_it(cov):
+        pcb = PCB.load(pcb_file)
+    board = pcbnew.LoadBoard(pcb_file)
+    fps = {m.GetReference(): m for m in (board.GetFootprints() if context.ki6() else board.GetModules())}
+    assert sorted(fps.keys()) == sorted(m.GetReference() for m in pcb.GetFootprints())
+    for m in pcb.GetFootprints():
+        o = fps[m.GetReference()]
+        assert m.GetValue() == o.GetValue()
+        assert m.GetFPID().GetLibItemName() == str(o.GetFPID().GetLibItemName())
+        assert m.IsFlipped() == o.IsFlipped()
+        assert tuple(m.GetPosition()) == (o.GetPosition().x, o.GetPosition().y)
+        if context.ki6():
+            assert m.GetOrientationDegrees() == o.GetOrientationDegrees()
+            assert m.GetAttributes() == o.GetAttributes()
+            r = m.GetFpPadsLocalBbox()
+            o_r = o.GetFpPadsLocalBbox()
+            assert abs(r.GetWidth()-o_r.GetWidth()) <= 10 and abs(r.GetHeight()-o_r.GetHeight()) <= 10
+    assert pcb.GetTitleBlock().GetComment(3) == '@Comment4@'
+    if context.ki6():
+        assert tuple(pcb.GetDesignSettings().GetAuxOrigin()) == tuple(board.GetDesignSettings().GetAuxOrigin())
+
+
+class FakeOutput(object):
+    """ Changes the board and runs the `uses` outputs, like compress does """
+    def __init__(self, name, uses, changes):
+        self.name = name
+        self.dir = name
+        self.uses = uses
+        self.changes = changes
+        self._done = False
+
+    def expand_dirname(self, name):
+        return name
+
+    def run(self, out_dir):
+        for o in self.uses:
+            run_output(o)
+        state = BoardState(None)
+        # The changes from the outputs we used must be already undone
+        assert not self.changes
+        self.changes.append(self.name)
+        state._undo.append((self.changes.remove, self.name))
+        state.restore()
+
+
+def test_run_output_isolated(test_dir, monkeypatch):
+    """ The outputs used by other output in the same worker process must undo their changes """
+    changes = []
+    out_a = FakeOutput('a', [], changes)
+    out_b = FakeOutput('b', [], changes)
+    outs = {'a': out_a, 'b': out_b, 'c': FakeOutput('c', [out_a, out_b], changes)}
+    monkeypatch.setattr(GS, 'out_dir', test_dir)
+    monkeypatch.setattr(GS, 'manifest', None)
+    monkeypatch.setattr(BoardState, 'isolated', False)
+    monkeypatch.setattr(RegOutput, 'get_output', lambda name: outs[name])
+    with context.cover_it(cov):
+        res = _run_output_job('c', [])
+    assert res[1] == 0
+    assert out_a._done and out_b._done
+    # Only the changes from the output we asked to run are kept, the process is discarded
+    assert changes == ['c']
+    assert BoardState.isolated
@@ -6,6 +6,7 @@ import logging
 import subprocess
 import re
 import csv
+import json
 from contextlib import contextmanager
 from glob import glob
 from pty import openpty
@@ -621,6 +622,9 @@ class TestContext(object):
                             r.append(cell)
                     b.append(r)
                 rows.append(b)
+        # Rows stored as JSON (json_data option)
+        for n, data in enumerate(re.findall(r'<script type="application/json" class="content-data">(.*?)</script>', html)):
+            rows[n] = [r[1:] for r in json.loads(data)['rows']]
         return rows, headers, sh_head
 
     def load_html_style(self, filename):
@@ -653,6 +657,9 @@ class TestContext(object):
         rows = []
         root = ET.parse(worksheet).getroot()
         ns = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+        # Read the strings, not used in constant_memory mode (in-line strings)
+        strings = self.get_out_path(os.path.join('desc', 'xl', 'sharedStrings.xml'))
+        strs = [t.text for t in ET.parse(strings).getroot().iter(ns+'t')] if os.path.isfile(strings) else []
         rnum = 1
         rfirst = 1
         sh_head = []
@@ -670,13 +677,16 @@ class TestContext(object):
                     type = cell.attrib['t']
                 else:
                     type = 'n'   # default: number
+                if type == 'inlineStr':
+                    this_row.append(cell.find('{0}is/{0}t'.format(ns)).text)
+                    continue
                 value = cell.find(ns+'v')
                 if value is not None:
                     if type == 'n':
                         # Numbers as integers
                         value = int(value.text)
                     else:
-                        value = value.text
+                        value = strs[int(value.text)]
                     this_row.append(value)
             rows.append(this_row)
             rnum += 1
@@ -687,18 +697,6 @@ class TestContext(object):
         if hlinks:
             for r in hlinks.iter(ns+'hyperlink'):
                 links[r.attrib['ref']] = r.attrib[nr+'id']
-        # Read the strings
-        strings = self.get_out_path(os.path.join('desc', 'xl', 'sharedStrings.xml'))
-        strs = [t.text for t in ET.parse(strings).getroot().iter(ns+'t')]
-        # Replace the indexes by the strings
-        for r in rows:
-            for i, val in enumerate(r):
-                if isinstance(val, str):
-                    r[i] = strs[int(val)]
-        for r in sh_head:
-            for i, val in enumerate(r):
-                if isinstance(val, str):
-                    r[i] = strs[int(val)]
         # Translate the links
         if links:
             # Read the relationships